@@ -0,0 +1,102 @@
+"""
+Benchmark throughput dengan 50 client konkuren terhadap fake PostgREST lokal
+(latency per query disimulasikan):
+- before: .execute() sync langsung di event loop (blocking)
+- after : db.execute() di bounded thread pool (non-blocking)
+
+Usage:
+    python benchmarks/bench_async_db.py --clients 50 --requests 500 --latency-ms 20
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+async def blocking_execute(query):
+    """Perilaku lama: round trip database mem-block event loop"""
+    return query.execute()
+
+
+async def run_load(app, paths, clients: int, total: int):
+    import httpx
+
+    latencies = []
+    counter = iter(range(total))
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for i in counter:
+                path = paths[i % len(paths)]
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{path} -> {response.status_code}: {response.text}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    return total / elapsed, latencies
+
+
+def report(label, throughput, latencies):
+    latencies = sorted(latencies)
+    print(
+        f"   {label:<8} {throughput:8.1f} req/s | "
+        f"p50 {latencies[len(latencies) // 2]:8.1f} ms | "
+        f"p95 {latencies[int(len(latencies) * 0.95)]:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    from config import settings
+    from benchmarks.fake_postgrest import start_server
+
+    settings.supabase_url = start_server(args.latency_ms)
+    settings.supabase_service_role_key = "bench.service.key"
+
+    from fastapi import FastAPI
+    import db
+    from routers import transactions, payments
+
+    app = FastAPI()
+    app.include_router(transactions.router)
+    app.include_router(payments.router)
+    paths = [f"/api/transactions/{uuid.uuid4()}/summary", "/api/payments/list"]
+
+    print("=" * 70)
+    print(
+        f"📊 {args.requests} requests, {args.clients} concurrent clients, "
+        f"{args.latency_ms:.0f} ms per query"
+    )
+    print("=" * 70)
+
+    db.get_supabase_client()
+
+    transactions.execute = payments.execute = blocking_execute
+    before = asyncio.run(run_load(app, paths, args.clients, args.requests))
+
+    transactions.execute = payments.execute = db.execute
+    after = asyncio.run(run_load(app, paths, args.clients, args.requests))
+
+    report("before", *before)
+    report("after", *after)
+    print(f"\n   ✅ Throughput gain: {after[0] / before[0]:.1f}x\n")
+    db.close_supabase_client()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark latency per request GET /api/transactions/{id}:
+- before: create_client() baru setiap request (seperti router lama)
+- after : shared pooled client dari db.get_supabase_client()
+
+Default memakai fake PostgREST lokal dengan TLS self-signed.
+Pakai --real untuk mengukur ke SUPABASE_URL di .env.
+
+Usage:
+    python benchmarks/bench_supabase_client.py --requests 200
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def measure(app, path: str, n: int):
+    import httpx
+
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(n):
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(f"{response.status_code}: {response.text}")
+    return latencies
+
+
+def report(label, latencies):
+    print(
+        f"   {label:<8} mean {statistics.mean(latencies):7.2f} ms | "
+        f"p50 {percentile(latencies, 50):7.2f} ms | p95 {percentile(latencies, 95):7.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--no-tls", action="store_true")
+    parser.add_argument("--real", action="store_true", help="Pakai SUPABASE_URL dari .env")
+    args = parser.parse_args()
+
+    from config import settings
+
+    if not args.real:
+        from benchmarks.fake_postgrest import start_server
+        settings.supabase_url = start_server(args.latency_ms, tls=not args.no_tls)
+        settings.supabase_service_role_key = "bench.service.key"
+
+    from fastapi import FastAPI
+    from supabase import create_client
+    import db
+    from routers import transactions
+
+    app = FastAPI()
+    app.include_router(transactions.router)
+    path = f"/api/transactions/{uuid.uuid4()}"
+
+    print("=" * 70)
+    print(f"📊 GET /api/transactions/{{id}} x {args.requests} -> {settings.supabase_url}")
+    print("=" * 70)
+
+    shared = transactions.get_supabase_client
+    transactions.get_supabase_client = lambda: create_client(
+        settings.supabase_url, settings.supabase_service_role_key
+    )
+    before = asyncio.run(measure(app, path, args.requests))
+
+    transactions.get_supabase_client = shared
+    db.get_supabase_client()  # pool dibuat sekali (seperti saat startup)
+    after = asyncio.run(measure(app, path, args.requests))
+
+    report("before", before)
+    report("after", after)
+    print(f"\n   ✅ Speedup (mean): {statistics.mean(before) / statistics.mean(after):.2f}x\n")
+    db.close_supabase_client()
+
+
+if __name__ == "__main__":
+    main()
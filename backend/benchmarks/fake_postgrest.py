@@ -0,0 +1,146 @@
+"""
+Fake PostgREST server lokal untuk benchmark (tanpa network ke Supabase).
+
+Setiap GET /rest/v1/<table> return satu row contoh untuk table itu dan
+POST /rest/v1/rpc/<function> return hasil tetap dari RPC_RESULTS, dengan
+latency yang bisa diatur untuk mensimulasikan round trip database.
+Opsional TLS (self-signed) supaya cost handshake ikut terukur.
+"""
+import asyncio
+import datetime
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+NOW = "2025-11-30T08:00:00+00:00"
+WAREHOUSE_ID = "51b51eb1-2552-431e-b53b-b5bfb856a70b"
+FARMER_ID = "6f1f4f4e-9a53-4b43-9b3c-3f1d1c2a9a11"
+
+SAMPLE_ROWS = {
+    "transactions": {
+        "id": "", "transaction_code": "TXN202511300001", "farmer_id": FARMER_ID,
+        "warehouse_id": WAREHOUSE_ID, "initial_price": 500000.0, "total_price": 500000.0,
+        "total_weight_kg": 1000.0, "payment_status": "unpaid", "recording_started_at": NOW,
+        "recording_completed_at": NOW, "payment_completed_at": None, "created_at": NOW,
+    },
+    "farmers": {
+        "id": FARMER_ID, "farmer_code": "F20251130A1B2C3", "full_name": "Budi",
+        "phone": "0812", "registered_by_warehouse": WAREHOUSE_ID, "is_active": True,
+        "created_at": NOW,
+    },
+    "harvest_records": {
+        "id": "", "transaction_id": "", "grade": "A", "sack_color": "red",
+        "weight_kg": 100.0, "detection_confidence": 97.5, "recorded_at": NOW, "created_at": NOW,
+    },
+    "payments": {
+        "id": "", "farmer_id": FARMER_ID, "transaction_id": "", "amount": 250000.0,
+        "payment_method": "cash", "status": "approved", "payment_date": NOW, "created_at": NOW,
+    },
+    "warehouses": {"id": WAREHOUSE_ID},
+}
+
+# Hasil RPC (body response PostgREST) untuk function yang dipanggil endpoint read
+RPC_RESULTS = {
+    "data_version": 1,
+}
+
+
+def make_app(latency_ms: float = 0.0, rows_per_select: int = 1) -> Starlette:
+    async def table(request: Request):
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        name = request.path_params["table"]
+        if request.method == "GET":
+            sample = SAMPLE_ROWS.get(name, {"id": ""})
+            rows = []
+            for _ in range(rows_per_select):
+                row = dict(sample)
+                if not row.get("id"):
+                    row["id"] = str(uuid.uuid4())
+                rows.append(row)
+            return JSONResponse(rows)
+        body = await request.json()
+        return JSONResponse(body if isinstance(body, list) else [body], status_code=201)
+
+    async def rpc(request: Request):
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        name = request.path_params["function"]
+        if name not in RPC_RESULTS:
+            return JSONResponse({"code": "PGRST202", "message": f"Function {name} not found"}, status_code=404)
+        return JSONResponse(RPC_RESULTS[name])
+
+    return Starlette(routes=[
+        Route("/rest/v1/rpc/{function}", rpc, methods=["GET", "POST"]),
+        Route("/rest/v1/{table}", table, methods=["GET", "POST", "PATCH", "DELETE"]),
+    ])
+
+
+def _self_signed_cert(directory: str):
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+    import ipaddress
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+    return cert_path, key_path
+
+
+def start_server(latency_ms: float = 0.0, tls: bool = False, rows_per_select: int = 1) -> str:
+    """
+    Jalankan server di background thread. Return base URL.
+    Kalau tls=True, SSL_CERT_FILE di-set supaya httpx percaya ke cert self-signed.
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    ssl_kwargs = {}
+    if tls:
+        cert_path, key_path = _self_signed_cert(tempfile.mkdtemp())
+        os.environ["SSL_CERT_FILE"] = cert_path
+        ssl_kwargs = {"ssl_certfile": cert_path, "ssl_keyfile": key_path}
+
+    config = uvicorn.Config(
+        make_app(latency_ms, rows_per_select),
+        host="127.0.0.1", port=port, log_level="warning", **ssl_kwargs
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+    return f"{'https' if tls else 'http'}://127.0.0.1:{port}"
@@ -0,0 +1,214 @@
+"""
+Load test end-to-end alur scanning gudang, in-process (httpx ASGITransport)
+terhadap database in-memory (db/local.py), jadi bisa dijalankan di laptop
+tanpa Supabase.
+
+Setiap clerk (per warehouse) mengulang:
+  register farmer -> create transaction -> start-recording
+  -> N x detect-and-save -> batch-detect -> complete-recording
+  -> create payment -> approve payment -> dashboard reads
+
+Output: throughput dan latency p50/p95/p99 per endpoint.
+
+Usage:
+    python benchmarks/loadtest.py --warehouses 20 --clerks 2 --cycles 5 --latency-ms 20
+    python benchmarks/loadtest.py --seed-farmers 500 --seed-transactions 10   # volume realistis
+"""
+import argparse
+import asyncio
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# (warna BGR, untuk JPEG sintetis) -- grade A/B/C
+SACK_COLORS = {"merah": (40, 40, 200), "kuning": (40, 200, 220), "hijau": (40, 160, 40)}
+
+
+def make_sack_images(count: int = 12) -> List[bytes]:
+    """JPEG sintetis karung (warna solid + noise), di-encode sekali di awal"""
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(7)
+    images = []
+    for i in range(count):
+        color = list(SACK_COLORS.values())[i % len(SACK_COLORS)]
+        img = np.empty((240, 320, 3), np.uint8)
+        img[:] = color
+        noise = rng.integers(-25, 25, img.shape)
+        img = np.clip(img.astype(int) + noise, 0, 255).astype(np.uint8)
+        ok, encoded = cv2.imencode(".jpg", img)
+        images.append(encoded.tobytes())
+    return images
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.first_error: Dict[str, str] = {}
+
+    async def call(self, client, label: str, method: str, url: str, expect=(200,), **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[label].append((time.perf_counter() - started) * 1000)
+        if response.status_code not in expect:
+            self.errors[label] += 1
+            self.first_error.setdefault(label, f"{response.status_code}: {response.text[:200]}")
+            return None
+        return response.json() if response.content else {}
+
+    def report(self, elapsed_s: float):
+        print(f"\n   {'endpoint':<48} {'count':>6} {'err':>4} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+        print("   " + "-" * 96)
+        total = 0
+        for label, values in self.latencies.items():
+            values = sorted(values)
+            total += len(values)
+            print(
+                f"   {label:<48} {len(values):>6} {self.errors[label]:>4} "
+                f"{len(values) / elapsed_s:>8.1f} {percentile(values, 50):>8.1f} "
+                f"{percentile(values, 95):>8.1f} {percentile(values, 99):>8.1f}"
+            )
+        print("   " + "-" * 96)
+        print(f"   {'TOTAL':<48} {total:>6} {sum(self.errors.values()):>4} {total / elapsed_s:>8.1f}")
+        print("   (latency dalam ms)")
+        for label, message in self.first_error.items():
+            print(f"   ❌ {label}: {message}")
+
+
+async def clerk_session(client, recorder: Recorder, warehouse_id: str, images: List[bytes], args, clerk: int):
+    headers = {"X-Warehouse-ID": warehouse_id}
+    call = recorder.call
+
+    for cycle in range(args.cycles):
+        farmer = await call(client, "POST /api/farmers/register", "POST", "/api/farmers/register",
+                            headers=headers, json={"full_name": f"Petani {clerk}-{cycle}", "phone": "081234567890"})
+        if farmer is None:
+            continue
+        txn = await call(client, "POST /api/transactions/create", "POST", "/api/transactions/create",
+                         headers=headers, json={"farmer_id": farmer["id"], "initial_price": 1_000_000})
+        if txn is None:
+            continue
+        transaction_id = txn["id"]
+        await call(client, "POST /api/transactions/{id}/start-recording", "POST",
+                   f"/api/transactions/{transaction_id}/start-recording", headers=headers)
+
+        for i in range(args.sacks):
+            image = images[(clerk + cycle + i) % len(images)]
+            await call(client, "POST /api/ml-harvest/detect-and-save", "POST", "/api/ml-harvest/detect-and-save",
+                       headers=headers, data={"transaction_id": transaction_id},
+                       files={"file": ("sack.jpg", image, "image/jpeg")})
+        if args.batch:
+            files = [("files", (f"sack{i}.jpg", images[i % len(images)], "image/jpeg")) for i in range(args.batch)]
+            await call(client, "POST /api/ml-harvest/batch-detect", "POST", "/api/ml-harvest/batch-detect",
+                       headers=headers, data={"transaction_id": transaction_id}, files=files)
+
+        completed = await call(client, "POST /api/transactions/{id}/complete-recording", "POST",
+                               f"/api/transactions/{transaction_id}/complete-recording", headers=headers)
+        amount = (completed or {}).get("total_price") or 1_000_000
+        payment = await call(client, "POST /api/payments/create", "POST", "/api/payments/create", headers=headers,
+                             json={"transaction_id": transaction_id, "amount": amount, "payment_method": "transfer"})
+        if payment is not None:
+            await call(client, "PUT /api/payments/{id}/approve", "PUT", f"/api/payments/{payment['id']}/approve",
+                       headers=headers, json={"status": "approved"})
+
+        await call(client, "GET /api/transactions/{id}/summary", "GET",
+                   f"/api/transactions/{transaction_id}/summary", headers=headers)
+        await call(client, "GET /api/dashboard/warehouse-summary", "GET",
+                   "/api/dashboard/warehouse-summary", headers=headers)
+        await call(client, "GET /api/dashboard/timeseries", "GET",
+                   "/api/dashboard/timeseries", headers=headers, params={
+                       "start": (datetime.now(timezone.utc) - timedelta(days=1)).isoformat(),
+                       "end": datetime.now(timezone.utc).isoformat(),
+                       "granularity": "hour",
+                   })
+        await call(client, "GET /api/dashboard/farmers-payment-summary", "GET",
+                   "/api/dashboard/farmers-payment-summary?limit=50", headers=headers)
+
+
+async def run(app, warehouse_ids: List[str], images: List[bytes], args) -> float:
+    import httpx
+
+    recorder = Recorder()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            clerk_session(client, recorder, warehouse_id, images, args, w * args.clerks + c)
+            for w, warehouse_id in enumerate(warehouse_ids)
+            for c in range(args.clerks)
+        ))
+        elapsed = time.perf_counter() - started
+
+    recorder.report(elapsed)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test alur scanning gudang (in-process, database lokal)")
+    parser.add_argument("--warehouses", type=int, default=10)
+    parser.add_argument("--clerks", type=int, default=2, help="clerk konkuren per warehouse")
+    parser.add_argument("--cycles", type=int, default=3, help="transaksi per clerk")
+    parser.add_argument("--sacks", type=int, default=10, help="detect-and-save per transaksi")
+    parser.add_argument("--batch", type=int, default=10, help="gambar per batch-detect (0 = skip)")
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="latency buatan per round trip database")
+    parser.add_argument("--seed-farmers", type=int, default=50, help="petani existing per warehouse")
+    parser.add_argument("--seed-transactions", type=int, default=5, help="transaksi existing per petani")
+    args = parser.parse_args()
+
+    from config import settings
+    settings.database_backend = "local"
+    settings.online_learning_enabled = False
+
+    from db.local import LocalDatabase, reset_local_database
+    from db.local_seed import seed
+    from models.sack_detector import get_detector
+
+    print("=" * 70)
+    print("📈 BETELCHAIN LOAD TEST")
+    print("=" * 70)
+
+    database = LocalDatabase()
+    started = time.perf_counter()
+    counts = seed(
+        database,
+        warehouses=args.warehouses,
+        farmers_per_warehouse=args.seed_farmers,
+        transactions_per_farmer=args.seed_transactions,
+    )
+    print(f"🌱 Seeded {counts['harvest_records']:,} harvest records in {time.perf_counter() - started:.1f}s")
+    warehouse_ids = list(database.tables["warehouses"].rows)
+    database.latency_ms = args.latency_ms
+    reset_local_database(database)
+
+    detector = get_detector(settings.model_path, settings.meta_path, settings.features_path)
+    detector.warm_up(settings.warmup_rounds)
+    images = make_sack_images()
+
+    from main import app
+
+    print(
+        f"🏭 {args.warehouses} warehouses x {args.clerks} clerks x {args.cycles} transactions, "
+        f"{args.sacks} scans + batch {args.batch}, {args.latency_ms:.0f} ms per query"
+    )
+    round_trips = database.round_trips
+    elapsed = asyncio.run(run(app, warehouse_ids, images, args))
+    print(f"\n   ⏱️  {elapsed:.1f}s, {database.round_trips - round_trips:,} database round trips")
+    reset_local_database()
+
+
+if __name__ == "__main__":
+    main()
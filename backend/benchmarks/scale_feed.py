@@ -0,0 +1,157 @@
+"""
+Simulasi timbangan lokal: stream sample berat (10-50 Hz) seperti bridge serial.
+
+Tiap karung: naik dengan osilasi teredam saat diletakkan, stabil dengan noise
+sensor, lalu diangkat (kembali ~0 kg). Dipakai test_scale.py dan bisa
+dijalankan langsung:
+
+    # tanpa server: cek filter stabilisasi + throughput banyak station
+    python benchmarks/scale_feed.py --stations 200 --sacks 20 --rate-hz 50
+
+    # ke server yang jalan (uvicorn main:app), real-time
+    python benchmarks/scale_feed.py --url ws://localhost:8000 --warehouse-id <id> --stations 5
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def sack_samples(
+    weight_kg: float,
+    rate_hz: float,
+    rng: random.Random,
+    settle_s: float = 2.0,
+    noise_kg: float = 0.03,
+    idle_s: float = 0.5
+) -> Iterator[float]:
+    """Sample kg untuk satu karung: diletakkan -> stabil -> diangkat -> kosong"""
+    dt = 1.0 / rate_hz
+    t = 0.0
+    # Diletakkan: osilasi teredam ~0.8 detik
+    while t < 0.8:
+        yield weight_kg * (1 - math.exp(-6 * t) * math.cos(12 * t)) + rng.gauss(0, noise_kg * 3)
+        t += dt
+    for _ in range(int(settle_s * rate_hz)):
+        yield weight_kg + rng.gauss(0, noise_kg)
+    # Diangkat + timbangan kosong
+    for i in range(int(0.2 * rate_hz)):
+        yield weight_kg * (1 - (i + 1) / (0.2 * rate_hz))
+    for _ in range(int(idle_s * rate_hz)):
+        yield abs(rng.gauss(0, noise_kg))
+
+
+def feed(
+    sacks: int,
+    rate_hz: float,
+    seed: int = 0,
+    min_kg: float = 40.0,
+    max_kg: float = 110.0
+) -> Tuple[List[float], List[Tuple[float, float]]]:
+    """Return (berat asli per karung, sample (t, kg)) dengan timestamp simulasi"""
+    rng = random.Random(seed)
+    weights = [round(rng.uniform(min_kg, max_kg), 1) for _ in range(sacks)]
+    samples = []
+    t = 0.0
+    for weight in weights:
+        for kg in sack_samples(weight, rate_hz, rng):
+            samples.append((t, round(kg, 3)))
+            t += 1.0 / rate_hz
+    return weights, samples
+
+
+def run_local(stations: int, sacks: int, rate_hz: float) -> dict:
+    """Semua station lewat ScaleHub in-process (tanpa network)"""
+    from services.scale import ScaleHub
+    from config import settings
+
+    hub = ScaleHub(
+        window_s=settings.scale_window_s,
+        tolerance_kg=settings.scale_tolerance_kg,
+        min_load_kg=settings.scale_min_load_kg,
+        match_window_s=settings.scale_match_window_s,
+        max_samples=settings.scale_max_samples,
+        max_pending=settings.scale_max_pending,
+        max_stations=max(stations, settings.scale_max_stations),
+    )
+    feeds = [feed(sacks, rate_hz, seed=i) for i in range(stations)]
+    total_samples = sum(len(samples) for _, samples in feeds)
+
+    settled = [[] for _ in range(stations)]
+    started = time.perf_counter()
+    for station, (_, samples) in enumerate(feeds):
+        for t, kg in samples:
+            result = hub.add_sample("local", str(station), kg, t)
+            if result is not None:
+                settled[station].append(result[0])
+    elapsed = time.perf_counter() - started
+
+    errors = [
+        abs(measured - actual)
+        for (weights, _), measured_list in zip(feeds, settled)
+        for actual, measured in zip(weights, measured_list)
+    ]
+    return {
+        "samples": total_samples,
+        "samples_per_s": total_samples / elapsed,
+        "expected": stations * sacks,
+        "settled": sum(len(s) for s in settled),
+        "max_error_kg": max(errors, default=0.0),
+    }
+
+
+async def run_remote(url: str, warehouse_id: str, stations: int, sacks: int, rate_hz: float):
+    """Kirim feed real-time ke /api/scale/ws/{station_id} (satu koneksi per station)"""
+    from websockets.asyncio.client import connect
+
+    async def station_feed(station: int):
+        weights, samples = feed(sacks, rate_hz, seed=station)
+        uri = f"{url}/api/scale/ws/sim-{station}?warehouse_id={warehouse_id}"
+        async with connect(uri) as ws:
+            async def read():
+                async for message in ws:
+                    event = json.loads(message)
+                    print(f"   sim-{station}: {event}")
+
+            reader = asyncio.create_task(read())
+            for _, kg in samples:
+                await ws.send(f"{kg}")
+                await asyncio.sleep(1.0 / rate_hz)
+            await asyncio.sleep(0.5)
+            reader.cancel()
+        print(f"✅ sim-{station}: {sacks} sacks sent, actual weights {weights}")
+
+    await asyncio.gather(*(station_feed(i) for i in range(stations)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated scale feed")
+    parser.add_argument("--stations", type=int, default=50)
+    parser.add_argument("--sacks", type=int, default=10, help="Karung per station")
+    parser.add_argument("--rate-hz", type=float, default=50.0)
+    parser.add_argument("--url", help="ws://host:port; tanpa ini jalan in-process")
+    parser.add_argument("--warehouse-id")
+    args = parser.parse_args()
+
+    if args.url:
+        if not args.warehouse_id:
+            parser.error("--warehouse-id is required with --url")
+        asyncio.run(run_remote(args.url, args.warehouse_id, args.stations, args.sacks, args.rate_hz))
+        return
+
+    result = run_local(args.stations, args.sacks, args.rate_hz)
+    print(f"⚖️  {args.stations} stations x {args.sacks} sacks @ {args.rate_hz:.0f} Hz")
+    print(f"   samples        : {result['samples']} ({result['samples_per_s']:,.0f}/s)")
+    print(f"   settled        : {result['settled']} / {result['expected']}")
+    print(f"   max error      : {result['max_error_kg']:.3f} kg")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,11 +9,63 @@ class Settings(BaseSettings):
     supabase_url: str = Field(default="")
     supabase_anon_key: str = Field(default="")
     supabase_service_role_key: str = Field(default="")
+    supabase_http2: bool = Field(default=True)
+    supabase_pool_size: int = Field(default=20)
+    supabase_keepalive_s: float = Field(default=60.0)
+    supabase_timeout_s: float = Field(default=10.0)
+    db_max_concurrency: int = Field(default=20)
+    code_block_size: int = Field(default=20)
+    batch_insert_chunk_size: int = Field(default=500)
+    export_page_size: int = Field(default=1000)
+    sync_max_batch_records: int = Field(default=20000)
+    sync_max_body_bytes: int = Field(default=64 * 1024 * 1024)
+    ownership_cache_size: int = Field(default=10000)
+    ownership_cache_ttl_s: float = Field(default=300.0)
+    dashboard_cache_fresh_s: float = Field(default=5.0)
+    dashboard_cache_stale_s: float = Field(default=60.0)
+    dashboard_cache_size: int = Field(default=1000)
+    slow_request_ms: float = Field(default=1000.0)
+    idempotency_cache_size: int = Field(default=10000)
+    idempotency_ttl_s: float = Field(default=24 * 3600.0)
+
+    # Live event SSE per warehouse (lihat services/events.py)
+    events_queue_size: int = Field(default=256)
+    events_history_size: int = Field(default=1000)
+    events_heartbeat_s: float = Field(default=15.0)
+    events_retry_ms: int = Field(default=3000)
+
+    # Timbangan (WebSocket /api/scale/ws/{station_id}, lihat services/scale.py)
+    scale_window_s: float = Field(default=1.0)
+    scale_tolerance_kg: float = Field(default=0.2)
+    scale_min_load_kg: float = Field(default=2.0)
+    scale_match_window_s: float = Field(default=30.0)
+    scale_max_samples: int = Field(default=256)
+    scale_max_pending: int = Field(default=16)
+    scale_max_stations: int = Field(default=1000)
+
+    # Write-behind detect-and-save (journal SQLite lokal, lihat services/journal.py)
+    write_behind_enabled: bool = Field(default=False)
+    write_behind_journal_path: str = Field(default="data/harvest_journal.sqlite3")
+    write_behind_flush_interval_s: float = Field(default=1.0)
+    write_behind_max_backoff_s: float = Field(default=60.0)
+
+    # "supabase" atau "local" (in-memory stand-in, lihat db/local.py)
+    database_backend: str = Field(default="supabase")
+    local_db_latency_ms: float = Field(default=0.0)
+    local_db_seed_warehouses: int = Field(default=0)
+    local_db_seed_farmers: int = Field(default=200)
     
     model_path: str = Field(default="models/model_svm_karung.joblib")
     meta_path: str = Field(default="models/model_meta.json")
     features_path: str = Field(default="models/extract_features.dill")
     
+    online_learning_enabled: bool = Field(default=True)
+    online_learning_dir: str = Field(default="models/online")
+    
+    warmup_rounds: int = Field(default=3)
+    readiness_probe_interval_s: float = Field(default=5.0)
+    readiness_max_db_latency_ms: float = Field(default=1000.0)
+    
     cors_origins: str = Field(
         default='["http://localhost:3000", "http://localhost:5173"]'
     )
@@ -0,0 +1,9 @@
+from .client import get_supabase_client, close_supabase_client
+from .query import execute
+from .codes import code_allocator
+from .cache import ownership_cache, authorize_transaction, require_warehouse
+
+__all__ = [
+    "get_supabase_client", "close_supabase_client", "execute", "code_allocator",
+    "ownership_cache", "authorize_transaction", "require_warehouse",
+]
@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from fastapi import HTTPException
+
+from config import settings
+from .client import get_supabase_client
+from .query import execute
+
+_MISSING = object()
+
+# Kolom transaction yang di-cache: yang dibutuhkan untuk cek ownership di write path.
+# warehouse_id, farmer_id, initial_price tidak pernah berubah; payment_status
+# hanya diubah oleh approve_payment (yang update cache lewat set_transaction).
+TRANSACTION_FIELDS = ("id", "warehouse_id", "farmer_id", "payment_status", "initial_price")
+
+
+class TTLCache:
+    """LRU cache dengan expiry per entry"""
+
+    def __init__(self, maxsize: int, ttl_s: float):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_s, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class OwnershipCache:
+    """
+    Read-through cache untuk cek ownership di write path:
+    - transaction_id -> {warehouse_id, farmer_id, payment_status, initial_price}
+    - warehouse_id yang sudah pasti ada
+
+    Lookup yang bersamaan untuk key yang sama digabung jadi satu query
+    (scan 200 karung paralel = 1 query, bukan 200). Not-found tidak di-cache.
+    """
+
+    def __init__(self, maxsize: int, ttl_s: float):
+        self.transactions = TTLCache(maxsize, ttl_s)
+        self.warehouses = TTLCache(maxsize, ttl_s)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def _read_through(self, cache: TTLCache, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        inflight_key = (id(cache), key)
+        future = self._inflight.get(inflight_key)
+        if future is not None:
+            self.hits += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[inflight_key] = future
+        try:
+            value = await load()
+            if value is not None:
+                cache.set(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # tandai sudah di-retrieve kalau tidak ada waiter
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(inflight_key, None)
+
+    async def get_transaction(self, transaction_id: str) -> Optional[dict]:
+        async def load():
+            supabase = get_supabase_client()
+            response = await execute(
+                supabase.table("transactions")
+                .select(", ".join(TRANSACTION_FIELDS))
+                .eq("id", transaction_id)
+            )
+            return response.data[0] if response.data else None
+
+        return await self._read_through(self.transactions, transaction_id, load)
+
+    async def warehouse_exists(self, warehouse_id: str) -> bool:
+        async def load():
+            supabase = get_supabase_client()
+            response = await execute(supabase.table("warehouses").select("id").eq("id", warehouse_id))
+            return True if response.data else None
+
+        return bool(await self._read_through(self.warehouses, warehouse_id, load))
+
+    def peek_transaction(self, transaction_id: str) -> Optional[dict]:
+        """Entry yang sudah di-cache saja, tanpa query"""
+        return self.transactions.get(transaction_id)
+
+    def set_transaction(self, row: dict):
+        """Update cache dari hasil write kita sendiri (insert / update transactions)"""
+        cached = self.transactions.get(row["id"]) or {}
+        merged = {**cached, **{f: row[f] for f in TRANSACTION_FIELDS if f in row}}
+        if all(f in merged for f in TRANSACTION_FIELDS):
+            self.transactions.set(row["id"], merged)
+        else:
+            self.transactions.invalidate(row["id"])
+
+    def invalidate_transaction(self, transaction_id: str):
+        self.transactions.invalidate(transaction_id)
+
+    def clear(self):
+        self.transactions.clear()
+        self.warehouses.clear()
+
+
+ownership_cache = OwnershipCache(
+    maxsize=settings.ownership_cache_size,
+    ttl_s=settings.ownership_cache_ttl_s,
+)
+
+
+async def authorize_transaction(
+    transaction_id: str,
+    warehouse_id: str,
+    detail: str = "Not authorized for this transaction",
+) -> dict:
+    """Return transaction (cached) kalau milik warehouse ini, else 404 / 403"""
+    txn = await ownership_cache.get_transaction(transaction_id)
+    if txn is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    if txn["warehouse_id"] != warehouse_id:
+        raise HTTPException(status_code=403, detail=detail)
+    return txn
+
+
+async def require_warehouse(warehouse_id: str):
+    if not await ownership_cache.warehouse_exists(warehouse_id):
+        raise HTTPException(status_code=404, detail="Warehouse not found")
@@ -0,0 +1,62 @@
+import threading
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException
+from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
+
+from config import settings
+
+_client: Optional[Client] = None
+_http_client: Optional[httpx.Client] = None
+_lock = threading.Lock()
+
+
+def _build_http_client() -> httpx.Client:
+    """
+    Satu httpx client untuk seluruh umur proses:
+    connection pool + HTTP keep-alive (+ HTTP/2 kalau diaktifkan),
+    jadi tidak ada TLS handshake ulang per request.
+    """
+    return httpx.Client(
+        http2=settings.supabase_http2,
+        limits=httpx.Limits(
+            max_connections=settings.supabase_pool_size,
+            max_keepalive_connections=settings.supabase_pool_size,
+            keepalive_expiry=settings.supabase_keepalive_s,
+        ),
+        timeout=httpx.Timeout(settings.supabase_timeout_s),
+    )
+
+
+def get_supabase_client() -> Client:
+    """Shared Supabase client (lazy init, dipakai semua router)"""
+    global _client, _http_client
+    if settings.database_backend == "local":
+        from .local import get_local_database
+        return get_local_database()
+    if not settings.supabase_url or not settings.supabase_service_role_key:
+        raise HTTPException(
+            status_code=500,
+            detail="Supabase configuration is missing"
+        )
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _http_client = _build_http_client()
+                _client = create_client(
+                    settings.supabase_url,
+                    settings.supabase_service_role_key,
+                    options=SyncClientOptions(httpx_client=_http_client),
+                )
+    return _client
+
+
+def close_supabase_client():
+    global _client, _http_client
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+        _client = None
+        _http_client = None
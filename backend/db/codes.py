@@ -0,0 +1,52 @@
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from config import settings
+from .client import get_supabase_client
+from .query import execute
+
+
+class CodeAllocator:
+    """
+    Alokasi nomor urut per prefix (contoh: TXN20251130, F20251130).
+
+    Database (RPC allocate_code_block) jadi sumber kebenaran yang atomic;
+    setiap proses mengambil satu blok nomor sekaligus lalu membagikannya
+    dari memory, jadi sebagian besar alokasi tidak perlu round trip.
+    Nomor yang belum terpakai saat restart hilang (ada gap), tapi tidak
+    pernah duplikat.
+    """
+
+    def __init__(self, block_size: int = 20, max_prefixes: int = 16):
+        self.block_size = block_size
+        self.max_prefixes = max_prefixes
+        self._blocks: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def _allocate_block(self, prefix: str) -> int:
+        supabase = get_supabase_client()
+        response = await execute(supabase.rpc("allocate_code_block", {
+            "p_prefix": prefix,
+            "p_count": self.block_size
+        }))
+        return int(response.data)
+
+    async def next(self, prefix: str) -> int:
+        lock = self._locks.setdefault(prefix, asyncio.Lock())
+        async with lock:
+            next_value, last_value = self._blocks.get(prefix, (1, 0))
+            if next_value > last_value:
+                last_value = await self._allocate_block(prefix)
+                next_value = last_value - self.block_size + 1
+
+            self._blocks[prefix] = (next_value + 1, last_value)
+            self._blocks.move_to_end(prefix)
+            while len(self._blocks) > self.max_prefixes:
+                old_prefix, _ = self._blocks.popitem(last=False)
+                self._locks.pop(old_prefix, None)
+
+            return next_value
+
+
+code_allocator = CodeAllocator(block_size=settings.code_block_size)
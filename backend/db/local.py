@@ -0,0 +1,770 @@
+"""
+In-memory stand-in untuk Supabase, supaya test, profiling dan benchmark bisa
+jalan tanpa network.
+
+Mengimplementasikan subset table API supabase-py yang dipakai router:
+select (kolom, embed, !inner, hint FK, count="exact"), eq / neq / gt / gte /
+lt / lte / like / ilike / in_ / is_ / or_, order, limit, range, insert,
+upsert, update, delete, plus RPC (lihat db/local_rpc.py).
+
+Tabel disimpan sebagai dict id -> row dengan hash index per kolom, dan
+setiap execute() bisa diberi latency buatan (settings.local_db_latency_ms)
+supaya regresi yang round-trip-bound tetap kelihatan di benchmark.
+
+Aktifkan dengan DATABASE_BACKEND=local.
+"""
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _new_id() -> str:
+    return str(uuid.uuid4())
+
+
+# Kolom + default per tabel (callable = dihitung per row, seperti default di Postgres)
+SCHEMA: Dict[str, Dict[str, Any]] = {
+    "warehouses": {
+        "id": _new_id, "name": None, "created_at": now_iso,
+    },
+    "farmers": {
+        "id": _new_id, "farmer_code": None, "full_name": None, "phone": None, "bank_name": None,
+        "account_number": None, "account_holder_name": None, "address": None, "village": None,
+        "district": None, "city": None, "province": None, "registered_by_warehouse": None,
+        "is_active": True, "created_at": now_iso, "updated_at": None,
+    },
+    "transactions": {
+        "id": _new_id, "transaction_code": None, "warehouse_id": None, "farmer_id": None,
+        "initial_price": None, "total_weight_kg": None, "total_price": None,
+        "payment_status": "unpaid", "recording_started_at": None, "recording_completed_at": None,
+        "payment_completed_at": None, "created_at": now_iso, "updated_at": None,
+    },
+    "payments": {
+        "id": _new_id, "farmer_id": None, "transaction_id": None, "amount": None,
+        "payment_method": None, "payment_note": None, "proof_image_url": None,
+        "status": "pending", "payment_date": now_iso, "created_at": now_iso, "updated_at": None,
+    },
+    "harvest_records": {
+        "id": _new_id, "transaction_id": None, "grade": None, "sack_color": None,
+        "weight_kg": None, "detection_confidence": None, "recorded_at": now_iso,
+        "created_at": now_iso,
+    },
+}
+
+# (tabel child, kolom FK, tabel parent) -- nama constraint: {child}_{kolom}_fkey
+FOREIGN_KEYS: List[Tuple[str, str, str]] = [
+    ("farmers", "registered_by_warehouse", "warehouses"),
+    ("transactions", "warehouse_id", "warehouses"),
+    ("transactions", "farmer_id", "farmers"),
+    ("payments", "transaction_id", "transactions"),
+    ("payments", "farmer_id", "farmers"),
+    ("harvest_records", "transaction_id", "transactions"),
+]
+
+INDEXES: Dict[str, List[str]] = {
+    "warehouses": [],
+    "farmers": ["registered_by_warehouse", "farmer_code"],
+    "transactions": ["warehouse_id", "farmer_id", "transaction_code"],
+    "payments": ["transaction_id", "farmer_id"],
+    "harvest_records": ["transaction_id"],
+}
+
+UNIQUE: Dict[str, List[str]] = {
+    "farmers": ["farmer_code"],
+    "transactions": ["transaction_code"],
+}
+
+
+# ----------------------------------------------------------------------
+# Perbandingan nilai (string dari query vs tipe asli di row)
+# ----------------------------------------------------------------------
+
+_TIMESTAMP_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}")
+
+
+@lru_cache(maxsize=65536)
+def parse_timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _comparable(row_value: Any, filter_value: Any) -> Tuple[Any, Any]:
+    if isinstance(row_value, bool) and isinstance(filter_value, str):
+        return row_value, filter_value.lower() == "true"
+    if isinstance(row_value, (int, float)) and not isinstance(row_value, bool) and isinstance(filter_value, str):
+        return row_value, float(filter_value)
+    if isinstance(row_value, str) and isinstance(filter_value, str) \
+            and _TIMESTAMP_RE.match(row_value) and _TIMESTAMP_RE.match(filter_value):
+        return parse_timestamp(row_value), parse_timestamp(filter_value)
+    if isinstance(row_value, str) and not isinstance(filter_value, str) and filter_value is not None:
+        return row_value, str(filter_value).lower() if isinstance(filter_value, bool) else str(filter_value)
+    return row_value, filter_value
+
+
+@lru_cache(maxsize=1024)
+def _like_regex(pattern: str, case_insensitive: bool) -> "re.Pattern":
+    regex = "".join(
+        ".*" if ch in "%*" else "." if ch == "_" else re.escape(ch)
+        for ch in pattern
+    )
+    return re.compile(f"^{regex}$", re.IGNORECASE if case_insensitive else 0)
+
+
+def match_op(row_value: Any, op: str, value: Any) -> bool:
+    if op == "is":
+        if value is None or value == "null":
+            return row_value is None
+        return row_value is (str(value).lower() == "true")
+    if op == "in":
+        return any(match_op(row_value, "eq", v) for v in value)
+    if row_value is None:
+        return False
+    if op in ("like", "ilike"):
+        return bool(_like_regex(str(value), op == "ilike").match(str(row_value)))
+
+    left, right = _comparable(row_value, value)
+    if op == "eq":
+        return left == right
+    if op == "neq":
+        return left != right
+    if op == "gt":
+        return left > right
+    if op == "gte":
+        return left >= right
+    if op == "lt":
+        return left < right
+    if op == "lte":
+        return left <= right
+    raise APIError({"code": "PGRST100", "message": f"Unsupported operator: {op}"})
+
+
+def _sort_key(value: Any):
+    if isinstance(value, str) and _TIMESTAMP_RE.match(value):
+        return parse_timestamp(value)
+    return value
+
+
+# ----------------------------------------------------------------------
+# Parsing: select string dan or_ filter (syntax PostgREST)
+# ----------------------------------------------------------------------
+
+def _split_top_level(text: str) -> List[str]:
+    parts, depth, quoted, current = [], 0, False, []
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and ch == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(ch)
+    if "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+
+class Embed:
+    def __init__(self, alias: str, table: str, hint: Optional[str], inner: bool, select: "SelectSpec"):
+        self.alias = alias
+        self.table = table
+        self.hint = hint
+        self.inner = inner
+        self.select = select
+
+
+class SelectSpec:
+    def __init__(self, columns: List[str], embeds: List[Embed]):
+        self.columns = columns
+        self.embeds = embeds
+
+
+@lru_cache(maxsize=512)
+def parse_select(text: str) -> SelectSpec:
+    columns, embeds = [], []
+    for item in _split_top_level(text or "*"):
+        if "(" in item and item.endswith(")"):
+            head, inner_text = item[:-1].split("(", 1)
+            alias = None
+            if ":" in head:
+                alias, head = head.split(":", 1)
+            name, *modifiers = head.strip().split("!")
+            inner = "inner" in modifiers
+            hints = [m for m in modifiers if m not in ("inner", "left")]
+            embeds.append(Embed(
+                alias=(alias or name).strip(),
+                table=name.strip(),
+                hint=hints[0] if hints else None,
+                inner=inner,
+                select=parse_select(inner_text),
+            ))
+        else:
+            columns.append(item.split("::")[0].strip())
+    return SelectSpec(columns, embeds)
+
+
+def _parse_or_value(raw: str) -> Any:
+    raw = raw.strip()
+    if raw.startswith('"') and raw.endswith('"'):
+        return raw[1:-1]
+    if raw.startswith("(") and raw.endswith(")"):
+        return [_parse_or_value(v) for v in _split_top_level(raw[1:-1])]
+    return raw
+
+
+def parse_logic(text: str, mode: str = "or") -> tuple:
+    """or_("a.eq.1,and(b.lt.2,c.gte.3)") -> ("or", [("a", "eq", "1"), ("and", [...])])"""
+    conditions = []
+    for item in _split_top_level(text):
+        for group in ("and", "or"):
+            if item.startswith(f"{group}(") and item.endswith(")"):
+                conditions.append(parse_logic(item[len(group) + 1:-1], group))
+                break
+        else:
+            column, op, value = item.split(".", 2)
+            negate = op == "not"
+            if negate:
+                op, value = value.split(".", 1)
+            conditions.append((column, op, _parse_or_value(value), negate))
+    return (mode, conditions)
+
+
+def eval_logic(row: dict, node: tuple) -> bool:
+    mode, conditions = node
+    results = (
+        eval_logic(row, c) if c[0] in ("and", "or") and isinstance(c[1], list)
+        else match_op(row.get(c[0]), c[1], c[2]) != c[3]
+        for c in conditions
+    )
+    return any(results) if mode == "or" else all(results)
+
+
+# ----------------------------------------------------------------------
+# Storage
+# ----------------------------------------------------------------------
+
+class LocalTable:
+    def __init__(self, name: str):
+        self.name = name
+        self.columns = SCHEMA.get(name, {"id": _new_id})
+        self.rows: Dict[str, dict] = {}
+        self.indexes: Dict[str, Dict[Any, set]] = {c: {} for c in INDEXES.get(name, [])}
+        self.unique = UNIQUE.get(name, [])
+
+    def with_defaults(self, values: dict) -> dict:
+        row = {}
+        for column, default in self.columns.items():
+            if column in values:
+                row[column] = values[column]
+            else:
+                row[column] = default() if callable(default) else default
+        for column, value in values.items():
+            row.setdefault(column, value)
+        return row
+
+    def _index_add(self, row: dict):
+        for column, index in self.indexes.items():
+            index.setdefault(row.get(column), set()).add(row["id"])
+
+    def _index_remove(self, row: dict):
+        for column, index in self.indexes.items():
+            ids = index.get(row.get(column))
+            if ids is not None:
+                ids.discard(row["id"])
+                if not ids:
+                    del index[row.get(column)]
+
+    def check_unique(self, row: dict, ignore_id: Optional[str] = None):
+        if row["id"] in self.rows and row["id"] != ignore_id:
+            raise APIError({
+                "code": "23505",
+                "message": f'duplicate key value violates unique constraint "{self.name}_pkey"',
+            })
+        for column in self.unique:
+            value = row.get(column)
+            if value is None:
+                continue
+            if any(i != ignore_id for i in self.indexes[column].get(value, ())):
+                raise APIError({
+                    "code": "23505",
+                    "message": f'duplicate key value violates unique constraint "{self.name}_{column}_key"',
+                })
+
+    def add(self, row: dict):
+        self.rows[row["id"]] = row
+        self._index_add(row)
+
+    def replace(self, old: dict, new: dict):
+        self._index_remove(old)
+        self.rows[new["id"]] = new
+        self._index_add(new)
+
+    def remove(self, row: dict):
+        self._index_remove(row)
+        del self.rows[row["id"]]
+
+    def lookup(self, column: str, value: Any) -> Iterable[dict]:
+        if column == "id":
+            row = self.rows.get(value)
+            return [row] if row is not None else []
+        if column in self.indexes:
+            return [self.rows[i] for i in self.indexes[column].get(value, ())]
+        return [r for r in self.rows.values() if r.get(column) == value]
+
+    def candidates(self, filters: List[tuple]) -> Iterable[dict]:
+        """Pakai index untuk filter eq / in pertama di kolom ber-index, else full scan"""
+        for column, op, value, negate in filters:
+            if negate or "." in column:
+                continue
+            if op == "eq" and (column == "id" or column in self.indexes):
+                return self.lookup(column, value)
+            if op == "in" and (column == "id" or column in self.indexes):
+                return [row for v in value for row in self.lookup(column, v)]
+        return list(self.rows.values())
+
+
+class LocalResponse:
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class LocalDatabase:
+    """
+    Pengganti supabase Client: punya .table() dan .rpc(), dengan execute() sync
+    seperti supabase-py (jadi tetap lewat db.query.execute di worker thread).
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.tables: Dict[str, LocalTable] = {name: LocalTable(name) for name in SCHEMA}
+        self.functions: Dict[str, Callable[["LocalDatabase", dict], Any]] = {}
+        self.triggers: List[Callable[[str, List[dict], List[dict]], None]] = []
+        self.lock = threading.RLock()
+        self.round_trips = 0
+
+        from .local_rpc import install
+        install(self)
+
+    # -- client API -----------------------------------------------------
+
+    def table(self, name: str) -> "LocalQuery":
+        return LocalQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: Optional[dict] = None) -> "LocalRPC":
+        return LocalRPC(self, name, params or {})
+
+    # -- internal -------------------------------------------------------
+
+    def get_table(self, name: str) -> LocalTable:
+        if name not in self.tables:
+            raise APIError({"code": "42P01", "message": f'relation "public.{name}" does not exist'})
+        return self.tables[name]
+
+    def round_trip(self):
+        self.round_trips += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def fire_triggers(self, table: str, old_rows: List[dict], new_rows: List[dict]):
+        """Trigger level statement (lihat migrations 003 & 008)"""
+        if old_rows or new_rows:
+            for trigger in self.triggers:
+                trigger(table, old_rows, new_rows)
+
+    def insert_rows(self, table_name: str, rows: List[dict], upsert: bool = False,
+                    on_conflict: str = "id", ignore_duplicates: bool = False) -> List[dict]:
+        """Insert satu statement (atomic: validasi semua row dulu), return row yang ditulis"""
+        table = self.get_table(table_name)
+        conflict_columns = [c.strip() for c in on_conflict.split(",")]
+        with self.lock:
+            inserted, updated_old, updated_new, seen = [], [], [], set()
+            for values in rows:
+                existing = None
+                if upsert:
+                    key = tuple(values.get(c) for c in conflict_columns)
+                    if conflict_columns == ["id"]:
+                        existing = table.rows.get(values.get("id"))
+                    else:
+                        existing = next((
+                            r for r in table.lookup(conflict_columns[0], key[0])
+                            if tuple(r.get(c) for c in conflict_columns) == key
+                        ), None)
+                    if key in seen:
+                        raise APIError({
+                            "code": "21000",
+                            "message": "ON CONFLICT DO UPDATE command cannot affect row a second time",
+                        })
+                    seen.add(key)
+
+                if existing is not None:
+                    if not ignore_duplicates:
+                        new = {**existing, **values, "id": existing["id"]}
+                        table.check_unique(new, ignore_id=existing["id"])
+                        updated_old.append(existing)
+                        updated_new.append(new)
+                    continue
+
+                row = table.with_defaults(values)
+                table.check_unique(row)
+                if row["id"] in seen:
+                    raise APIError({
+                        "code": "23505",
+                        "message": f'duplicate key value violates unique constraint "{table_name}_pkey"',
+                    })
+                seen.add(row["id"])
+                inserted.append(row)
+
+            for row in inserted:
+                table.add(row)
+            for old, new in zip(updated_old, updated_new):
+                table.replace(old, new)
+            self.fire_triggers(table_name, [], inserted)
+            self.fire_triggers(table_name, updated_old, updated_new)
+            return [dict(r) for r in inserted + updated_new]
+
+
+def _filter_matches(row: dict, filters: List[tuple]) -> bool:
+    for column, op, value, negate in filters:
+        if op == "logic":
+            if eval_logic(row, value) == negate:
+                return False
+        elif match_op(row.get(column), op, value) == negate:
+            return False
+    return True
+
+
+class LocalQuery:
+    """Query builder dengan interface yang sama dengan supabase-py (subset)"""
+
+    def __init__(self, db: LocalDatabase, table: str):
+        self.db = db
+        self.table_name = table
+        self.method = "select"
+        self.select_text = "*"
+        self.count_mode: Optional[str] = None
+        self.filters: List[tuple] = []
+        self.orders: List[Tuple[str, bool]] = []
+        self.limit_value: Optional[int] = None
+        self.offset_value = 0
+        self.payload: Any = None
+        self.returning = ReturnMethod.representation
+        self.on_conflict = "id"
+        self.ignore_duplicates = False
+        self._negate_next = False
+
+    # -- methods --------------------------------------------------------
+
+    def select(self, *columns: str, count: Optional[str] = None, head: bool = False) -> "LocalQuery":
+        self.method = "select"
+        self.select_text = ",".join(columns) if columns else "*"
+        self.count_mode = count
+        return self
+
+    def insert(self, values, count=None, returning=ReturnMethod.representation, upsert=False, default_to_null=True):
+        self.method = "insert"
+        self.payload = values if isinstance(values, list) else [values]
+        self.returning = returning
+        return self
+
+    def upsert(self, values, count=None, returning=ReturnMethod.representation,
+               ignore_duplicates=False, on_conflict="", default_to_null=True):
+        self.method = "upsert"
+        self.payload = values if isinstance(values, list) else [values]
+        self.returning = returning
+        self.ignore_duplicates = ignore_duplicates
+        self.on_conflict = on_conflict or "id"
+        return self
+
+    def update(self, values: dict, count=None, returning=ReturnMethod.representation):
+        self.method = "update"
+        self.payload = values
+        self.returning = returning
+        return self
+
+    def delete(self, count=None, returning=ReturnMethod.representation):
+        self.method = "delete"
+        self.returning = returning
+        return self
+
+    # -- filters --------------------------------------------------------
+
+    def _add(self, column: str, op: str, value: Any) -> "LocalQuery":
+        self.filters.append((column, op, value, self._negate_next))
+        self._negate_next = False
+        return self
+
+    @property
+    def not_(self) -> "LocalQuery":
+        self._negate_next = True
+        return self
+
+    def eq(self, column, value):
+        return self._add(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._add(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._add(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._add(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._add(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._add(column, "lte", value)
+
+    def like(self, column, pattern):
+        return self._add(column, "like", pattern)
+
+    def ilike(self, column, pattern):
+        return self._add(column, "ilike", pattern)
+
+    def in_(self, column, values):
+        return self._add(column, "in", list(values))
+
+    def is_(self, column, value):
+        return self._add(column, "is", value)
+
+    def or_(self, filters: str, reference_table: Optional[str] = None):
+        return self._add("", "logic", parse_logic(filters))
+
+    def order(self, column: str, *, desc: bool = False, nullsfirst: bool = False, foreign_table=None):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, size: int, *, foreign_table=None):
+        self.limit_value = size
+        return self
+
+    def range(self, start: int, end: int, foreign_table=None):
+        self.offset_value = start
+        self.limit_value = end - start + 1
+        return self
+
+    def single(self):
+        self.limit_value = 1
+        return self
+
+    # -- execute --------------------------------------------------------
+
+    @property
+    def trace_label(self) -> str:
+        """Sama dengan label builder supabase-py di db.query.query_target"""
+        verb = {"select": "GET", "insert": "POST", "upsert": "POST", "update": "PATCH", "delete": "DELETE"}
+        return f"{verb[self.method]} {self.table_name}"
+
+    def execute(self) -> LocalResponse:
+        self.db.round_trip()
+        with self.db.lock:
+            if self.method == "select":
+                return self._select()
+            if self.method in ("insert", "upsert"):
+                rows = self.db.insert_rows(
+                    self.table_name, self.payload,
+                    upsert=self.method == "upsert",
+                    on_conflict=self.on_conflict,
+                    ignore_duplicates=self.ignore_duplicates,
+                )
+                return LocalResponse(self._returning(rows))
+            if self.method == "update":
+                return LocalResponse(self._returning(self._update()))
+            return LocalResponse(self._returning(self._delete()))
+
+    def _returning(self, rows: List[dict]) -> List[dict]:
+        return [] if self.returning == ReturnMethod.minimal else rows
+
+    def _base_filters(self) -> List[tuple]:
+        return [f for f in self.filters if "." not in f[0]]
+
+    def _matching_rows(self) -> List[dict]:
+        table = self.db.get_table(self.table_name)
+        filters = self._base_filters()
+        return [r for r in table.candidates(filters) if _filter_matches(r, filters)]
+
+    def _select(self) -> LocalResponse:
+        spec = parse_select(self.select_text)
+        rows = self._matching_rows()
+
+        for column, desc in reversed(self.orders):
+            rows.sort(
+                key=lambda r: (r.get(column) is None, _sort_key(r.get(column))) if not desc
+                else (r.get(column) is not None, _sort_key(r.get(column))),
+                reverse=desc,
+            )
+
+        embed_filters = [f for f in self.filters if "." in f[0]]
+        shaped, total = [], 0
+        stop = None if self.count_mode else (
+            self.offset_value + self.limit_value if self.limit_value is not None else None
+        )
+        for row in rows:
+            result = shape_row(self.db, self.table_name, row, spec, embed_filters)
+            if result is None:
+                continue
+            total += 1
+            shaped.append(result)
+            if stop is not None and len(shaped) >= stop:
+                break
+
+        end = self.offset_value + self.limit_value if self.limit_value is not None else None
+        return LocalResponse(shaped[self.offset_value:end], total if self.count_mode else None)
+
+    def _update(self) -> List[dict]:
+        table = self.db.get_table(self.table_name)
+        old_rows = self._matching_rows()
+        new_rows = []
+        for old in old_rows:
+            new = {**old, **self.payload, "id": old["id"]}
+            table.check_unique(new, ignore_id=old["id"])
+            new_rows.append(new)
+        for old, new in zip(old_rows, new_rows):
+            table.replace(old, new)
+        self.db.fire_triggers(self.table_name, old_rows, new_rows)
+        return [dict(r) for r in new_rows]
+
+    def _delete(self) -> List[dict]:
+        table = self.db.get_table(self.table_name)
+        old_rows = self._matching_rows()
+        for row in old_rows:
+            table.remove(row)
+        self.db.fire_triggers(self.table_name, old_rows, [])
+        return [dict(r) for r in old_rows]
+
+
+def resolve_relationship(base: str, embed: Embed) -> Tuple[str, str, str]:
+    """
+    Return (kind, fk_column, target_table):
+    kind "one" = base punya FK ke target, "many" = target punya FK ke base
+    """
+    candidates = []
+    for child, column, parent in FOREIGN_KEYS:
+        if child == base and parent == embed.table:
+            candidates.append(("one", column, parent, f"{child}_{column}_fkey"))
+        if child == embed.table and parent == base:
+            candidates.append(("many", column, child, f"{child}_{column}_fkey"))
+    if embed.hint:
+        candidates = [c for c in candidates if embed.hint in (c[1], c[3])]
+    if not candidates:
+        raise APIError({
+            "code": "PGRST200",
+            "message": f"Could not find a relationship between '{base}' and '{embed.table}'",
+        })
+    if len(candidates) > 1:
+        raise APIError({
+            "code": "PGRST201",
+            "message": f"Could not embed because more than one relationship was found for '{base}' and '{embed.table}'",
+        })
+    kind, column, target, _ = candidates[0]
+    return kind, column, target
+
+
+def shape_row(db: LocalDatabase, table: str, row: dict, spec: SelectSpec,
+              embed_filters: List[tuple]) -> Optional[dict]:
+    """Projection kolom + embed; None kalau embed !inner tidak match"""
+    if "*" in spec.columns:
+        result = dict(row)
+    else:
+        result = {c: row.get(c) for c in spec.columns}
+
+    for embed in spec.embeds:
+        kind, column, target = resolve_relationship(table, embed)
+        prefix = embed.alias + "."
+        own_filters = [
+            (f[0][len(prefix):], *f[1:]) for f in embed_filters if f[0].startswith(prefix)
+        ]
+        direct = [f for f in own_filters if "." not in f[0]]
+        target_table = db.get_table(target)
+
+        if kind == "one":
+            parent = target_table.rows.get(row.get(column))
+            value = None
+            if parent is not None and _filter_matches(parent, direct):
+                value = shape_row(db, target, parent, embed.select, own_filters)
+            if embed.inner and value is None:
+                return None
+        else:
+            value = []
+            for child in target_table.lookup(column, row["id"]):
+                if _filter_matches(child, direct):
+                    shaped = shape_row(db, target, child, embed.select, own_filters)
+                    if shaped is not None:
+                        value.append(shaped)
+            if embed.inner and not value:
+                return None
+        result[embed.alias] = value
+    return result
+
+
+class LocalRPC:
+    def __init__(self, db: LocalDatabase, name: str, params: dict):
+        self.db = db
+        self.name = name
+        self.params = params
+
+    @property
+    def trace_label(self) -> str:
+        return f"POST rpc/{self.name}"
+
+    def execute(self) -> LocalResponse:
+        self.db.round_trip()
+        function = self.db.functions.get(self.name)
+        if function is None:
+            raise APIError({
+                "code": "PGRST202",
+                "message": f"Could not find the function public.{self.name}",
+            })
+        with self.db.lock:
+            return LocalResponse(function(self.db, self.params))
+
+
+_database: Optional[LocalDatabase] = None
+_database_lock = threading.Lock()
+
+
+def get_local_database() -> LocalDatabase:
+    """Singleton LocalDatabase (DATABASE_BACKEND=local), di-seed sesuai settings"""
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                from config import settings
+                from .local_seed import seed
+
+                database = LocalDatabase(latency_ms=settings.local_db_latency_ms)
+                if settings.local_db_seed_warehouses:
+                    seed(
+                        database,
+                        warehouses=settings.local_db_seed_warehouses,
+                        farmers_per_warehouse=settings.local_db_seed_farmers,
+                    )
+                _database = database
+    return _database
+
+
+def reset_local_database(database: Optional[LocalDatabase] = None):
+    """Ganti singleton (dipakai test / benchmark)"""
+    global _database
+    with _database_lock:
+        _database = database
@@ -0,0 +1,327 @@
+"""
+Emulasi function + trigger SQL (db/migrations) untuk LocalDatabase.
+
+Setiap function menerima (db, params) dan dijalankan di bawah db.lock, jadi
+atomic seperti satu statement / transaction di Postgres. Semantik mengikuti
+file migration-nya masing-masing.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from postgrest.exceptions import APIError
+
+from .local import now_iso, parse_timestamp
+
+ROLLUP_FIELDS = ("spent", "payments_count", "sacks", "grade_a", "grade_b", "grade_c")
+
+
+def install(db):
+    db.code_counters: Dict[str, int] = {}
+    db.warehouse_versions: Dict[str, int] = defaultdict(int)
+    # (warehouse_id, granularity, bucket_start) -> counters, lihat 003_warehouse_rollups.sql
+    db.rollups: Dict[tuple, Dict[str, float]] = {}
+
+    for trigger in (rollup_trigger, version_trigger):
+        db.triggers.append(lambda table, old, new, trigger=trigger: trigger(db, table, old, new))
+
+    db.functions.update({
+        "allocate_code_block": allocate_code_block,
+        "approve_payment": approve_payment,
+        "attach_harvest_weight": attach_harvest_weight,
+        "data_version": data_version,
+        "farmers_payment_summary": farmers_payment_summary,
+        "warehouse_summary": warehouse_summary,
+        "warehouse_timeseries": warehouse_timeseries,
+    })
+
+
+# ----------------------------------------------------------------------
+# Triggers
+# ----------------------------------------------------------------------
+
+def _warehouse_of_transaction(db, transaction_id: Optional[str]) -> Optional[str]:
+    txn = db.tables["transactions"].rows.get(transaction_id)
+    return txn.get("warehouse_id") if txn else None
+
+
+def _warehouse_of_row(db, table: str, row: dict) -> Optional[str]:
+    if table == "farmers":
+        return row.get("registered_by_warehouse")
+    if table == "transactions":
+        return row.get("warehouse_id")
+    if table == "payments":
+        warehouse_id = _warehouse_of_transaction(db, row.get("transaction_id"))
+        if warehouse_id is None:
+            farmer = db.tables["farmers"].rows.get(row.get("farmer_id"))
+            warehouse_id = farmer.get("registered_by_warehouse") if farmer else None
+        return warehouse_id
+    if table == "harvest_records":
+        return _warehouse_of_transaction(db, row.get("transaction_id"))
+    return None
+
+
+def version_trigger(db, table: str, old_rows: List[dict], new_rows: List[dict]):
+    """008: satu bump per warehouse per statement"""
+    if table not in ("farmers", "transactions", "payments", "harvest_records"):
+        return
+    warehouse_ids = {_warehouse_of_row(db, table, row) for row in old_rows + new_rows}
+    for warehouse_id in warehouse_ids - {None}:
+        db.warehouse_versions[warehouse_id] += 1
+
+
+def _truncate(ts: datetime, granularity: str) -> datetime:
+    ts = ts.astimezone(timezone.utc)
+    if granularity == "minute":
+        return ts.replace(second=0, microsecond=0)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _rollup_apply(db, warehouse_id: str, ts_value: str, sign: int, **deltas):
+    ts = parse_timestamp(ts_value)
+    for granularity in ("minute", "hour"):
+        key = (warehouse_id, granularity, _truncate(ts, granularity))
+        bucket = db.rollups.setdefault(key, dict.fromkeys(ROLLUP_FIELDS, 0))
+        for field, delta in deltas.items():
+            bucket[field] += sign * delta
+
+
+def _rollup_row(db, table: str, row: dict, sign: int):
+    if table == "payments":
+        if row.get("status") != "approved" or row.get("transaction_id") is None:
+            return
+        warehouse_id = _warehouse_of_transaction(db, row["transaction_id"])
+        if warehouse_id is not None:
+            _rollup_apply(
+                db, warehouse_id, row.get("payment_date") or row["created_at"], sign,
+                spent=float(row.get("amount") or 0), payments_count=1,
+            )
+    elif table == "harvest_records":
+        warehouse_id = _warehouse_of_transaction(db, row.get("transaction_id"))
+        if warehouse_id is not None:
+            grade = row.get("grade")
+            _rollup_apply(
+                db, warehouse_id, row.get("recorded_at") or row["created_at"], sign,
+                sacks=1, grade_a=int(grade == "A"), grade_b=int(grade == "B"), grade_c=int(grade == "C"),
+            )
+
+
+def rollup_trigger(db, table: str, old_rows: List[dict], new_rows: List[dict]):
+    """003: maintain rollup minute/hour untuk payments approved & harvest_records"""
+    if table not in ("payments", "harvest_records"):
+        return
+    for row in old_rows:
+        _rollup_row(db, table, row, -1)
+    for row in new_rows:
+        _rollup_row(db, table, row, 1)
+
+
+# ----------------------------------------------------------------------
+# Functions
+# ----------------------------------------------------------------------
+
+def allocate_code_block(db, params: dict) -> int:
+    prefix = params["p_prefix"]
+    db.code_counters[prefix] = db.code_counters.get(prefix, 0) + int(params.get("p_count", 1))
+    return db.code_counters[prefix]
+
+
+def attach_harvest_weight(db, params: dict) -> List[dict]:
+    """009: update weight_kg hanya kalau recording transaction belum complete"""
+    record = db.tables["harvest_records"].rows.get(params["p_record_id"])
+    txn = db.tables["transactions"].rows.get(record.get("transaction_id")) if record else None
+    if txn is None or txn.get("recording_completed_at"):
+        return []
+    return db.table("harvest_records").update({"weight_kg": params["p_weight_kg"]}).eq("id", record["id"])._update()
+
+
+def data_version(db, params: dict) -> int:
+    warehouse_id = params.get("p_warehouse_id")
+    if warehouse_id is None:
+        return sum(db.warehouse_versions.values())
+    return db.warehouse_versions.get(warehouse_id, 0)
+
+
+def approve_payment(db, params: dict) -> List[dict]:
+    status = params["p_status"]
+    if status not in ("approved", "rejected", "pending"):
+        raise APIError({"code": "22023", "message": "Invalid status"})
+
+    payments = db.tables["payments"]
+    payment = payments.rows.get(params["p_payment_id"])
+    if payment is None:
+        raise APIError({"code": "P0002", "message": "Payment not found"})
+
+    txn = None
+    if payment.get("transaction_id") is not None:
+        txn = db.tables["transactions"].rows.get(payment["transaction_id"])
+        if txn is None:
+            raise APIError({"code": "P0002", "message": "Transaction not found"})
+        owner = txn.get("warehouse_id")
+    else:
+        farmer = db.tables["farmers"].rows.get(payment.get("farmer_id"))
+        owner = farmer.get("registered_by_warehouse") if farmer else None
+
+    if owner != params["p_warehouse_id"]:
+        raise APIError({"code": "42501", "message": "Not authorized"})
+
+    now = now_iso()
+    db.table("payments").update({"status": status, "updated_at": now}).eq("id", payment["id"])._update()
+
+    if txn is None:
+        return [{
+            "payment_id": payment["id"], "payment_status": status, "transaction_id": None,
+            "transaction_payment_status": None, "total_approved": None, "total_price": None,
+        }]
+
+    total_approved = sum(
+        float(p.get("amount") or 0)
+        for p in payments.lookup("transaction_id", txn["id"])
+        if p.get("status") == "approved"
+    )
+    total_price = float(txn.get("total_price") or 0) or float(txn.get("initial_price") or 0)
+    txn_status = "paid" if total_price > 0 and total_approved >= total_price else "unpaid"
+
+    changes = {"payment_status": txn_status, "updated_at": now}
+    if txn_status == "paid":
+        changes["payment_completed_at"] = now
+    db.table("transactions").update(changes).eq("id", txn["id"])._update()
+
+    return [{
+        "payment_id": payment["id"], "payment_status": status, "transaction_id": txn["id"],
+        "transaction_payment_status": txn_status, "total_approved": total_approved,
+        "total_price": total_price,
+    }]
+
+
+def warehouse_summary(db, params: dict) -> List[dict]:
+    warehouse_id = params["p_warehouse_id"]
+    farmers_count = sum(
+        1 for f in db.tables["farmers"].lookup("registered_by_warehouse", warehouse_id)
+        if f.get("is_active")
+    )
+    # Rollup 'hour' = total lengkap (di-maintain trigger), jadi tidak perlu scan harvest_records
+    totals = dict.fromkeys(ROLLUP_FIELDS, 0)
+    for (wid, granularity, _), bucket in db.rollups.items():
+        if wid == warehouse_id and granularity == "hour":
+            for field in ROLLUP_FIELDS:
+                totals[field] += bucket[field]
+    return [{
+        "farmers_count": farmers_count,
+        "total_spent": totals["spent"],
+        "grade_a": totals["grade_a"],
+        "grade_b": totals["grade_b"],
+        "grade_c": totals["grade_c"],
+    }]
+
+
+def farmers_payment_summary(db, params: dict) -> List[dict]:
+    farmers = db.tables["farmers"].lookup("registered_by_warehouse", params["p_warehouse_id"])
+    transactions = db.tables["transactions"]
+    payments = db.tables["payments"]
+
+    summary = []
+    for farmer in farmers:
+        txns = transactions.lookup("farmer_id", farmer["id"])
+        total_paid = sum(
+            float(p.get("amount") or 0)
+            for t in txns
+            for p in payments.lookup("transaction_id", t["id"])
+            if p.get("status") == "approved"
+        )
+        summary.append({
+            "id": farmer["id"],
+            "farmer_code": farmer.get("farmer_code"),
+            "full_name": farmer.get("full_name"),
+            "phone": farmer.get("phone"),
+            "bank_name": farmer.get("bank_name"),
+            "is_active": farmer.get("is_active"),
+            "total_transactions": len(txns),
+            "total_paid": total_paid,
+        })
+
+    sort_column = {
+        "totalPaid": "total_paid",
+        "totalTransactions": "total_transactions",
+        "full_name": "full_name",
+    }.get(params.get("p_sort", "full_name"))
+    summary.sort(key=lambda s: s["id"])
+    if sort_column:
+        # Sort stabil (tie tetap urut id); NULL terakhir untuk asc, pertama untuk desc
+        desc = bool(params.get("p_desc"))
+        present = [s for s in summary if s[sort_column] is not None]
+        missing = [s for s in summary if s[sort_column] is None]
+        present.sort(key=lambda s: s[sort_column], reverse=desc)
+        summary = missing + present if desc else present + missing
+
+    total_count = len(summary)
+    offset = params.get("p_offset") or 0
+    limit = params.get("p_limit")
+    page = summary[offset:offset + limit if limit is not None else None]
+    return [{**s, "total_count": total_count} for s in page]
+
+
+def _bucket_local(bucket_start: datetime, granularity: str, tz: ZoneInfo) -> datetime:
+    local = bucket_start.astimezone(tz)
+    if granularity == "minute":
+        local = local.replace(second=0, microsecond=0)
+    elif granularity == "hour":
+        local = local.replace(minute=0, second=0, microsecond=0)
+    else:
+        local = local.replace(hour=0, minute=0, second=0, microsecond=0)
+        if granularity == "week":
+            local -= timedelta(days=local.weekday())
+        # Normalisasi DST: jam lokal 00:00 di tanggal tsb
+        local = local.replace(tzinfo=None).replace(tzinfo=tz)
+    return local.astimezone(timezone.utc)
+
+
+def warehouse_timeseries(db, params: dict) -> List[dict]:
+    """Rollup untuk bucket yang utuh di [p_start, p_end], tepi range dari tabel mentah"""
+    warehouse_id = params["p_warehouse_id"]
+    granularity = params.get("p_granularity") or "hour"
+    tz = ZoneInfo(params.get("p_tz") or "UTC")
+    start = parse_timestamp(params["p_start"])
+    end = parse_timestamp(params["p_end"])
+    # Offset timezone bukan jam penuh: bucket lokal dihitung dari rollup menit
+    whole_hours = all(ts.astimezone(tz).minute == ts.astimezone(timezone.utc).minute for ts in (start, end))
+    source = "hour" if granularity != "minute" and whole_hours else "minute"
+    lo = _truncate(start, source)
+    if lo != start:
+        lo += timedelta(minutes=1) if source == "minute" else timedelta(hours=1)
+    hi = _truncate(end, source)
+
+    entries = [
+        (bucket_start, counters)
+        for (wid, gran, bucket_start), counters in db.rollups.items()
+        if wid == warehouse_id and gran == source and lo <= bucket_start < hi
+    ]
+    for table, ts_field in (("payments", "payment_date"), ("harvest_records", "recorded_at")):
+        for row in db.tables[table].rows.values():
+            if table == "payments" and row.get("status") != "approved":
+                continue
+            if _warehouse_of_transaction(db, row.get("transaction_id")) != warehouse_id:
+                continue
+            ts = parse_timestamp(row.get(ts_field) or row["created_at"])
+            if start <= ts <= end and (ts < lo or ts >= hi):
+                counters = dict.fromkeys(ROLLUP_FIELDS, 0)
+                if table == "payments":
+                    counters.update(spent=float(row.get("amount") or 0), payments_count=1)
+                else:
+                    grade = row.get("grade")
+                    counters.update(sacks=1, grade_a=int(grade == "A"), grade_b=int(grade == "B"),
+                                    grade_c=int(grade == "C"))
+                entries.append((ts, counters))
+
+    buckets: Dict[datetime, Dict[str, Any]] = {}
+    for ts, counters in entries:
+        bucket = _bucket_local(ts, granularity, tz)
+        totals = buckets.setdefault(bucket, dict.fromkeys(ROLLUP_FIELDS, 0))
+        for field in ROLLUP_FIELDS:
+            totals[field] += counters[field]
+
+    return [
+        {"bucket": bucket.isoformat(), **totals}
+        for bucket, totals in sorted(buckets.items())
+    ]
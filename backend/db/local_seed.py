@@ -0,0 +1,163 @@
+"""
+Seeder data realistis untuk LocalDatabase (benchmark / profiling).
+
+Contoh (100 warehouse x 50 petani x 10 transaksi x 40 karung = 2 juta harvest_records):
+    python -m db.local_seed --warehouses 100 --farmers 50 --transactions 10 --sacks 40
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+from .local import LocalDatabase
+
+GRADE_COLORS = [("A", "red", 0.3), ("B", "yellow", 0.45), ("C", "green", 0.25)]
+PRICE_PER_KG = {"A": 12000, "B": 10000, "C": 8000}
+PAYMENT_METHODS = ["transfer", "cash"]
+BANKS = ["BRI", "BNI", "Mandiri", "BCA", None]
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def seed(
+    db: LocalDatabase,
+    warehouses: int = 5,
+    farmers_per_warehouse: int = 200,
+    transactions_per_farmer: int = 5,
+    sacks_per_transaction: int = 20,
+    days: int = 90,
+    paid_ratio: float = 0.7,
+    random_seed: int = 42,
+    chunk_size: int = 10000,
+) -> Dict[str, int]:
+    """
+    Isi db dengan warehouse -> farmers -> transactions -> harvest_records (+ payments
+    approved untuk paid_ratio transaksi). Lewat insert_rows, jadi trigger rollup /
+    version ikut ter-maintain seperti di Postgres. Return jumlah row per tabel.
+    """
+    rng = random.Random(random_seed)
+    now = datetime.now(timezone.utc)
+    grades = [g for g, _, _ in GRADE_COLORS]
+    colors = {g: c for g, c, _ in GRADE_COLORS}
+    weights = [w for _, _, w in GRADE_COLORS]
+
+    counts = dict.fromkeys(["warehouses", "farmers", "transactions", "payments", "harvest_records"], 0)
+    buffers = {name: [] for name in counts}
+
+    def push(table: str, row: dict):
+        buffers[table].append(row)
+        counts[table] += 1
+        if len(buffers[table]) >= chunk_size:
+            flush(table)
+
+    def flush(table: str):
+        if buffers[table]:
+            db.insert_rows(table, buffers[table])
+            buffers[table] = []
+
+    for w in range(warehouses):
+        warehouse_id = _uuid(rng)
+        db.insert_rows("warehouses", [{"id": warehouse_id, "name": f"Gudang {w + 1}"}])
+        counts["warehouses"] += 1
+
+        for f in range(farmers_per_warehouse):
+            farmer_id = _uuid(rng)
+            farmer_created = now - timedelta(days=days, minutes=rng.randint(0, 60 * 24 * 30))
+            push("farmers", {
+                "id": farmer_id,
+                "farmer_code": f"FSEED{counts['farmers']:08X}",
+                "full_name": f"Petani {w + 1}-{f + 1}",
+                "phone": f"08{rng.randint(10 ** 9, 10 ** 10 - 1)}",
+                "bank_name": rng.choice(BANKS),
+                "registered_by_warehouse": warehouse_id,
+                "is_active": rng.random() > 0.05,
+                "created_at": farmer_created.isoformat(),
+            })
+
+            for _ in range(transactions_per_farmer):
+                # Parent harus sudah ada sebelum child supaya trigger bisa resolve warehouse
+                flush("farmers")
+                transaction_id = _uuid(rng)
+                started = now - timedelta(minutes=rng.randint(0, 60 * 24 * days))
+                sack_grades = rng.choices(grades, weights, k=sacks_per_transaction)
+                sack_weights = [round(rng.uniform(80, 120), 1) for _ in sack_grades]
+                total_price = round(sum(PRICE_PER_KG[g] * kg for g, kg in zip(sack_grades, sack_weights)))
+                paid = rng.random() < paid_ratio
+                completed = started + timedelta(minutes=sacks_per_transaction // 2 + 1)
+
+                push("transactions", {
+                    "id": transaction_id,
+                    "transaction_code": f"TXNSEED{counts['transactions']:08d}",
+                    "warehouse_id": warehouse_id,
+                    "farmer_id": farmer_id,
+                    "initial_price": total_price,
+                    "total_weight_kg": round(sum(sack_weights), 1),
+                    "total_price": total_price,
+                    "payment_status": "paid" if paid else "unpaid",
+                    "recording_started_at": started.isoformat(),
+                    "recording_completed_at": completed.isoformat(),
+                    "payment_completed_at": completed.isoformat() if paid else None,
+                    "created_at": started.isoformat(),
+                })
+                flush("transactions")
+
+                for i, (grade, kg) in enumerate(zip(sack_grades, sack_weights)):
+                    recorded = (started + timedelta(seconds=30 * i)).isoformat()
+                    push("harvest_records", {
+                        "id": _uuid(rng),
+                        "transaction_id": transaction_id,
+                        "grade": grade,
+                        "sack_color": colors[grade],
+                        "weight_kg": kg,
+                        "detection_confidence": round(rng.uniform(0.7, 0.99), 3),
+                        "recorded_at": recorded,
+                        "created_at": recorded,
+                    })
+
+                if paid:
+                    push("payments", {
+                        "id": _uuid(rng),
+                        "farmer_id": farmer_id,
+                        "transaction_id": transaction_id,
+                        "amount": total_price,
+                        "payment_method": rng.choice(PAYMENT_METHODS),
+                        "status": "approved",
+                        "payment_date": completed.isoformat(),
+                        "created_at": completed.isoformat(),
+                    })
+
+    for table in buffers:
+        flush(table)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed LocalDatabase dan laporkan waktu / jumlah row")
+    parser.add_argument("--warehouses", type=int, default=5)
+    parser.add_argument("--farmers", type=int, default=200, help="petani per warehouse")
+    parser.add_argument("--transactions", type=int, default=5, help="transaksi per petani")
+    parser.add_argument("--sacks", type=int, default=20, help="karung per transaksi")
+    args = parser.parse_args()
+
+    db = LocalDatabase()
+    started = time.perf_counter()
+    counts = seed(
+        db,
+        warehouses=args.warehouses,
+        farmers_per_warehouse=args.farmers,
+        transactions_per_farmer=args.transactions,
+        sacks_per_transaction=args.sacks,
+    )
+    elapsed = time.perf_counter() - started
+
+    print(f"🌱 Seeded in {elapsed:.1f}s")
+    for table, count in counts.items():
+        print(f"   - {table}: {count:,}")
+
+
+if __name__ == "__main__":
+    main()
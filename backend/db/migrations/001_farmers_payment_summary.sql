@@ -0,0 +1,76 @@
+-- Ringkasan pembayaran per petani untuk satu warehouse dalam satu query
+-- (menggantikan 2 query per petani di /api/dashboard/farmers-payment-summary).
+--
+-- Apply lewat Supabase SQL editor atau `supabase db push`.
+
+create index if not exists transactions_farmer_id_idx on transactions (farmer_id);
+create index if not exists payments_transaction_id_status_idx on payments (transaction_id, status);
+create index if not exists farmers_registered_by_warehouse_idx on farmers (registered_by_warehouse);
+
+create or replace function farmers_payment_summary(
+    p_warehouse_id uuid,
+    p_sort text default 'full_name',
+    p_desc boolean default false,
+    p_limit integer default null,
+    p_offset integer default 0
+)
+returns table (
+    id uuid,
+    farmer_code text,
+    full_name text,
+    phone text,
+    bank_name text,
+    is_active boolean,
+    total_transactions bigint,
+    total_paid numeric,
+    total_count bigint
+)
+language sql
+stable
+as $$
+    with warehouse_farmers as (
+        select f.*
+        from farmers f
+        where f.registered_by_warehouse = p_warehouse_id
+    ),
+    txn as (
+        select t.farmer_id, count(*) as total_transactions
+        from transactions t
+        join warehouse_farmers f on f.id = t.farmer_id
+        group by t.farmer_id
+    ),
+    paid as (
+        select t.farmer_id, sum(p.amount) as total_paid
+        from payments p
+        join transactions t on t.id = p.transaction_id
+        join warehouse_farmers f on f.id = t.farmer_id
+        where p.status = 'approved'
+        group by t.farmer_id
+    ),
+    summary as (
+        select
+            f.id::uuid as id,
+            f.farmer_code::text as farmer_code,
+            f.full_name::text as full_name,
+            f.phone::text as phone,
+            f.bank_name::text as bank_name,
+            f.is_active::boolean as is_active,
+            coalesce(txn.total_transactions, 0)::bigint as total_transactions,
+            coalesce(paid.total_paid, 0)::numeric as total_paid
+        from warehouse_farmers f
+        left join txn on txn.farmer_id = f.id
+        left join paid on paid.farmer_id = f.id
+    )
+    select s.*, count(*) over ()::bigint as total_count
+    from summary s
+    order by
+        case when p_sort = 'totalPaid' and not p_desc then s.total_paid end asc,
+        case when p_sort = 'totalPaid' and p_desc then s.total_paid end desc,
+        case when p_sort = 'totalTransactions' and not p_desc then s.total_transactions end asc,
+        case when p_sort = 'totalTransactions' and p_desc then s.total_transactions end desc,
+        case when p_sort = 'full_name' and not p_desc then s.full_name end asc,
+        case when p_sort = 'full_name' and p_desc then s.full_name end desc,
+        s.id
+    limit p_limit
+    offset p_offset
+$$;
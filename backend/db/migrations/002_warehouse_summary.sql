@@ -0,0 +1,45 @@
+-- Total spent, jumlah petani aktif dan jumlah karung per grade untuk satu
+-- warehouse, dihitung di database (satu row hasil), jadi tidak kena limit
+-- row PostgREST dan payload tetap kecil berapapun riwayat warehouse.
+
+create index if not exists transactions_warehouse_id_idx on transactions (warehouse_id);
+create index if not exists harvest_records_transaction_id_grade_idx on harvest_records (transaction_id, grade);
+
+create or replace function warehouse_summary(p_warehouse_id uuid)
+returns table (
+    farmers_count bigint,
+    total_spent numeric,
+    grade_a bigint,
+    grade_b bigint,
+    grade_c bigint
+)
+language sql
+stable
+as $$
+    select
+        (
+            select count(*)
+            from farmers f
+            where f.registered_by_warehouse = p_warehouse_id
+              and f.is_active
+        )::bigint,
+        (
+            select coalesce(sum(p.amount), 0)
+            from payments p
+            join transactions t on t.id = p.transaction_id
+            where t.warehouse_id = p_warehouse_id
+              and p.status = 'approved'
+        )::numeric,
+        g.grade_a,
+        g.grade_b,
+        g.grade_c
+    from (
+        select
+            count(*) filter (where h.grade = 'A')::bigint as grade_a,
+            count(*) filter (where h.grade = 'B')::bigint as grade_b,
+            count(*) filter (where h.grade = 'C')::bigint as grade_c
+        from harvest_records h
+        join transactions t on t.id = h.transaction_id
+        where t.warehouse_id = p_warehouse_id
+    ) g
+$$;
@@ -0,0 +1,243 @@
+-- Rollup time-series per warehouse (spend, jumlah karung, komposisi grade),
+-- di-maintain incremental oleh trigger pada payments & harvest_records.
+--
+-- Disimpan di dua granularity UTC: 'minute' dan 'hour'. Granularity yang lebih
+-- kasar (day, week) dan bucketing timezone lokal dihitung saat query dari
+-- rollup 'hour' (timezone dengan offset jam penuh seperti WIB/WITA/WIT) atau
+-- 'minute' (offset non-jam penuh seperti +05:30), lihat warehouse_timeseries.
+
+create table if not exists warehouse_rollups (
+    warehouse_id uuid not null,
+    granularity text not null check (granularity in ('minute', 'hour')),
+    bucket_start timestamptz not null,
+    spent numeric not null default 0,
+    payments_count bigint not null default 0,
+    sacks bigint not null default 0,
+    grade_a bigint not null default 0,
+    grade_b bigint not null default 0,
+    grade_c bigint not null default 0,
+    primary key (warehouse_id, granularity, bucket_start)
+);
+
+create or replace function rollup_apply(
+    p_warehouse_id uuid,
+    p_ts timestamptz,
+    d_spent numeric,
+    d_payments bigint,
+    d_sacks bigint,
+    d_a bigint,
+    d_b bigint,
+    d_c bigint
+)
+returns void
+language sql
+as $$
+    insert into warehouse_rollups as r (
+        warehouse_id, granularity, bucket_start,
+        spent, payments_count, sacks, grade_a, grade_b, grade_c
+    )
+    values
+        (p_warehouse_id, 'minute', date_trunc('minute', p_ts, 'UTC'), d_spent, d_payments, d_sacks, d_a, d_b, d_c),
+        (p_warehouse_id, 'hour', date_trunc('hour', p_ts, 'UTC'), d_spent, d_payments, d_sacks, d_a, d_b, d_c)
+    on conflict (warehouse_id, granularity, bucket_start) do update set
+        spent = r.spent + excluded.spent,
+        payments_count = r.payments_count + excluded.payments_count,
+        sacks = r.sacks + excluded.sacks,
+        grade_a = r.grade_a + excluded.grade_a,
+        grade_b = r.grade_b + excluded.grade_b,
+        grade_c = r.grade_c + excluded.grade_c
+$$;
+
+create or replace function rollup_payments_trigger()
+returns trigger
+language plpgsql
+as $$
+declare
+    v_warehouse_id uuid;
+begin
+    if tg_op in ('UPDATE', 'DELETE') and old.status = 'approved' and old.transaction_id is not null then
+        select warehouse_id into v_warehouse_id from transactions where id = old.transaction_id;
+        if v_warehouse_id is not null then
+            perform rollup_apply(v_warehouse_id, coalesce(old.payment_date, old.created_at), -old.amount, -1, 0, 0, 0, 0);
+        end if;
+    end if;
+
+    if tg_op in ('INSERT', 'UPDATE') and new.status = 'approved' and new.transaction_id is not null then
+        select warehouse_id into v_warehouse_id from transactions where id = new.transaction_id;
+        if v_warehouse_id is not null then
+            perform rollup_apply(v_warehouse_id, coalesce(new.payment_date, new.created_at), new.amount, 1, 0, 0, 0, 0);
+        end if;
+    end if;
+
+    return null;
+end;
+$$;
+
+create or replace function rollup_harvest_records_trigger()
+returns trigger
+language plpgsql
+as $$
+declare
+    v_warehouse_id uuid;
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        select warehouse_id into v_warehouse_id from transactions where id = old.transaction_id;
+        if v_warehouse_id is not null then
+            perform rollup_apply(
+                v_warehouse_id, coalesce(old.recorded_at, old.created_at), 0, 0, -1,
+                -(old.grade = 'A')::int, -(old.grade = 'B')::int, -(old.grade = 'C')::int
+            );
+        end if;
+    end if;
+
+    if tg_op in ('INSERT', 'UPDATE') then
+        select warehouse_id into v_warehouse_id from transactions where id = new.transaction_id;
+        if v_warehouse_id is not null then
+            perform rollup_apply(
+                v_warehouse_id, coalesce(new.recorded_at, new.created_at), 0, 0, 1,
+                (new.grade = 'A')::int, (new.grade = 'B')::int, (new.grade = 'C')::int
+            );
+        end if;
+    end if;
+
+    return null;
+end;
+$$;
+
+drop trigger if exists payments_rollup on payments;
+create trigger payments_rollup
+    after insert or update of status, amount, payment_date, transaction_id or delete on payments
+    for each row execute function rollup_payments_trigger();
+
+drop trigger if exists harvest_records_rollup on harvest_records;
+create trigger harvest_records_rollup
+    after insert or update of grade, recorded_at, transaction_id or delete on harvest_records
+    for each row execute function rollup_harvest_records_trigger();
+
+-- Backfill dari data yang sudah ada
+truncate warehouse_rollups;
+
+insert into warehouse_rollups (warehouse_id, granularity, bucket_start, spent, payments_count)
+select t.warehouse_id, g.granularity, date_trunc(g.granularity, coalesce(p.payment_date, p.created_at), 'UTC'),
+       sum(p.amount), count(*)
+from payments p
+join transactions t on t.id = p.transaction_id
+cross join (values ('minute'), ('hour')) as g (granularity)
+where p.status = 'approved'
+group by 1, 2, 3;
+
+insert into warehouse_rollups as r (warehouse_id, granularity, bucket_start, sacks, grade_a, grade_b, grade_c)
+select t.warehouse_id, g.granularity, date_trunc(g.granularity, coalesce(h.recorded_at, h.created_at), 'UTC'),
+       count(*),
+       count(*) filter (where h.grade = 'A'),
+       count(*) filter (where h.grade = 'B'),
+       count(*) filter (where h.grade = 'C')
+from harvest_records h
+join transactions t on t.id = h.transaction_id
+cross join (values ('minute'), ('hour')) as g (granularity)
+group by 1, 2, 3
+on conflict (warehouse_id, granularity, bucket_start) do update set
+    sacks = excluded.sacks,
+    grade_a = excluded.grade_a,
+    grade_b = excluded.grade_b,
+    grade_c = excluded.grade_c;
+
+-- Tepi range yang tidak menutup satu bucket rollup penuh dibaca dari tabel mentah
+create index if not exists payments_rollup_ts_idx
+    on payments ((coalesce(payment_date, created_at))) where status = 'approved';
+create index if not exists harvest_records_rollup_ts_idx
+    on harvest_records ((coalesce(recorded_at, created_at)));
+
+-- Range [p_start, p_end] persis seperti filter payment_date lama:
+-- - bucket rollup yang utuh di dalam range (bucket_start >= lo dan < hi)
+-- - sisa di tepi ([p_start, lo) dan [hi, p_end]) dari payments / harvest_records
+-- Sumber 'hour' hanya kalau offset p_tz jam penuh; offset +05:30 / +05:45 dsb
+-- pakai rollup 'minute' supaya batas hari/minggu lokal tepat.
+create or replace function warehouse_timeseries(
+    p_warehouse_id uuid,
+    p_start timestamptz,
+    p_end timestamptz,
+    p_granularity text default 'hour',
+    p_tz text default 'UTC'
+)
+returns table (
+    bucket timestamptz,
+    spent numeric,
+    payments_count bigint,
+    sacks bigint,
+    grade_a bigint,
+    grade_b bigint,
+    grade_c bigint
+)
+language sql
+stable
+as $$
+    with source as (
+        select case
+            when p_granularity = 'minute' then 'minute'
+            when extract(minute from p_start at time zone p_tz) <> extract(minute from p_start at time zone 'UTC')
+              or extract(minute from p_end at time zone p_tz) <> extract(minute from p_end at time zone 'UTC')
+                then 'minute'
+            else 'hour'
+        end as granularity
+    ),
+    bounds as (
+        select
+            s.granularity,
+            case
+                when date_trunc(s.granularity, p_start, 'UTC') = p_start then p_start
+                else date_trunc(s.granularity, p_start, 'UTC') + ('1 ' || s.granularity)::interval
+            end as lo,
+            date_trunc(s.granularity, p_end, 'UTC') as hi
+        from source s
+    ),
+    entries as (
+        select r.bucket_start as ts, r.spent, r.payments_count, r.sacks, r.grade_a, r.grade_b, r.grade_c
+        from warehouse_rollups r, bounds b
+        where r.warehouse_id = p_warehouse_id
+          and r.granularity = b.granularity
+          and r.bucket_start >= b.lo
+          and r.bucket_start < b.hi
+
+        union all
+
+        select coalesce(p.payment_date, p.created_at), p.amount, 1, 0, 0, 0, 0
+        from payments p
+        join transactions t on t.id = p.transaction_id
+        cross join bounds b
+        where t.warehouse_id = p_warehouse_id
+          and p.status = 'approved'
+          and (
+              (coalesce(p.payment_date, p.created_at) >= p_start
+               and coalesce(p.payment_date, p.created_at) < least(b.lo, p_end + interval '1 microsecond'))
+              or (coalesce(p.payment_date, p.created_at) >= greatest(b.hi, b.lo)
+                  and coalesce(p.payment_date, p.created_at) <= p_end)
+          )
+
+        union all
+
+        select coalesce(h.recorded_at, h.created_at), 0, 0, 1,
+               (h.grade = 'A')::int, (h.grade = 'B')::int, (h.grade = 'C')::int
+        from harvest_records h
+        join transactions t on t.id = h.transaction_id
+        cross join bounds b
+        where t.warehouse_id = p_warehouse_id
+          and (
+              (coalesce(h.recorded_at, h.created_at) >= p_start
+               and coalesce(h.recorded_at, h.created_at) < least(b.lo, p_end + interval '1 microsecond'))
+              or (coalesce(h.recorded_at, h.created_at) >= greatest(b.hi, b.lo)
+                  and coalesce(h.recorded_at, h.created_at) <= p_end)
+          )
+    )
+    select
+        date_trunc(p_granularity, e.ts, p_tz) as bucket,
+        sum(e.spent)::numeric,
+        sum(e.payments_count)::bigint,
+        sum(e.sacks)::bigint,
+        sum(e.grade_a)::bigint,
+        sum(e.grade_b)::bigint,
+        sum(e.grade_c)::bigint
+    from entries e
+    group by 1
+    order by 1
+$$;
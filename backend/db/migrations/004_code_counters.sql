@@ -0,0 +1,31 @@
+-- Counter atomic untuk transaction_code / farmer_code.
+-- allocate_code_block mengalokasikan satu blok nomor sekaligus
+-- (return nomor terakhir di blok), jadi aman dipanggil paralel dari
+-- banyak worker tanpa duplikat.
+
+create table if not exists code_counters (
+    prefix text primary key,
+    last_value bigint not null default 0
+);
+
+create or replace function allocate_code_block(p_prefix text, p_count integer default 1)
+returns bigint
+language sql
+volatile
+as $$
+    insert into code_counters as c (prefix, last_value)
+    values (p_prefix, p_count)
+    on conflict (prefix) do update set last_value = c.last_value + excluded.last_value
+    returning last_value
+$$;
+
+-- Lanjutkan dari kode transaksi yang sudah ada (format TXN{YYYYMMDD}{NNNN}).
+-- Hanya nomor urut 4-5 digit: kode fallback lama TXN{YYYYMMDDHHMMSS}
+-- (14 digit) bukan nomor urut dan akan membuat counter lompat ke ~10^13.
+insert into code_counters (prefix, last_value)
+select substr(transaction_code, 1, 11), max(substr(transaction_code, 12)::bigint)
+from transactions
+where transaction_code ~ '^TXN[0-9]{12,13}$'
+group by 1
+on conflict (prefix) do update set
+    last_value = greatest(code_counters.last_value, excluded.last_value);
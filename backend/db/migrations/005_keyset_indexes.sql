@@ -0,0 +1,10 @@
+-- Index untuk keyset pagination (created_at DESC, id DESC) di list endpoints.
+
+create index if not exists payments_created_at_id_idx
+    on payments (created_at desc, id desc);
+
+create index if not exists transactions_warehouse_created_at_id_idx
+    on transactions (warehouse_id, created_at desc, id desc);
+
+create index if not exists farmers_warehouse_created_at_id_idx
+    on farmers (registered_by_warehouse, created_at desc, id desc);
@@ -0,0 +1,4 @@
+-- Keyset pagination (created_at DESC, id DESC) untuk export harvest records.
+
+create index if not exists harvest_records_created_at_id_idx
+    on harvest_records (created_at desc, id desc);
@@ -0,0 +1,90 @@
+-- Approve / reject payment secara atomic dalam satu round trip:
+-- update status payment, hitung ulang total approved, lalu set
+-- payment_status / payment_completed_at transaction.
+-- Row transaction di-lock (FOR UPDATE), jadi dua clerk yang approve
+-- payment untuk transaction yang sama diproses berurutan dan
+-- payment_status selalu konsisten dengan total approved terakhir.
+--
+-- Error (dipetakan ke HTTP status di routers/payments.py):
+--   P0002 Payment / Transaction not found  -> 404
+--   42501 Not authorized                   -> 403
+--   22023 Invalid status                   -> 400
+
+create index if not exists payments_transaction_id_status_idx on payments (transaction_id, status);
+
+create or replace function approve_payment(
+    p_payment_id uuid,
+    p_warehouse_id uuid,
+    p_status text
+)
+returns table (
+    payment_id uuid,
+    payment_status text,
+    transaction_id uuid,
+    transaction_payment_status text,
+    total_approved numeric,
+    total_price numeric
+)
+language plpgsql
+volatile
+as $$
+declare
+    v_payment payments%rowtype;
+    v_txn transactions%rowtype;
+    v_owner uuid;
+    v_total_approved numeric;
+    v_total_price numeric;
+    v_txn_status text;
+begin
+    if p_status not in ('approved', 'rejected', 'pending') then
+        raise exception 'Invalid status' using errcode = '22023';
+    end if;
+
+    select * into v_payment from payments p where p.id = p_payment_id for update;
+    if not found then
+        raise exception 'Payment not found' using errcode = 'P0002';
+    end if;
+
+    if v_payment.transaction_id is not null then
+        select * into v_txn from transactions t where t.id = v_payment.transaction_id for update;
+        if not found then
+            raise exception 'Transaction not found' using errcode = 'P0002';
+        end if;
+        v_owner := v_txn.warehouse_id;
+    else
+        -- Payment belum attached ke transaction: cek ownership lewat farmer
+        select f.registered_by_warehouse into v_owner from farmers f where f.id = v_payment.farmer_id;
+    end if;
+
+    if v_owner is distinct from p_warehouse_id then
+        raise exception 'Not authorized' using errcode = '42501';
+    end if;
+
+    update payments p set status = p_status, updated_at = now() where p.id = p_payment_id;
+
+    if v_payment.transaction_id is null then
+        return query select p_payment_id, p_status, null::uuid, null::text, null::numeric, null::numeric;
+        return;
+    end if;
+
+    select coalesce(sum(p.amount), 0) into v_total_approved
+    from payments p
+    where p.transaction_id = v_payment.transaction_id
+      and p.status = 'approved';
+
+    v_total_price := coalesce(nullif(v_txn.total_price, 0), nullif(v_txn.initial_price, 0), 0);
+    v_txn_status := case
+        when v_total_approved >= v_total_price and v_total_price > 0 then 'paid'
+        else 'unpaid'
+    end;
+
+    update transactions t set
+        payment_status = v_txn_status,
+        payment_completed_at = case when v_txn_status = 'paid' then now() else t.payment_completed_at end,
+        updated_at = now()
+    where t.id = v_payment.transaction_id;
+
+    return query select
+        p_payment_id, p_status, v_payment.transaction_id, v_txn_status, v_total_approved, v_total_price;
+end;
+$$;
@@ -0,0 +1,183 @@
+-- Version counter per warehouse untuk ETag / conditional GET.
+-- Naik setiap ada insert/update/delete di farmers, transactions, payments
+-- atau harvest_records milik warehouse tersebut. Trigger level statement
+-- (transition table), jadi bulk insert 500 row = satu bump per warehouse.
+
+create table if not exists warehouse_versions (
+    warehouse_id uuid primary key,
+    version bigint not null default 0,
+    updated_at timestamptz not null default now()
+);
+
+create or replace function bump_warehouse_versions(p_warehouse_ids uuid[])
+returns void
+language sql
+as $$
+    insert into warehouse_versions as v (warehouse_id, version, updated_at)
+    select w, 1, now()
+    from (select distinct w from unnest(p_warehouse_ids) as w where w is not null) ids
+    order by w
+    on conflict (warehouse_id) do update set
+        version = v.version + 1,
+        updated_at = now()
+$$;
+
+create or replace function version_farmers_trigger()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op = 'INSERT' then
+        perform bump_warehouse_versions(array(select registered_by_warehouse from new_rows));
+    elsif tg_op = 'UPDATE' then
+        perform bump_warehouse_versions(array(
+            select registered_by_warehouse from new_rows
+            union select registered_by_warehouse from old_rows
+        ));
+    else
+        perform bump_warehouse_versions(array(select registered_by_warehouse from old_rows));
+    end if;
+    return null;
+end;
+$$;
+
+create or replace function version_transactions_trigger()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op = 'INSERT' then
+        perform bump_warehouse_versions(array(select warehouse_id from new_rows));
+    elsif tg_op = 'UPDATE' then
+        perform bump_warehouse_versions(array(
+            select warehouse_id from new_rows
+            union select warehouse_id from old_rows
+        ));
+    else
+        perform bump_warehouse_versions(array(select warehouse_id from old_rows));
+    end if;
+    return null;
+end;
+$$;
+
+-- Payments: warehouse dari transaction, atau dari farmer kalau belum attached
+create or replace function version_payments_trigger()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op = 'INSERT' then
+        perform bump_warehouse_versions(array(
+            select coalesce(t.warehouse_id, f.registered_by_warehouse)
+            from new_rows r
+            left join transactions t on t.id = r.transaction_id
+            left join farmers f on f.id = r.farmer_id
+        ));
+    elsif tg_op = 'UPDATE' then
+        perform bump_warehouse_versions(array(
+            select coalesce(t.warehouse_id, f.registered_by_warehouse)
+            from (select transaction_id, farmer_id from new_rows
+                  union select transaction_id, farmer_id from old_rows) r
+            left join transactions t on t.id = r.transaction_id
+            left join farmers f on f.id = r.farmer_id
+        ));
+    else
+        perform bump_warehouse_versions(array(
+            select coalesce(t.warehouse_id, f.registered_by_warehouse)
+            from old_rows r
+            left join transactions t on t.id = r.transaction_id
+            left join farmers f on f.id = r.farmer_id
+        ));
+    end if;
+    return null;
+end;
+$$;
+
+create or replace function version_harvest_records_trigger()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op = 'INSERT' then
+        perform bump_warehouse_versions(array(
+            select t.warehouse_id from new_rows r join transactions t on t.id = r.transaction_id
+        ));
+    elsif tg_op = 'UPDATE' then
+        perform bump_warehouse_versions(array(
+            select t.warehouse_id
+            from (select transaction_id from new_rows union select transaction_id from old_rows) r
+            join transactions t on t.id = r.transaction_id
+        ));
+    else
+        perform bump_warehouse_versions(array(
+            select t.warehouse_id from old_rows r join transactions t on t.id = r.transaction_id
+        ));
+    end if;
+    return null;
+end;
+$$;
+
+-- Transition table hanya boleh untuk satu event per trigger
+drop trigger if exists farmers_version_insert on farmers;
+drop trigger if exists farmers_version_update on farmers;
+drop trigger if exists farmers_version_delete on farmers;
+create trigger farmers_version_insert after insert on farmers
+    referencing new table as new_rows
+    for each statement execute function version_farmers_trigger();
+create trigger farmers_version_update after update on farmers
+    referencing new table as new_rows old table as old_rows
+    for each statement execute function version_farmers_trigger();
+create trigger farmers_version_delete after delete on farmers
+    referencing old table as old_rows
+    for each statement execute function version_farmers_trigger();
+
+drop trigger if exists transactions_version_insert on transactions;
+drop trigger if exists transactions_version_update on transactions;
+drop trigger if exists transactions_version_delete on transactions;
+create trigger transactions_version_insert after insert on transactions
+    referencing new table as new_rows
+    for each statement execute function version_transactions_trigger();
+create trigger transactions_version_update after update on transactions
+    referencing new table as new_rows old table as old_rows
+    for each statement execute function version_transactions_trigger();
+create trigger transactions_version_delete after delete on transactions
+    referencing old table as old_rows
+    for each statement execute function version_transactions_trigger();
+
+drop trigger if exists payments_version_insert on payments;
+drop trigger if exists payments_version_update on payments;
+drop trigger if exists payments_version_delete on payments;
+create trigger payments_version_insert after insert on payments
+    referencing new table as new_rows
+    for each statement execute function version_payments_trigger();
+create trigger payments_version_update after update on payments
+    referencing new table as new_rows old table as old_rows
+    for each statement execute function version_payments_trigger();
+create trigger payments_version_delete after delete on payments
+    referencing old table as old_rows
+    for each statement execute function version_payments_trigger();
+
+drop trigger if exists harvest_records_version_insert on harvest_records;
+drop trigger if exists harvest_records_version_update on harvest_records;
+drop trigger if exists harvest_records_version_delete on harvest_records;
+create trigger harvest_records_version_insert after insert on harvest_records
+    referencing new table as new_rows
+    for each statement execute function version_harvest_records_trigger();
+create trigger harvest_records_version_update after update on harvest_records
+    referencing new table as new_rows old table as old_rows
+    for each statement execute function version_harvest_records_trigger();
+create trigger harvest_records_version_delete after delete on harvest_records
+    referencing old table as old_rows
+    for each statement execute function version_harvest_records_trigger();
+
+-- Version untuk satu warehouse; tanpa warehouse = jumlah semua version
+-- (tetap naik setiap ada perubahan di warehouse manapun)
+create or replace function data_version(p_warehouse_id uuid default null)
+returns bigint
+language sql
+stable
+as $$
+    select coalesce(sum(version), 0)::bigint
+    from warehouse_versions
+    where p_warehouse_id is null or warehouse_id = p_warehouse_id
+$$;
@@ -0,0 +1,23 @@
+-- Pasang berat timbangan ke harvest record dalam satu statement, hanya selama
+-- recording transaction-nya belum complete: total_weight_kg / total_price
+-- dihitung dari weight_kg saat complete-recording, jadi berat yang settle
+-- sesudahnya tidak boleh mengubah record lagi.
+-- Return row yang diupdate; kosong = tidak bisa dipasang (record tidak ada
+-- atau recording sudah complete).
+
+create or replace function attach_harvest_weight(
+    p_record_id uuid,
+    p_weight_kg numeric
+)
+returns setof harvest_records
+language sql
+volatile
+as $$
+    update harvest_records h
+    set weight_kg = p_weight_kg
+    from transactions t
+    where h.id = p_record_id
+      and t.id = h.transaction_id
+      and t.recording_completed_at is null
+    returning h.*
+$$;
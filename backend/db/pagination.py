@@ -0,0 +1,81 @@
+import base64
+import json
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from .query import execute
+
+# Kolom cursor selalu ikut di-select supaya next_cursor bisa dibuat
+CURSOR_COLUMNS = ("created_at", "id")
+
+
+def encode_cursor(row: dict) -> str:
+    raw = json.dumps([row["created_at"], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(created_at), str(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def select_fields(fields: Optional[str], allowed: Iterable[str]) -> str:
+    """
+    Projection dari query param fields=a,b,c (whitelist).
+    Tanpa fields -> "*" (response sama seperti sebelum ada projection);
+    whitelist hanya untuk validasi fields yang diminta eksplisit.
+    """
+    if not fields:
+        return "*"
+    allowed = list(allowed)
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    for column in CURSOR_COLUMNS:
+        if column not in requested:
+            requested.append(column)
+    return ", ".join(requested)
+
+
+def after_cursor(query, cursor: str):
+    """
+    Keyset filter untuk urutan (created_at DESC, id DESC).
+    Filter lte yang redundant jadi Index Cond, supaya scan mulai dari posisi cursor
+    (PostgREST tidak punya row comparison (created_at, id) < (x, y)).
+    """
+    created_at, row_id = decode_cursor(cursor)
+    return query.lte("created_at", created_at).or_(
+        f'created_at.lt."{created_at}",'
+        f'and(created_at.eq."{created_at}",id.lt."{row_id}")'
+    )
+
+
+async def fetch_page(query, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Ambil satu halaman dengan keyset pagination di (created_at, id).
+    Biaya per halaman konstan (index range scan), tidak tergantung kedalaman halaman.
+    Return (rows, next_cursor); next_cursor None kalau sudah halaman terakhir.
+    """
+    if cursor:
+        query = after_cursor(query, cursor)
+
+    response = await execute(
+        query
+        .order("created_at", desc=True)
+        .order("id", desc=True)
+        .limit(limit + 1)
+    )
+    rows = response.data or []
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
@@ -0,0 +1,89 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+import anyio
+
+from config import settings
+
+_limiter: Optional[anyio.CapacityLimiter] = None
+
+
+def _get_limiter() -> anyio.CapacityLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = anyio.CapacityLimiter(settings.db_max_concurrency)
+    return _limiter
+
+
+class QueryTrace:
+    """Round trip database dalam satu request: (target, durasi ms) per query"""
+
+    def __init__(self):
+        self.queries: List[Tuple[str, float]] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(ms for _, ms in self.queries)
+
+    def record(self, target: str, duration_ms: float):
+        self.queries.append((target, duration_ms))
+
+
+# Stack trace aktif (nested: middleware di dalam test budget), ikut context asyncio
+_traces: ContextVar[Tuple[QueryTrace, ...]] = ContextVar("query_traces", default=())
+
+
+@contextmanager
+def trace_queries() -> Iterator[QueryTrace]:
+    """
+    Catat semua execute() di context ini (dan task yang dibuat dari sini).
+
+    Usage:
+        with trace_queries() as trace:
+            ...
+        print(trace.count, trace.total_ms)
+    """
+    trace = QueryTrace()
+    token = _traces.set(_traces.get() + (trace,))
+    try:
+        yield trace
+    finally:
+        _traces.reset(token)
+
+
+def query_target(query) -> str:
+    """Label query untuk trace, contoh: GET farmers, POST rpc/data_version"""
+    request = getattr(query, "request", None)
+    if request is not None:
+        name = request.path.path.split("/rest/v1/", 1)[-1]
+        return f"{request.http_method.value} {name}"
+    return getattr(query, "trace_label", type(query).__name__)
+
+
+async def execute(query):
+    """
+    Jalankan query builder supabase-py (sync .execute()) di worker thread,
+    dibatasi db_max_concurrency, supaya event loop tidak ke-block dan
+    request I/O-bound bisa interleave.
+
+    Usage:
+        response = await execute(supabase.table("farmers").select("*").eq("id", farmer_id))
+    """
+    traces = _traces.get()
+    if not traces:
+        return await anyio.to_thread.run_sync(query.execute, limiter=_get_limiter())
+
+    started = time.perf_counter()
+    try:
+        return await anyio.to_thread.run_sync(query.execute, limiter=_get_limiter())
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        target = query_target(query)
+        for trace in traces:
+            trace.record(target, duration_ms)
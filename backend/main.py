@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import uvicorn
@@ -6,7 +7,13 @@ import logging
 
 from config import settings
 from models.sack_detector import get_detector
-from routers import detect, transactions, payments, farmers, ml_harvest, dashboard
+from models.online_learner import get_online_learner
+from services.health import readiness
+from services.tracing import QueryTracingMiddleware
+from services.journal import harvest_journal
+from services.events import event_broker
+from db import close_supabase_client
+from routers import detect, transactions, payments, farmers, ml_harvest, dashboard, export, sync, events, scale
 
 logging.basicConfig(
     level="INFO" if not settings.DEBUG else "DEBUG",
@@ -33,8 +40,28 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to load model: {e}")
         raise
     
+    warmup_ms = detector.warm_up(settings.warmup_rounds)
+    readiness.mark_warmed_up(detector.model_version, warmup_ms)
+    print(f"🔥 Warm-up done: {warmup_ms:.2f} ms/inference")
+    await readiness.check_database()
+    
+    learner = None
+    if settings.online_learning_enabled:
+        learner = get_online_learner(detector, settings.online_learning_dir)
+        learner.start()
+    
+    if settings.write_behind_enabled:
+        harvest_journal.start()
+    
     yield
     
+    if settings.write_behind_enabled:
+        await harvest_journal.stop()
+        harvest_journal.close()
+    if learner is not None:
+        learner.stop()
+    close_supabase_client()
+    
     print("\n🛑 Shutdown\n")
     logger.info("Application shutdown")
 
@@ -53,6 +80,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(QueryTracingMiddleware)
+
 logger.info(f"CORS enabled for origins: {settings.cors_origins_list}")
 
 app.include_router(detect.router)
@@ -61,6 +90,10 @@ app.include_router(payments.router)
 app.include_router(farmers.router)
 app.include_router(ml_harvest.router)
 app.include_router(dashboard.router)
+app.include_router(export.router)
+app.include_router(sync.router)
+app.include_router(events.router)
+app.include_router(scale.router)
 
 
 @app.get("/")
@@ -76,6 +109,31 @@ def root():
 def health():
     return {"status": "healthy", "service": "ml-detection"}
 
+@app.get("/health/live")
+def liveness():
+    """Liveness: proses hidup & event loop merespon"""
+    return {"status": "alive", "service": "ml-detection"}
+
+@app.get("/health/ready")
+async def ready():
+    """
+    Readiness: model sudah warm-up dan Supabase reachable dengan latency wajar.
+    Return 503 kalau belum siap supaya load balancer tidak route ke instance ini.
+    """
+    await readiness.check_database()
+    report = readiness.report()
+    if readiness.warmed_up:
+        report["model_version"] = get_detector(
+            settings.model_path,
+            settings.meta_path,
+            settings.features_path
+        ).model_version
+    if settings.write_behind_enabled:
+        report["harvest_journal"] = harvest_journal.stats()
+    report["events"] = event_broker.stats()
+    status_code = 200 if report["status"] == "ready" else 503
+    return JSONResponse(status_code=status_code, content=report)
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     logger.error(f"Unhandled exception: {exc}")
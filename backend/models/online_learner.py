@@ -0,0 +1,250 @@
+import copy
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+import joblib
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+
+class IncrementalGradeModel:
+    """
+    Classifier yang bisa di-update sedikit-sedikit (partial_fit).
+    Interface predict / predict_proba sama dengan model SVM, jadi bisa
+    langsung dipasang ke SackColorSVM lewat swap_model().
+    """
+
+    def __init__(self, n_classes: int):
+        self.classes = np.arange(n_classes)
+        self.scaler = StandardScaler()
+        self.clf = SGDClassifier(loss="log_loss", alpha=1e-4, random_state=42)
+        self.n_seen = 0
+
+    def partial_fit(self, X: np.ndarray, y: np.ndarray):
+        self.scaler.partial_fit(X)
+        self.clf.partial_fit(self.scaler.transform(X), y, classes=self.classes)
+        self.n_seen += len(y)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.clf.predict(self.scaler.transform(X))
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.clf.predict_proba(self.scaler.transform(X))
+
+
+class OnlineLearner:
+    """
+    Belajar dari grade yang sudah dikonfirmasi/dikoreksi clerk.
+
+    Flow:
+    1. detect-and-save menyimpan feature vector per harvest record (remember_features)
+    2. clerk konfirmasi grade -> submit(features, label), non-blocking
+    3. worker thread: sebagian sample masuk held-out buffer, sisanya partial_fit ke candidate
+    4. candidate dipublish (versi baru) hanya kalau akurasinya di held-out buffer
+       lebih tinggi dari model yang sedang dipakai
+    """
+
+    def __init__(
+        self,
+        detector,
+        storage_dir: str,
+        holdout_every: int = 5,
+        holdout_size: int = 500,
+        min_holdout: int = 30,
+        batch_size: int = 16,
+        max_remembered: int = 5000,
+    ):
+        self.detector = detector
+        self.storage_dir = storage_dir
+        self.holdout_every = holdout_every
+        self.min_holdout = min_holdout
+        self.batch_size = batch_size
+        self.max_remembered = max_remembered
+
+        n_classes = len(detector.metadata["classes"])
+        self.candidate = IncrementalGradeModel(n_classes)
+        self.holdout_X: deque = deque(maxlen=holdout_size)
+        self.holdout_y: deque = deque(maxlen=holdout_size)
+        self.published_versions = 0
+        self.n_confirmed = 0
+
+        self._features: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._features_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=10000)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Request path (harus cepat, tidak boleh blocking)
+    # ------------------------------------------------------------------
+
+    def remember_features(self, record_id: str, features: np.ndarray):
+        with self._features_lock:
+            self._features[record_id] = np.asarray(features, dtype=np.float32)
+            self._features.move_to_end(record_id)
+            while len(self._features) > self.max_remembered:
+                self._features.popitem(last=False)
+
+    def pop_features(self, record_id: str) -> Optional[np.ndarray]:
+        with self._features_lock:
+            return self._features.pop(record_id, None)
+
+    def submit(self, features: np.ndarray, label_idx: int) -> bool:
+        try:
+            self._queue.put_nowait((np.asarray(features, dtype=np.float32), int(label_idx)))
+            return True
+        except queue.Full:
+            print("⚠️  Online learning queue full, sample dropped")
+            return False
+
+    # ------------------------------------------------------------------
+    # Background worker
+    # ------------------------------------------------------------------
+
+    def start(self):
+        os.makedirs(self.storage_dir, exist_ok=True)
+        self._load_state()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="online-learner", daemon=True)
+        self._thread.start()
+        print(f"🧠 Online learner started (model {self.detector.model_version})")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._save_state()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self._learn(batch)
+            except Exception as e:
+                print(f"❌ Online learning step failed: {e}")
+
+    def _next_batch(self) -> list:
+        try:
+            batch = [self._queue.get(timeout=1.0)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _learn(self, batch: list):
+        train_X, train_y = [], []
+        for features, label in batch:
+            self.n_confirmed += 1
+            if self.n_confirmed % self.holdout_every == 0:
+                self.holdout_X.append(features)
+                self.holdout_y.append(label)
+            else:
+                train_X.append(features)
+                train_y.append(label)
+
+        if train_X:
+            started = time.perf_counter()
+            self.candidate.partial_fit(np.vstack(train_X), np.array(train_y))
+            print(
+                f"🧠 partial_fit {len(train_X)} samples "
+                f"({(time.perf_counter() - started) * 1000:.1f} ms, seen={self.candidate.n_seen})"
+            )
+
+        self._maybe_publish()
+
+    def _accuracy(self, model, X: np.ndarray, y: np.ndarray) -> float:
+        try:
+            return float((model.predict(X).astype(int) == y).mean())
+        except Exception:
+            return 0.0
+
+    def _maybe_publish(self):
+        if len(self.holdout_y) < self.min_holdout or self.candidate.n_seen == 0:
+            return
+
+        X = np.vstack(self.holdout_X)
+        y = np.array(self.holdout_y)
+        current_acc = self._accuracy(self.detector.model, X, y)
+        candidate_acc = self._accuracy(self.candidate, X, y)
+
+        if candidate_acc <= current_acc:
+            return
+
+        self.published_versions += 1
+        version = f"online-{int(time.time())}-{self.published_versions}"
+        published = copy.deepcopy(self.candidate)
+
+        path = os.path.join(self.storage_dir, f"model_{version}.joblib")
+        joblib.dump(published, path)
+        with open(os.path.join(self.storage_dir, "published.json"), "w") as f:
+            json.dump({
+                "version": version,
+                "path": os.path.basename(path),
+                "holdout_accuracy": candidate_acc,
+                "previous_accuracy": current_acc,
+                "holdout_size": len(y),
+                "published_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }, f, indent=2)
+
+        self.detector.swap_model(published, version)
+        print(f"   ✅ Published {version}: {current_acc:.3f} -> {candidate_acc:.3f} on {len(y)} held-out samples")
+        self._save_state()
+
+    # ------------------------------------------------------------------
+    # Persistence (supaya buffer & model tidak hilang saat restart)
+    # ------------------------------------------------------------------
+
+    def _state_path(self) -> str:
+        return os.path.join(self.storage_dir, "learner_state.joblib")
+
+    def _save_state(self):
+        try:
+            joblib.dump({
+                "candidate": self.candidate,
+                "holdout_X": list(self.holdout_X),
+                "holdout_y": list(self.holdout_y),
+                "n_confirmed": self.n_confirmed,
+                "published_versions": self.published_versions,
+            }, self._state_path())
+        except Exception as e:
+            print(f"⚠️  Failed to save online learner state: {e}")
+
+    def _load_state(self):
+        try:
+            if os.path.exists(self._state_path()):
+                state = joblib.load(self._state_path())
+                self.candidate = state["candidate"]
+                self.holdout_X.extend(state["holdout_X"])
+                self.holdout_y.extend(state["holdout_y"])
+                self.n_confirmed = state["n_confirmed"]
+                self.published_versions = state["published_versions"]
+
+            published_path = os.path.join(self.storage_dir, "published.json")
+            if os.path.exists(published_path):
+                with open(published_path) as f:
+                    published = json.load(f)
+                model = joblib.load(os.path.join(self.storage_dir, published["path"]))
+                self.detector.swap_model(model, published["version"])
+        except Exception as e:
+            print(f"⚠️  Failed to load online learner state: {e}")
+
+
+_learner: Optional[OnlineLearner] = None
+
+def get_online_learner(detector=None, storage_dir: str = "models/online") -> Optional[OnlineLearner]:
+    global _learner
+    if _learner is None and detector is not None:
+        _learner = OnlineLearner(detector, storage_dir)
+    return _learner
@@ -0,0 +1,237 @@
+"""
+Training pipeline untuk model SVM warna karung.
+
+Pakai feature extractor yang sama persis dengan serving
+(extract_features_v2_fallback), dijalankan paralel di process pool.
+Feature matrix di-cache sebagai .npy (memory-mapped) dengan key hash image set,
+jadi retrain setelah menambah beberapa gambar hanya extract file yang baru.
+
+Struktur dataset:
+    <data_dir>/merah/*.jpg
+    <data_dir>/kuning/*.jpg
+    <data_dir>/hijau/*.jpg
+
+Usage:
+    python -m models.training --data-dir dataset/ --output models/model_svm_karung.joblib
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import joblib
+import numpy as np
+from sklearn.model_selection import GridSearchCV, StratifiedKFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+
+from models.sack_detector import extract_features_v2_fallback
+
+EXTRACTOR_NAME = "extract_features_v2_fallback"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+PARAM_GRID = {
+    "scaler": [StandardScaler(), "passthrough"],
+    "svc__C": [1.0, 10.0, 100.0],
+    "svc__gamma": ["scale", 0.01, 0.001],
+}
+
+
+def list_images(data_dir: str, classes: List[str]) -> List[Tuple[str, int]]:
+    """Return [(path, label_idx)] terurut, label sesuai urutan classes di metadata"""
+    items = []
+    for label_idx, class_name in enumerate(classes):
+        class_dir = os.path.join(data_dir, class_name)
+        for path in sorted(glob.glob(os.path.join(class_dir, "*"))):
+            if path.lower().endswith(IMAGE_EXTENSIONS):
+                items.append((path, label_idx))
+    return items
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def image_set_hash(keys: List[str], labels: List[int]) -> str:
+    h = hashlib.sha1(EXTRACTOR_NAME.encode())
+    for key, label in zip(keys, labels):
+        h.update(f"{key}:{label}\n".encode())
+    return h.hexdigest()[:16]
+
+
+def _extract_file(path: str) -> np.ndarray:
+    """Decode persis seperti di serving: BGR -> RGB -> extract_features_v2_fallback"""
+    img_bgr = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img_bgr is None:
+        raise ValueError(f"Failed to decode image: {path}")
+    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+    return extract_features_v2_fallback(img_rgb)
+
+
+def _known_rows(cache_dir: str) -> Dict[str, Tuple[str, int]]:
+    """Map file hash -> (npy path, row) dari semua cache yang sudah ada"""
+    known: Dict[str, Tuple[str, int]] = {}
+    index_paths = sorted(
+        glob.glob(os.path.join(cache_dir, "features_*.json")),
+        key=os.path.getmtime,
+    )
+    for index_path in index_paths:
+        with open(index_path) as f:
+            index = json.load(f)
+        if index.get("extractor") != EXTRACTOR_NAME:
+            continue
+        npy_path = index_path[:-len(".json")] + ".npy"
+        if not os.path.exists(npy_path):
+            continue
+        for row, key in enumerate(index["keys"]):
+            known[key] = (npy_path, row)
+    return known
+
+
+def build_feature_matrix(
+    items: List[Tuple[str, int]],
+    cache_dir: str,
+    workers: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray, str]:
+    """
+    Return (X memory-mapped read-only, y, set_hash).
+    Hanya file yang belum pernah di-extract yang diproses ulang.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+
+    paths = [p for p, _ in items]
+    labels = [label for _, label in items]
+    keys = [file_hash(p) for p in paths]
+    set_hash = image_set_hash(keys, labels)
+    y = np.array(labels, dtype=np.int64)
+
+    npy_path = os.path.join(cache_dir, f"features_{set_hash}.npy")
+    index_path = os.path.join(cache_dir, f"features_{set_hash}.json")
+
+    if os.path.exists(npy_path) and os.path.exists(index_path):
+        print(f"✅ Feature cache hit: {npy_path}")
+        return np.load(npy_path, mmap_mode="r"), y, set_hash
+
+    known = _known_rows(cache_dir)
+    missing = [i for i, key in enumerate(keys) if key not in known]
+    print(f"🔄 {len(keys) - len(missing)} cached, {len(missing)} to extract")
+
+    started = time.perf_counter()
+    extracted: Dict[int, np.ndarray] = {}
+    if missing:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(missing) // ((workers or os.cpu_count() or 1) * 4))
+            results = pool.map(_extract_file, [paths[i] for i in missing], chunksize=chunksize)
+            for i, features in zip(missing, results):
+                extracted[i] = features
+        print(f"   ✅ Extracted {len(missing)} files in {time.perf_counter() - started:.1f}s")
+
+    n_features = (
+        len(next(iter(extracted.values()))) if extracted
+        else np.load(next(iter(known.values()))[0], mmap_mode="r").shape[1]
+    )
+
+    tmp_path = npy_path + ".tmp"
+    X = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(len(keys), n_features))
+    sources: Dict[str, np.ndarray] = {}
+    for row, key in enumerate(keys):
+        if row in extracted:
+            X[row] = extracted[row]
+        else:
+            src_path, src_row = known[key]
+            if src_path not in sources:
+                sources[src_path] = np.load(src_path, mmap_mode="r")
+            X[row] = sources[src_path][src_row]
+    X.flush()
+    del X
+    os.replace(tmp_path, npy_path)
+
+    with open(index_path, "w") as f:
+        json.dump({"extractor": EXTRACTOR_NAME, "keys": keys, "labels": labels}, f)
+
+    return np.load(npy_path, mmap_mode="r"), y, set_hash
+
+
+def search_hyperparameters(X: np.ndarray, y: np.ndarray, folds: int = 5, n_jobs: int = -1) -> GridSearchCV:
+    pipeline = Pipeline([
+        ("scaler", StandardScaler()),
+        ("svc", SVC(probability=True, random_state=42)),
+    ])
+    search = GridSearchCV(
+        pipeline,
+        PARAM_GRID,
+        cv=StratifiedKFold(n_splits=folds, shuffle=True, random_state=42),
+        scoring="accuracy",
+        n_jobs=n_jobs,
+    )
+    search.fit(X, y)
+    return search
+
+
+def train(
+    data_dir: str,
+    output_path: str,
+    meta_path: str,
+    cache_dir: str,
+    workers: Optional[int] = None,
+    folds: int = 5,
+) -> Dict:
+    with open(meta_path) as f:
+        metadata = json.load(f)
+
+    items = list_images(data_dir, metadata["classes"])
+    if not items:
+        raise ValueError(f"No images found in {data_dir} for classes {metadata['classes']}")
+
+    print(f"🔄 {len(items)} images in {data_dir}")
+    X, y, set_hash = build_feature_matrix(items, cache_dir, workers)
+
+    print("🔄 Hyperparameter search...")
+    started = time.perf_counter()
+    search = search_hyperparameters(X, y, folds=folds)
+    print(f"   ✅ Best CV accuracy {search.best_score_:.4f} in {time.perf_counter() - started:.1f}s")
+    print(f"   - Params: {search.best_params_}")
+
+    joblib.dump(search.best_estimator_, output_path)
+
+    metadata["training"] = {
+        "feature_extractor": EXTRACTOR_NAME,
+        "feature_dim": int(X.shape[1]),
+        "image_set_hash": set_hash,
+        "n_samples": int(len(y)),
+        "cv_accuracy": round(float(search.best_score_), 4),
+        "best_params": {k: str(v) for k, v in search.best_params_.items()},
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    with open(meta_path, "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    print(f"✅ Model saved to {output_path}")
+    return metadata["training"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train SVM warna karung")
+    parser.add_argument("--data-dir", required=True)
+    parser.add_argument("--output", default="models/model_svm_karung.joblib")
+    parser.add_argument("--meta", default="models/model_meta.json")
+    parser.add_argument("--cache-dir", default="models/feature_cache")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--folds", type=int, default=5)
+    args = parser.parse_args()
+
+    train(args.data_dir, args.output, args.meta, args.cache_dir, args.workers, args.folds)
+
+
+if __name__ == "__main__":
+    main()
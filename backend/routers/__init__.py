@@ -3,5 +3,9 @@ from . import transactions
 from . import payments
 from . import farmers
 from . import ml_harvest
+from . import export
+from . import sync
+from . import events
+from . import scale
 
-__all__ = ["detect", "transactions", "payments", "farmers", "ml_harvest"]
+__all__ = ["detect", "transactions", "payments", "farmers", "ml_harvest", "export", "sync", "events", "scale"]
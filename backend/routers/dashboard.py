@@ -1,26 +1,18 @@
-from fastapi import APIRouter, Header, HTTPException
-from supabase import create_client, Client
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
 from pydantic import BaseModel
-from typing import Dict, Optional
+from typing import Dict, Literal, Optional, Tuple
 from datetime import datetime
 from typing import List
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 
-from config import settings
+from db import get_supabase_client, execute
+from services.response_cache import dashboard_cache
+from services.http_cache import apply_etag, get_data_version
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
 
-def get_supabase_client() -> Client:
-    """Lazy initialize Supabase client"""
-    if not settings.supabase_url or not settings.supabase_service_role_key:
-        raise HTTPException(
-            status_code=500,
-            detail="Supabase configuration is missing"
-        )
-    return create_client(settings.supabase_url, settings.supabase_service_role_key)
-
-
 class WarehouseSummaryResponse(BaseModel):
     warehouse_id: str
     farmers_count: int
@@ -34,9 +26,46 @@ class SpentByHourItem(BaseModel):
   hour: datetime
   amount: float
 
+class TimeseriesItem(BaseModel):
+    bucket: datetime
+    spent: float
+    payments_count: int
+    sacks: int
+    grades_breakdown: Dict[str, int]
+
+
+async def fetch_timeseries(
+    warehouse_id: str,
+    start: datetime,
+    end: datetime,
+    granularity: str,
+    tz: str
+) -> Tuple[int, List[dict]]:
+    """
+    Ambil bucket dari rollup via RPC warehouse_timeseries (date_trunc di database).
+    Lewat dashboard_cache: request yang sama dari banyak clerk = satu query.
+    Return (data version saat dihitung, rows) untuk ETag.
+    """
+    async def load():
+        version = await get_data_version(warehouse_id)
+        supabase = get_supabase_client()
+        response = await execute(supabase.rpc("warehouse_timeseries", {
+            "p_warehouse_id": warehouse_id,
+            "p_start": start.isoformat(),
+            "p_end": end.isoformat(),
+            "p_granularity": granularity,
+            "p_tz": tz
+        }))
+        return version, response.data or []
+
+    key = (warehouse_id, "timeseries", start.isoformat(), end.isoformat(), granularity, tz)
+    return await dashboard_cache.get_or_compute(key, load)
+
 
 @router.get("/warehouse-summary", response_model=WarehouseSummaryResponse)
 async def get_warehouse_summary(
+    request: Request,
+    response: Response,
     x_warehouse_id: str = Header(..., alias="X-Warehouse-ID")
 ):
     """
@@ -48,46 +77,33 @@ async def get_warehouse_summary(
     - dominant_grade + ratio: grade terbanyak + persentasenya
     """
     try:
-        supabase = get_supabase_client()
+        # Semua total dihitung di database (RPC warehouse_summary), satu round trip,
+        # di-cache per warehouse (stale-while-revalidate)
+        async def load():
+            version = await get_data_version(x_warehouse_id)
+            supabase = get_supabase_client()
+            summary_res = await execute(
+                supabase.rpc("warehouse_summary", {"p_warehouse_id": x_warehouse_id})
+            )
+            return version, summary_res.data[0] if summary_res.data else {}
+
+        version, summary = await dashboard_cache.get_or_compute((x_warehouse_id, "warehouse-summary"), load)
 
-        # 1) Farmers count (aktif) per warehouse
-        farmers_res = supabase.table("farmers") \
-            .select("id", count="exact") \
-            .eq("registered_by_warehouse", x_warehouse_id) \
-            .eq("is_active", True) \
-            .execute()
-        farmers_count = farmers_res.count or 0
-
-        # 2) Total spent (payments approved untuk transaksi di warehouse ini)
-        # Join payments -> transactions via FKs di Supabase
-        payments_res = supabase.table("payments") \
-            .select("amount, transactions!inner(warehouse_id)") \
-            .eq("transactions.warehouse_id", x_warehouse_id) \
-            .eq("status", "approved") \
-            .execute()
-
-        total_spent = 0.0
-        if payments_res.data:
-            for row in payments_res.data:
-                total_spent += float(row["amount"])
-
-        # 3) Harvest: total sacks + grades breakdown
-        harvest_res = supabase.table("harvest_records") \
-            .select("grade, transactions!inner(warehouse_id)") \
-            .eq("transactions.warehouse_id", x_warehouse_id) \
-            .execute()
-
-        grades_breakdown = {"A": 0, "B": 0, "C": 0}
-        total_sacks = 0
-
-        if harvest_res.data:
-            for row in harvest_res.data:
-                grade = row.get("grade")
-                if grade in grades_breakdown:
-                    grades_breakdown[grade] += 1
-                    total_sacks += 1
-
-        # 4) Dominant grade + ratio
+        # ETag dari version data yang di-cache: 304 tanpa query & tanpa membangun payload
+        not_modified = apply_etag(request, response, x_warehouse_id, version)
+        if not_modified:
+            return not_modified
+
+        farmers_count = summary.get("farmers_count") or 0
+        total_spent = float(summary.get("total_spent") or 0)
+        grades_breakdown = {
+            "A": summary.get("grade_a") or 0,
+            "B": summary.get("grade_b") or 0,
+            "C": summary.get("grade_c") or 0
+        }
+        total_sacks = sum(grades_breakdown.values())
+
+        # Dominant grade + ratio
         dominant_grade = None
         dominant_grade_ratio = 0.0
         if total_sacks > 0:
@@ -115,6 +131,8 @@ async def get_warehouse_summary(
 
 @router.get("/spent-by-hour", response_model=List[SpentByHourItem])
 async def get_spent_by_hour(
+  request: Request,
+  response: Response,
   start: datetime,
   end: datetime,
   x_warehouse_id: str = Header(..., alias="X-Warehouse-ID")
@@ -124,44 +142,18 @@ async def get_spent_by_hour(
   antara start dan end (UTC).
   """
   try:
-    supabase = get_supabase_client()
-
-    # Ambil raw payments dulu (filter status + warehouse via transaksi)
-    payments_res = supabase.table("payments") \
-      .select("amount, payment_date, transactions!inner(warehouse_id)") \
-      .eq("transactions.warehouse_id", x_warehouse_id) \
-      .eq("status", "approved") \
-      .gte("payment_date", start.isoformat()) \
-      .lte("payment_date", end.isoformat()) \
-      .execute()
-
-    rows = payments_res.data or []
-
-    # Group by hour di Python (date_trunc('hour'))
-    buckets: dict[str, float] = {}
-
-    for row in rows:
-      payment_date = row.get("payment_date")
-      amount = float(row.get("amount") or 0)
-
-      if not payment_date:
-        continue
-
-      dt = datetime.fromisoformat(payment_date.replace("Z", "+00:00"))
-      dt_hour = dt.replace(minute=0, second=0, microsecond=0)
-      key = dt_hour.isoformat()
+    # Baca dari rollup (warehouse_rollups) yang di-maintain trigger di database
+    version, rows = await fetch_timeseries(x_warehouse_id, start, end, "hour", "UTC")
 
-      buckets[key] = buckets.get(key, 0.0) + amount
+    not_modified = apply_etag(request, response, x_warehouse_id, version)
+    if not_modified:
+      return not_modified
 
-    # Convert ke list terurut by hour
-    items: List[SpentByHourItem] = []
-    for key in sorted(buckets.keys()):
-      items.append(SpentByHourItem(
-        hour=datetime.fromisoformat(key),
-        amount=buckets[key]
-      ))
-
-    return items
+    return [
+      SpentByHourItem(hour=row["bucket"], amount=float(row["spent"] or 0))
+      for row in rows
+      if row["payments_count"]
+    ]
 
   except HTTPException:
     raise
@@ -169,53 +161,123 @@ async def get_spent_by_hour(
     print("Error in get_spent_by_hour:", e)
     raise HTTPException(status_code=500, detail="Failed to fetch spent by hour")
 
+@router.get("/timeseries", response_model=List[TimeseriesItem])
+async def get_timeseries(
+    request: Request,
+    response: Response,
+    start: datetime,
+    end: datetime,
+    granularity: Literal["minute", "hour", "day", "week"] = "hour",
+    tz: str = "UTC",
+    x_warehouse_id: str = Header(..., alias="X-Warehouse-ID")
+):
+    """
+    Time-series spend (payments approved), jumlah karung dan komposisi grade
+    per bucket untuk satu warehouse.
+
+    - start / end: inklusif; bucket di tepi range hanya berisi data di dalam range
+    - granularity: minute | hour | day | week
+    - tz: nama timezone IANA untuk bucketing (contoh: Asia/Jakarta), termasuk
+      offset non-jam penuh seperti Asia/Kolkata
+    """
+    try:
+        try:
+            ZoneInfo(tz)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid timezone")
+
+        version, rows = await fetch_timeseries(x_warehouse_id, start, end, granularity, tz)
+
+        not_modified = apply_etag(request, response, x_warehouse_id, version)
+        if not_modified:
+            return not_modified
+
+        return [
+            TimeseriesItem(
+                bucket=row["bucket"],
+                spent=float(row["spent"] or 0),
+                payments_count=row["payments_count"] or 0,
+                sacks=row["sacks"] or 0,
+                grades_breakdown={
+                    "A": row["grade_a"] or 0,
+                    "B": row["grade_b"] or 0,
+                    "C": row["grade_c"] or 0
+                }
+            )
+            for row in rows
+        ]
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Error in get_timeseries:", e)
+        raise HTTPException(status_code=500, detail="Failed to fetch timeseries")
+
 @router.get('/farmers-payment-summary')
 async def farmers_payment_summary(
-    x_warehouse_id: str = Header(..., alias="X-Warehouse-ID")
+    request: Request,
+    response: Response,
+    x_warehouse_id: str = Header(..., alias="X-Warehouse-ID"),
+    sort: Literal["full_name", "totalPaid", "totalTransactions"] = "full_name",
+    desc: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
 ):
-    supabase = get_supabase_client()
-    
-    # 1) Ambil semua farmers untuk warehouse ini
-    farmers = supabase.table("farmers") \
-        .select("*") \
-        .eq("registered_by_warehouse", x_warehouse_id) \
-        .execute().data or []
-
-    result = []
-
-    for farmer in farmers:
-        farmer_id = farmer["id"]
-
-        # Ambil transaksi petani ini
-        txns = supabase.table("transactions").select("*").eq(
-            "farmer_id", farmer_id
-        ).execute().data or []
-        
-        txn_ids = [t["id"] for t in txns]
-        totalTransactions = len(txns)
-
-        # Total payment (approved only)
-        if txn_ids:
-            payments = supabase.table("payments") \
-                .select("*") \
-                .in_("transaction_id", txn_ids) \
-                .eq("status", "approved") \
-                .execute().data or []
-        else:
-            payments = []
-
-        totalPaid = sum(float(p.get("amount") or 0) for p in payments)
-
-        result.append({
-            "id": farmer_id,
-            "farmer_code": farmer["farmer_code"],
-            "full_name": farmer["full_name"],
-            "phone": farmer.get("phone"),
-            "bank_name": farmer.get("bank_name"),
-            "is_active": farmer.get("is_active"),
-            "totalTransactions": totalTransactions,
-            "totalPaid": totalPaid
-        })
-
-    return result
+    """
+    Ringkasan transaksi & pembayaran (approved) per petani di warehouse ini.
+    Agregasi dilakukan di database (RPC farmers_payment_summary), jadi jumlah
+    query konstan berapapun jumlah petani.
+
+    - sort: full_name | totalPaid | totalTransactions, desc=true untuk descending
+    - limit/offset: pagination (tanpa limit = semua petani)
+    - Header X-Total-Count: total petani di warehouse
+    """
+    try:
+        async def load():
+            version = await get_data_version(x_warehouse_id)
+            supabase = get_supabase_client()
+            rows = (await execute(supabase.rpc("farmers_payment_summary", {
+                "p_warehouse_id": x_warehouse_id,
+                "p_sort": sort,
+                "p_desc": desc,
+                "p_limit": limit,
+                "p_offset": offset
+            }))).data or []
+            total_count = rows[0]["total_count"] if rows else 0
+            if not rows and offset:
+                # Offset lewat baris terakhir: total dihitung terpisah (head count, tanpa row)
+                count_res = await execute(
+                    supabase.table("farmers").select("id", count="exact", head=True)
+                    .eq("registered_by_warehouse", x_warehouse_id)
+                )
+                total_count = count_res.count or 0
+            return version, rows, total_count
+
+        key = (x_warehouse_id, "farmers-payment-summary", sort, desc, limit, offset)
+        version, rows, total_count = await dashboard_cache.get_or_compute(key, load)
+
+        not_modified = apply_etag(request, response, x_warehouse_id, version)
+        if not_modified:
+            return not_modified
+
+        response.headers["X-Total-Count"] = str(total_count)
+
+        return [
+            {
+                "id": row["id"],
+                "farmer_code": row["farmer_code"],
+                "full_name": row["full_name"],
+                "phone": row.get("phone"),
+                "bank_name": row.get("bank_name"),
+                "is_active": row.get("is_active"),
+                "totalTransactions": row["total_transactions"],
+                "totalPaid": float(row["total_paid"] or 0)
+            }
+            for row in rows
+        ]
 
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Error in farmers_payment_summary:", e)
+        raise HTTPException(status_code=500, detail="Failed to fetch farmers payment summary")
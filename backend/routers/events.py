@@ -0,0 +1,51 @@
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+
+from db import require_warehouse
+from services.events import event_broker
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+
+@router.get("/stream")
+async def stream_events(
+    x_warehouse_id: Optional[str] = Header(None),
+    warehouse_id: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Server-sent events untuk dashboard live (ganti polling) per warehouse
+
+    Warehouse dari header X-Warehouse-ID, atau query ?warehouse_id= untuk
+    EventSource browser (tidak bisa set header custom).
+
+    Event:
+    - ready: koneksi baru, id = posisi event terakhir
+    - harvest_records_saved: karung baru (detect-and-save, batch, sync) + counter delta
+    - recording_completed: transaction selesai direkam (total berat, harga, grade)
+    - payment_created / payment_status_changed: payment baru / approve / reject
+    - resync: ada event yang terlewat, ambil ulang snapshot dari endpoint REST
+
+    Reconnect otomatis EventSource mengirim Last-Event-ID: event yang terlewat
+    dikirim ulang dari history.
+    """
+    warehouse_id = x_warehouse_id or warehouse_id
+    if not warehouse_id:
+        raise HTTPException(status_code=400, detail="X-Warehouse-ID header or warehouse_id query is required")
+
+    try:
+        last_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+    await require_warehouse(warehouse_id)
+
+    return StreamingResponse(
+        event_broker.stream(warehouse_id, last_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # nginx: jangan buffer stream
+        }
+    )
@@ -0,0 +1,202 @@
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Literal, Optional, Tuple
+import csv
+import io
+import json
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import settings
+from db import get_supabase_client
+from db.pagination import fetch_page
+
+router = APIRouter(prefix="/api/export", tags=["export"])
+
+# (kolom, tipe) -- urutan kolom di file export
+EXPORT_COLUMNS = {
+    "transactions": [
+        ("id", "str"), ("transaction_code", "str"), ("warehouse_id", "str"), ("farmer_id", "str"),
+        ("initial_price", "float"), ("total_weight_kg", "float"), ("total_price", "float"),
+        ("payment_status", "str"), ("recording_started_at", "str"), ("recording_completed_at", "str"),
+        ("payment_completed_at", "str"), ("created_at", "str"),
+    ],
+    "payments": [
+        ("id", "str"), ("farmer_id", "str"), ("transaction_id", "str"), ("amount", "float"),
+        ("payment_method", "str"), ("payment_note", "str"), ("status", "str"),
+        ("payment_date", "str"), ("created_at", "str"),
+    ],
+    "harvest-records": [
+        ("id", "str"), ("transaction_id", "str"), ("grade", "str"), ("sack_color", "str"),
+        ("weight_kg", "float"), ("detection_confidence", "float"), ("recorded_at", "str"),
+        ("created_at", "str"),
+    ],
+}
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def build_export_query(
+    resource: str,
+    warehouse_id: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    status: Optional[str],
+):
+    """
+    Query per resource, discope ke warehouse.
+    - transactions: status = payment_status
+    - payments / harvest-records: join ke transactions (!inner) untuk warehouse,
+      status = payments.status / transactions.payment_status
+    """
+    supabase = get_supabase_client()
+    columns = ", ".join(name for name, _ in EXPORT_COLUMNS[resource])
+
+    if resource == "transactions":
+        query = supabase.table("transactions").select(columns).eq("warehouse_id", warehouse_id)
+        if status:
+            query = query.eq("payment_status", status)
+    elif resource == "payments":
+        query = supabase.table("payments").select(
+            f"{columns}, transactions!inner(warehouse_id)"
+        ).eq("transactions.warehouse_id", warehouse_id)
+        if status:
+            query = query.eq("status", status)
+    else:
+        query = supabase.table("harvest_records").select(
+            f"{columns}, transactions!inner(warehouse_id, payment_status)"
+        ).eq("transactions.warehouse_id", warehouse_id)
+        if status:
+            query = query.eq("transactions.payment_status", status)
+
+    if start:
+        query = query.gte("created_at", start.isoformat())
+    if end:
+        query = query.lt("created_at", end.isoformat())
+    return query
+
+
+async def iter_pages(
+    make_query: Callable,
+    first_page: List[dict],
+    next_cursor: Optional[str],
+) -> AsyncIterator[List[dict]]:
+    """
+    Yield halaman demi halaman (keyset), hanya satu halaman di memory.
+    Query builder postgrest mutable, jadi tiap halaman pakai builder baru.
+    """
+    yield first_page
+    while next_cursor:
+        rows, next_cursor = await fetch_page(make_query(), settings.export_page_size, next_cursor)
+        yield rows
+
+
+async def stream_csv(pages: AsyncIterator[List[dict]], columns: List[Tuple[str, str]]) -> AsyncIterator[str]:
+    names = [name for name, _ in columns]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=names, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue()
+
+    async for rows in pages:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+async def stream_ndjson(pages: AsyncIterator[List[dict]], columns: List[Tuple[str, str]]) -> AsyncIterator[str]:
+    names = [name for name, _ in columns]
+    async for rows in pages:
+        yield "".join(
+            json.dumps({name: row.get(name) for name in names}) + "\n"
+            for row in rows
+        )
+
+
+class _ChunkSink(io.RawIOBase):
+    """File-like untuk ParquetWriter: tampung bytes, lalu dikuras per row group"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+async def stream_parquet(pages: AsyncIterator[List[dict]], columns: List[Tuple[str, str]]) -> AsyncIterator[bytes]:
+    """Satu row group per halaman, jadi memory tetap sebesar satu halaman"""
+    arrow_types = {"str": pa.string(), "float": pa.float64()}
+    schema = pa.schema([(name, arrow_types[kind]) for name, kind in columns])
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for rows in pages:
+            if rows:
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+@router.get("/{resource}")
+async def export_resource(
+    resource: Literal["transactions", "payments", "harvest-records"],
+    x_warehouse_id: str = Header(...),
+    format: Literal["csv", "ndjson", "parquet"] = Query("csv"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[str] = None
+):
+    """
+    Export bulk untuk rekonsiliasi akhir bulan (CSV, NDJSON, atau Parquet).
+
+    Data di-page dengan keyset cursor dan di-stream ke client halaman per halaman,
+    jadi memory konstan berapapun jumlah barisnya.
+    - status: payment_status (transactions, harvest-records) atau status payment (payments)
+    - start / end: filter created_at
+    """
+    def make_query():
+        return build_export_query(resource, x_warehouse_id, start, end, status)
+
+    try:
+        # Halaman pertama diambil sebelum response dimulai, supaya error DB
+        # masih bisa dikembalikan sebagai status code (bukan stream yang putus)
+        first_page, next_cursor = await fetch_page(make_query(), settings.export_page_size)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error exporting {resource}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    pages = iter_pages(make_query, first_page, next_cursor)
+    columns = EXPORT_COLUMNS[resource]
+    stream = {"csv": stream_csv, "ndjson": stream_ndjson, "parquet": stream_parquet}[format]
+
+    filename = f"{resource}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{format}"
+    return StreamingResponse(
+        stream(pages, columns),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
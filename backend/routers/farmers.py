@@ -1,35 +1,32 @@
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, HTTPException, Header, Query, Request, Response
 from datetime import datetime
-from supabase import create_client, Client
 from pydantic import BaseModel
 from typing import Optional
 import uuid
-import secrets
 
 from schemas.betelchain import FarmerResponse
-from config import settings
+from db import get_supabase_client, execute, code_allocator, require_warehouse
+from db.pagination import fetch_page, select_fields
+from services.http_cache import check_etag
 
 router = APIRouter(prefix="/api/farmers", tags=["farmers"])
 
-def get_supabase_client() -> Client:
-    """Lazy initialize Supabase client"""
-    if not settings.supabase_url or not settings.supabase_service_role_key:
-        raise HTTPException(
-            status_code=500, 
-            detail="Supabase configuration is missing"
-        )
-    return create_client(settings.supabase_url, settings.supabase_service_role_key)
+FARMER_FIELDS = (
+    "id", "farmer_code", "full_name", "phone", "bank_name", "account_number",
+    "account_holder_name", "address", "village", "district", "city", "province",
+    "registered_by_warehouse", "registered_at", "is_active", "created_at", "updated_at",
+)
 
 
-def generate_farmer_code(warehouse_id: str) -> str:
+async def generate_farmer_code(warehouse_id: str) -> str:
     """
-    Generate unique farmer code: F{YYYYMMDD}{RANDOM}
-    - Contoh: F20251130A1B2C3
+    Generate unique farmer code: F{YYYYMMDD}{SEQUENCE}
+    - Contoh: F20251130000A1F
+    - Sequence 6 digit hex dari counter atomic di database (lihat db/codes.py)
     """
     today = datetime.utcnow().strftime("%Y%m%d")
-    # 6 karakter hex acak → 16^6 kemungkinan
-    rand = secrets.token_hex(3).upper()
-    return f"F{today}{rand}"
+    sequence = await code_allocator.next(f"F{today}")
+    return f"F{today}{sequence:06X}"
 
 
 class FarmerRegisterRequest(BaseModel):
@@ -69,19 +66,14 @@ async def register_farmer(
     try:
         supabase = get_supabase_client()
         
-        # Validate warehouse exists
-        warehouse_check = supabase.table("warehouses").select("id").eq(
-            "id", x_warehouse_id
-        ).execute()
-        
-        if not warehouse_check.data:
-            raise HTTPException(status_code=404, detail="Warehouse not found")
+        # Validate warehouse exists (cached)
+        await require_warehouse(x_warehouse_id)
         
         # Auto-generate farmer code
-        farmer_code = generate_farmer_code(x_warehouse_id)
+        farmer_code = await generate_farmer_code(x_warehouse_id)
         
         # Create farmer
-        response = supabase.table("farmers").insert({
+        response = await execute(supabase.table("farmers").insert({
             "id": str(uuid.uuid4()),
             "farmer_code": farmer_code,
             "full_name": farmer.full_name,
@@ -97,7 +89,7 @@ async def register_farmer(
             "registered_by_warehouse": x_warehouse_id,
             "is_active": True,
             "created_at": datetime.utcnow().isoformat()
-        }).execute()
+        }))
         
         if not response.data:
             raise HTTPException(status_code=400, detail="Failed to register farmer")
@@ -119,14 +111,18 @@ async def register_farmer(
 
 
 @router.get("/{farmer_id}", response_model=FarmerResponse)
-async def get_farmer(farmer_id: str):
+async def get_farmer(farmer_id: str, request: Request, http_response: Response):
     """Get detail farmer"""
     try:
+        not_modified = await check_etag(request, http_response)
+        if not_modified:
+            return not_modified
+        
         supabase = get_supabase_client()
         
-        response = supabase.table("farmers").select("*").eq(
+        response = await execute(supabase.table("farmers").select("*").eq(
             "id", farmer_id
-        ).execute()
+        ))
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Farmer not found")
@@ -148,21 +144,49 @@ async def get_farmer(farmer_id: str):
 
 
 @router.get("/warehouse/{warehouse_id}/list")
-async def list_farmers(warehouse_id: str):
-    """Get semua farmers dari satu warehouse"""
+async def list_farmers(
+    warehouse_id: str,
+    request: Request,
+    http_response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    fields: Optional[str] = None
+):
+    """
+    Get farmers dari satu warehouse, keyset pagination di (created_at, id).
+    - start / end: filter tanggal registrasi (created_at)
+    - fields: projection, contoh ?fields=farmer_code,full_name
+    """
     try:
-        supabase = get_supabase_client()
-        
-        response = supabase.table("farmers").select("*").eq(
-            "registered_by_warehouse", warehouse_id
-        ).execute()
+        not_modified = await check_etag(request, http_response, warehouse_id)
+        if not_modified:
+            return not_modified
         
+        supabase = get_supabase_client()
+
+        query = supabase.table("farmers").select(
+            select_fields(fields, FARMER_FIELDS)
+        ).eq("registered_by_warehouse", warehouse_id)
+        if is_active is not None:
+            query = query.eq("is_active", is_active)
+        if start:
+            query = query.gte("created_at", start.isoformat())
+        if end:
+            query = query.lt("created_at", end.isoformat())
+
+        farmers, next_cursor = await fetch_page(query, limit, cursor)
         return {
             "warehouse_id": warehouse_id,
-            "count": len(response.data),
-            "farmers": response.data
+            "count": len(farmers),
+            "farmers": farmers,
+            "next_cursor": next_cursor
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching farmers: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -179,9 +203,9 @@ async def update_farmer(
         supabase = get_supabase_client()
         
         # Check farmer exists
-        farmer_check = supabase.table("farmers").select("*").eq(
+        farmer_check = await execute(supabase.table("farmers").select("*").eq(
             "id", farmer_id
-        ).execute()
+        ))
         
         if not farmer_check.data:
             raise HTTPException(status_code=404, detail="Farmer not found")
@@ -193,7 +217,7 @@ async def update_farmer(
             raise HTTPException(status_code=403, detail="Not authorized to update this farmer")
         
         # Update farmer
-        response = supabase.table("farmers").update({
+        response = await execute(supabase.table("farmers").update({
             "full_name": farmer.full_name,
             "phone": farmer.phone,
             "bank_name": farmer.bank_name,
@@ -205,7 +229,7 @@ async def update_farmer(
             "city": farmer.city,
             "province": farmer.province,
             "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", farmer_id).execute()
+        }).eq("id", farmer_id))
         
         if not response.data:
             raise HTTPException(status_code=400, detail="Failed to update farmer")
@@ -235,9 +259,9 @@ async def delete_farmer(
         supabase = get_supabase_client()
 
         # Check farmer exists
-        farmer_check = supabase.table("farmers").select("*").eq(
+        farmer_check = await execute(supabase.table("farmers").select("*").eq(
             "id", farmer_id
-        ).execute()
+        ))
 
         if not farmer_check.data:
             raise HTTPException(status_code=404, detail="Farmer not found")
@@ -249,7 +273,7 @@ async def delete_farmer(
             raise HTTPException(status_code=403, detail="Not authorized to delete this farmer")
 
         # Delete farmer
-        response = supabase.table("farmers").delete().eq("id", farmer_id).execute()
+        response = await execute(supabase.table("farmers").delete().eq("id", farmer_id))
 
         return {"id": farmer_id, "deleted": True}
 
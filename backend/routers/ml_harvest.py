@@ -1,30 +1,60 @@
-from fastapi import APIRouter, HTTPException, Header, File, UploadFile, Form
+from fastapi import APIRouter, HTTPException, Header, File, UploadFile, Form, Response
 from datetime import datetime
-from supabase import create_client, Client
 from typing import Optional
+from postgrest.types import ReturnMethod
+import numpy as np
+import cv2
 import uuid
 
-from schemas.detection import HarvestRecordResponse
+from schemas.detection import HarvestRecordResponse, GradeConfirmRequest
 from models.sack_detector import get_detector
+from models.online_learner import get_online_learner
 from config import settings
+from db import get_supabase_client, execute, authorize_transaction
+from services.aggregates import summarize_harvest
+from services.journal import harvest_journal, merge_pending
+from services.idempotency import idempotent, request_fingerprint
+from services.events import publish_harvest_records
+from services.scale import scale_hub, DEFAULT_WEIGHT_KG
 
 router = APIRouter(prefix="/api/ml-harvest", tags=["ml-harvest"])
 
-def get_supabase_client() -> Client:
-    """Lazy initialize Supabase client"""
-    if not settings.supabase_url or not settings.supabase_service_role_key:
-        raise HTTPException(
-            status_code=500, 
-            detail="Supabase configuration is missing"
-        )
-    return create_client(settings.supabase_url, settings.supabase_service_role_key)
+# Map warna (output model) ke sack_color di harvest_records
+COLOR_MAP = {
+    "merah": "red",
+    "kuning": "yellow",
+    "hijau": "green",
+    "red": "red",
+    "yellow": "yellow",
+    "green": "green"
+}
+
+
+def decode_image_rgb(file_content: bytes) -> np.ndarray:
+    """Decode bytes -> image (BGR) -> RGB"""
+    nparr = np.frombuffer(file_content, np.uint8)
+    img_bgr = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if img_bgr is None:
+        raise ValueError("Failed to decode image")
+    return cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+
+async def upload_fingerprint(files: list[UploadFile], *fields: Optional[str]) -> str:
+    """Fingerprint Idempotency-Key: form fields + isi semua file (file di-rewind)"""
+    parts = list(fields)
+    for file in files:
+        parts.append(await file.read())
+        await file.seek(0)
+    return request_fingerprint(*parts)
 
 
 @router.post("/detect-and-save", response_model=HarvestRecordResponse)
 async def detect_sack_and_save(
+    http_response: Response,
     file: UploadFile = File(...),
     transaction_id: str = Form(...),
-    x_warehouse_id: str = Header(...)
+    station_id: Optional[str] = Form(None),
+    x_warehouse_id: str = Header(...),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """
     Detect warna karung + grade dari image, langsung simpan ke harvest_records
@@ -32,29 +62,38 @@ async def detect_sack_and_save(
     Form data:
     - file: Image file (JPG/PNG)
     - transaction_id: ID transaction yang sedang berlangsung
+    - station_id: (opsional) ID timbangan di meja scan. weight_kg diisi berat
+      stabil dari timbangan (/api/scale/ws/{station_id}); kalau berat belum
+      settled, record di-update saat berat berikutnya settled
     
     Flow:
     1. Load model & detect
     2. Validate transaction exists & belongs to warehouse
     3. Save ke harvest_records
     4. Return saved record
+    
+    Header Idempotency-Key (opsional): retry dengan key yang sama (mis. koneksi
+    putus sebelum response diterima) return record yang sama tanpa inference
+    atau insert ulang.
     """
+    fingerprint = await upload_fingerprint([file], transaction_id, station_id) if idempotency_key else ""
+    return await idempotent(
+        http_response, idempotency_key, (x_warehouse_id, "detect-and-save"), fingerprint,
+        lambda: save_detection(file, transaction_id, x_warehouse_id, station_id)
+    )
+
+
+async def save_detection(
+    file: UploadFile,
+    transaction_id: str,
+    x_warehouse_id: str,
+    station_id: Optional[str] = None
+) -> HarvestRecordResponse:
     try:
         supabase = get_supabase_client()
         
-        # Step 1: Validate transaction exists & belongs to this warehouse
-        txn_check = supabase.table("transactions").select("id, warehouse_id").eq(
-            "id", transaction_id
-        ).execute()
-        
-        if not txn_check.data:
-            raise HTTPException(status_code=404, detail="Transaction not found")
-        
-        txn = txn_check.data[0]
-        
-        # Check warehouse authorization
-        if txn["warehouse_id"] != x_warehouse_id:
-            raise HTTPException(status_code=403, detail="Not authorized for this transaction")
+        # Step 1: Validate transaction exists & belongs to this warehouse (cached)
+        await authorize_transaction(transaction_id, x_warehouse_id)
         
                 # Step 2: Read file & detect
         file_content = await file.read()
@@ -67,18 +106,10 @@ async def detect_sack_and_save(
             )
 
             # Decode bytes -> image (BGR) -> RGB
-            import numpy as np
-            import cv2
-
-            nparr = np.frombuffer(file_content, np.uint8)
-            img_bgr = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            if img_bgr is None:
-                raise ValueError("Failed to decode image")
+            img_rgb = decode_image_rgb(file_content)
 
-            img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-
-            # Panggil model.predict
-            detection_result = detector.predict(img_rgb)
+            # Panggil model.predict (feature vector disimpan untuk online learning)
+            detection_result, features = detector.predict_with_features(img_rgb)
 
             # Extract detection data
             warna = detection_result.get("warna", "unknown")
@@ -90,15 +121,11 @@ async def detect_sack_and_save(
             raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
         
         # Map warna to sack_color
-        color_map = {
-            "merah": "red",
-            "kuning": "yellow",
-            "hijau": "green",
-            "red": "red",
-            "yellow": "yellow",
-            "green": "green"
-        }
-        sack_color = color_map.get(warna.lower(), warna.lower())
+        sack_color = COLOR_MAP.get(warna.lower(), warna.lower())
+        
+        # Berat stabil dari timbangan station (kalau sudah settled)
+        claim = scale_hub.claim_weight(x_warehouse_id, station_id) if station_id else None
+        weight_kg = claim[1] if claim is not None else None
         
         # Step 3: Save to harvest_records
         harvest_record = {
@@ -106,18 +133,40 @@ async def detect_sack_and_save(
             "transaction_id": transaction_id,
             "grade": grade,
             "sack_color": sack_color,
-            "weight_kg": 100.0,  # Default weight, bisa di-update nanti
+            "weight_kg": weight_kg if weight_kg is not None else DEFAULT_WEIGHT_KG,
             "detection_confidence": float(confidence),
             "recorded_at": datetime.utcnow().isoformat(),
             "created_at": datetime.utcnow().isoformat()
         }
         
-        response = supabase.table("harvest_records").insert(harvest_record).execute()
+        try:
+            if settings.write_behind_enabled:
+                # Write-behind: simpan durable di journal lokal, flush ke database di background
+                await harvest_journal.append(harvest_record)
+                data = harvest_record
+            else:
+                response = await execute(supabase.table("harvest_records").insert(harvest_record))
+                
+                if not response.data:
+                    raise HTTPException(status_code=400, detail="Failed to save harvest record")
+                
+                data = response.data[0]
+        except Exception:
+            # Berat baru terpakai kalau record tersimpan
+            if claim is not None:
+                scale_hub.release_weight(x_warehouse_id, station_id, claim)
+            raise
         
-        if not response.data:
-            raise HTTPException(status_code=400, detail="Failed to save harvest record")
+        publish_harvest_records(x_warehouse_id, [data], source="detect-and-save")
+        
+        if station_id and weight_kg is None:
+            # Karung di-scan sebelum timbangan stabil: isi saat berat settled
+            scale_hub.await_weight(x_warehouse_id, station_id, data)
+        
+        learner = get_online_learner()
+        if learner is not None:
+            learner.remember_features(data["id"], features)
         
-        data = response.data[0]
         return HarvestRecordResponse(
             id=data["id"],
             transaction_id=data["transaction_id"],
@@ -137,98 +186,100 @@ async def detect_sack_and_save(
 
 @router.post("/batch-detect", response_model=dict)
 async def batch_detect_and_save(
+    http_response: Response,
     files: list[UploadFile] = File(...),
     transaction_id: str = Form(...),
-    x_warehouse_id: str = Header(...)
+    x_warehouse_id: str = Header(...),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """
     Detect & save MULTIPLE gambar sekaligus untuk satu transaction
     
-    Useful untuk scanning multiple sacks dalam satu batch
+    Useful untuk scanning multiple sacks dalam satu batch.
+    Mendukung header Idempotency-Key seperti detect-and-save.
     """
+    fingerprint = await upload_fingerprint(files, transaction_id) if idempotency_key else ""
+    return await idempotent(
+        http_response, idempotency_key, (x_warehouse_id, "batch-detect"), fingerprint,
+        lambda: save_batch_detection(files, transaction_id, x_warehouse_id)
+    )
+
+
+async def save_batch_detection(files: list[UploadFile], transaction_id: str, x_warehouse_id: str) -> dict:
     try:
         supabase = get_supabase_client()
         
-        # Validate transaction
-        txn_check = supabase.table("transactions").select("id, warehouse_id").eq(
-            "id", transaction_id
-        ).execute()
+        # Validate transaction (cached)
+        await authorize_transaction(transaction_id, x_warehouse_id)
         
-        if not txn_check.data:
-            raise HTTPException(status_code=404, detail="Transaction not found")
-        
-        txn = txn_check.data[0]
-        if txn["warehouse_id"] != x_warehouse_id:
-            raise HTTPException(status_code=403, detail="Not authorized for this transaction")
+        detector = get_detector(
+            settings.model_path,
+            settings.meta_path,
+            settings.features_path
+        )
+        learner = get_online_learner()
         
-        # Process each file
-        saved_records = []
+        # Step 1: inference untuk semua file dulu
+        pending = []
         errors = []
         
         for file in files:
             try:
                 file_content = await file.read()
-
-                detector = get_detector(
-                    settings.model_path,
-                    settings.meta_path,
-                    settings.features_path
-                )
-
-                import numpy as np
-                import cv2
-
-                nparr = np.frombuffer(file_content, np.uint8)
-                img_bgr = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                if img_bgr is None:
-                    raise ValueError("Failed to decode image")
-
-                img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-
-                detection_result = detector.predict(img_rgb)
-
+                img_rgb = decode_image_rgb(file_content)
+                
+                detection_result, features = detector.predict_with_features(img_rgb)
+                
                 warna = detection_result.get("warna", "unknown")
                 grade = detection_result.get("grade", "C")
                 confidence = detection_result.get("confidence", 0.0)
-
-                
-                color_map = {
-                    "merah": "red",
-                    "kuning": "yellow",
-                    "hijau": "green",
-                    "red": "red",
-                    "yellow": "yellow",
-                    "green": "green"
-                }
-                sack_color = color_map.get(warna.lower(), warna.lower())
+                sack_color = COLOR_MAP.get(warna.lower(), warna.lower())
                 
-                harvest_record = {
+                now = datetime.utcnow().isoformat()
+                pending.append((file.filename, features, {
                     "id": str(uuid.uuid4()),
                     "transaction_id": transaction_id,
                     "grade": grade,
                     "sack_color": sack_color,
-                    "weight_kg": 100.0,
+                    "weight_kg": DEFAULT_WEIGHT_KG,
                     "detection_confidence": float(confidence),
-                    "recorded_at": datetime.utcnow().isoformat(),
-                    "created_at": datetime.utcnow().isoformat()
-                }
-                
-                response = supabase.table("harvest_records").insert(harvest_record).execute()
-                
-                if response.data:
-                    saved_records.append({
-                        "filename": file.filename,
-                        "grade": grade,
-                        "sack_color": sack_color,
-                        "confidence": confidence,
-                        "status": "success"
-                    })
-                else:
-                    errors.append({"filename": file.filename, "error": "Failed to save"})
-                    
+                    "recorded_at": now,
+                    "created_at": now
+                }))
+            
             except Exception as e:
                 errors.append({"filename": file.filename, "error": str(e)})
         
+        # Step 2: simpan semua record sukses dengan bulk insert (per chunk)
+        saved_records = []
+        saved_rows = []
+        chunk_size = settings.batch_insert_chunk_size
+        
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            try:
+                await execute(
+                    supabase.table("harvest_records")
+                    .insert([record for _, _, record in chunk], returning=ReturnMethod.minimal)
+                )
+            except Exception as e:
+                errors.extend({"filename": filename, "error": f"Failed to save: {e}"} for filename, _, _ in chunk)
+                continue
+            
+            for filename, features, record in chunk:
+                saved_rows.append(record)
+                if learner is not None:
+                    learner.remember_features(record["id"], features)
+                saved_records.append({
+                    "filename": filename,
+                    "grade": record["grade"],
+                    "sack_color": record["sack_color"],
+                    "confidence": record["detection_confidence"],
+                    "status": "success"
+                })
+        
+        publish_harvest_records(x_warehouse_id, saved_rows, source="batch-detect")
+        
         return {
             "transaction_id": transaction_id,
             "total_files": len(files),
@@ -254,48 +305,24 @@ async def get_harvest_summary(transaction_id: str):
     try:
         supabase = get_supabase_client()
         
-        # Get transaction
-        txn_check = supabase.table("transactions").select("*").eq(
-            "id", transaction_id
-        ).execute()
+        # Record write-behind yang belum ter-flush (dibaca sebelum query database)
+        pending_records = await harvest_journal.pending_for_transaction(transaction_id)
+        
+        # Transaction + harvest records dalam satu embedded select
+        txn_check = await execute(
+            supabase.table("transactions")
+            .select("id, harvest_records(*)")
+            .eq("id", transaction_id)
+        )
         
         if not txn_check.data:
             raise HTTPException(status_code=404, detail="Transaction not found")
         
-        # Get harvest records
-        harvest_response = supabase.table("harvest_records").select("*").eq(
-            "transaction_id", transaction_id
-        ).execute()
-        
-        records = harvest_response.data or []
-        
-        if not records:
-            return {
-                "transaction_id": transaction_id,
-                "total_sacks": 0,
-                "total_weight_kg": 0,
-                "grade_breakdown": {"A": 0, "B": 0, "C": 0},
-                "confidence_avg": 0,
-                "records": []
-            }
-        
-        total_weight = sum(float(r["weight_kg"]) for r in records)
-        total_sacks = len(records)
-        
-        grade_breakdown = {
-            "A": len([r for r in records if r["grade"] == "A"]),
-            "B": len([r for r in records if r["grade"] == "B"]),
-            "C": len([r for r in records if r["grade"] == "C"])
-        }
-        
-        confidence_avg = sum(float(r["detection_confidence"]) for r in records) / total_sacks
+        records = merge_pending(txn_check.data[0].get("harvest_records") or [], pending_records)
         
         return {
             "transaction_id": transaction_id,
-            "total_sacks": total_sacks,
-            "total_weight_kg": round(total_weight, 2),
-            "grade_breakdown": grade_breakdown,
-            "confidence_avg": round(confidence_avg, 2),
+            **summarize_harvest(records),
             "records": records
         }
         
@@ -303,4 +330,80 @@ async def get_harvest_summary(transaction_id: str):
         raise
     except Exception as e:
         print(f"Error in harvest_summary: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/records/{record_id}/confirm-grade", response_model=dict)
+async def confirm_grade(
+    record_id: str,
+    confirm: GradeConfirmRequest,
+    x_warehouse_id: str = Header(...)
+):
+    """
+    Clerk konfirmasi / koreksi grade hasil deteksi
+    
+    - Update grade + sack_color di harvest_records
+    - Kirim label yang sudah dikonfirmasi ke online learner (background, non-blocking)
+    """
+    try:
+        supabase = get_supabase_client()
+        
+        detector = get_detector(
+            settings.model_path,
+            settings.meta_path,
+            settings.features_path
+        )
+        grades = detector.metadata["grades"]
+        if confirm.grade not in grades:
+            raise HTTPException(status_code=400, detail="Invalid grade")
+        
+        label_idx = grades.index(confirm.grade)
+        warna = detector.metadata["classes"][label_idx]
+        
+        # Record yang masih di journal write-behind di-flush dulu
+        await harvest_journal.flush_record(record_id)
+        
+        # Validate record exists & belongs to this warehouse
+        record_check = await execute(
+            supabase.table("harvest_records")
+            .select("id, grade, transaction_id, transactions!inner(warehouse_id)")
+            .eq("id", record_id)
+        )
+        
+        if not record_check.data:
+            raise HTTPException(status_code=404, detail="Harvest record not found")
+        
+        record = record_check.data[0]
+        if record["transactions"]["warehouse_id"] != x_warehouse_id:
+            raise HTTPException(status_code=403, detail="Not authorized for this record")
+        
+        response = await execute(supabase.table("harvest_records").update({
+            "grade": confirm.grade,
+            "sack_color": COLOR_MAP.get(warna, warna)
+        }).eq("id", record_id))
+        
+        if not response.data:
+            raise HTTPException(status_code=400, detail="Failed to update harvest record")
+        
+        learning = "disabled"
+        learner = get_online_learner()
+        if learner is not None:
+            features = learner.pop_features(record_id)
+            if features is None:
+                learning = "no_features"
+            else:
+                learning = "queued" if learner.submit(features, label_idx) else "dropped"
+        
+        return {
+            "id": record_id,
+            "previous_grade": record["grade"],
+            "grade": confirm.grade,
+            "corrected": record["grade"] != confirm.grade,
+            "learning": learning,
+            "model_version": detector.model_version
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in confirm_grade: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
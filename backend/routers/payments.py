@@ -1,23 +1,31 @@
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, HTTPException, Header, Query, Request, Response
 from datetime import datetime
-from supabase import create_client, Client
 from pydantic import BaseModel
 from typing import Optional
+from postgrest.exceptions import APIError
 import uuid
 
 from schemas.betelchain import PaymentResponse
-from config import settings
+from db import get_supabase_client, execute, authorize_transaction, require_warehouse, ownership_cache
+from db.pagination import fetch_page, select_fields
+from services.aggregates import summarize_payments
+from services.http_cache import check_etag, check_transaction_etag
+from services.idempotency import idempotent, request_fingerprint
+from services.events import event_broker
 
 router = APIRouter(prefix="/api/payments", tags=["payments"])
 
-def get_supabase_client() -> Client:
-    """Lazy initialize Supabase client"""
-    if not settings.supabase_url or not settings.supabase_service_role_key:
-        raise HTTPException(
-            status_code=500, 
-            detail="Supabase configuration is missing"
-        )
-    return create_client(settings.supabase_url, settings.supabase_service_role_key)
+PAYMENT_FIELDS = (
+    "id", "farmer_id", "transaction_id", "amount", "payment_method", "payment_note",
+    "payment_type", "proof_image_url", "status", "payment_date", "created_at", "updated_at",
+)
+
+# SQLSTATE dari RPC approve_payment -> HTTP status
+APPROVE_ERROR_STATUS = {
+    "P0002": 404,  # Payment / Transaction not found
+    "42501": 403,  # Not authorized
+    "22023": 400,  # Invalid status
+}
 
 
 class PaymentCreateRequest(BaseModel):
@@ -44,7 +52,9 @@ class PaymentResponse(BaseModel):
 @router.post("/create", response_model=PaymentResponse)
 async def create_payment(
     payment: PaymentCreateRequest,
-    x_warehouse_id: str = Header(...)
+    http_response: Response,
+    x_warehouse_id: str = Header(...),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """
     Buat payment berdasarkan transaction
@@ -55,32 +65,29 @@ async def create_payment(
     - amount: Jumlah pembayaran
     - payment_method: Cara pembayaran (cash, transfer, dll)
     - payment_note: Catatan tambahan
+    
+    Header Idempotency-Key (opsional): retry dengan key yang sama return payment
+    yang sama, bukan payment kedua.
     """
+    return await idempotent(
+        http_response, idempotency_key, (x_warehouse_id, "payments/create"),
+        request_fingerprint(payment.model_dump_json()),
+        lambda: insert_payment(payment, x_warehouse_id)
+    )
+
+
+async def insert_payment(payment: PaymentCreateRequest, x_warehouse_id: str) -> PaymentResponse:
     try:
         supabase = get_supabase_client()
         
-        # Validate warehouse exists
-        warehouse_check = supabase.table("warehouses").select("id").eq(
-            "id", x_warehouse_id
-        ).execute()
-        
-        if not warehouse_check.data:
-            raise HTTPException(status_code=404, detail="Warehouse not found")
+        # Validate warehouse exists (cached)
+        await require_warehouse(x_warehouse_id)
         
-        # Validate transaction exists & belongs to this warehouse
-        txn_check = supabase.table("transactions").select("*").eq(
-            "id", payment.transaction_id
-        ).execute()
-        
-        if not txn_check.data:
-            raise HTTPException(status_code=404, detail="Transaction not found")
-        
-        txn = txn_check.data[0]
-        if txn["warehouse_id"] != x_warehouse_id:
-            raise HTTPException(status_code=403, detail="Not authorized for this transaction")
+        # Validate transaction exists & belongs to this warehouse (cached)
+        txn = await authorize_transaction(payment.transaction_id, x_warehouse_id)
         
         # Create payment
-        response = supabase.table("payments").insert({
+        response = await execute(supabase.table("payments").insert({
             "id": str(uuid.uuid4()),
             "farmer_id": txn["farmer_id"],  # Ambil dari transaction
             "transaction_id": payment.transaction_id,
@@ -90,12 +97,19 @@ async def create_payment(
             "status": "pending",
             "payment_date": datetime.utcnow().isoformat(),
             "created_at": datetime.utcnow().isoformat()
-        }).execute()
+        }))
         
         if not response.data:
             raise HTTPException(status_code=400, detail="Failed to create payment")
         
         data = response.data[0]
+        event_broker.publish(x_warehouse_id, "payment_created", {
+            "payment_id": data["id"],
+            "transaction_id": data["transaction_id"],
+            "amount": float(data["amount"]),
+            "payment_method": data["payment_method"],
+            "status": data["status"]
+        })
         return PaymentResponse(
             id=data["id"],
             farmer_id=data["farmer_id"],
@@ -115,14 +129,18 @@ async def create_payment(
 
 # Tambah endpoint: GET payment untuk transaction (singular, bukan list)
 @router.get("/transaction/{transaction_id}")
-async def get_payment_by_transaction(transaction_id: str):
+async def get_payment_by_transaction(transaction_id: str, request: Request, http_response: Response):
     """Get payment untuk satu transaction (asumsi 1 payment per transaction)"""
     try:
+        not_modified = await check_transaction_etag(request, http_response, transaction_id)
+        if not_modified:
+            return not_modified
+        
         supabase = get_supabase_client()
         
-        response = supabase.table("payments").select("*").eq(
+        response = await execute(supabase.table("payments").select("*").eq(
             "transaction_id", transaction_id
-        ).execute()
+        ))
         
         if not response.data:
             return {
@@ -143,28 +161,63 @@ async def get_payment_by_transaction(transaction_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/list")
-async def list_all_payments():
-    """Get semua payments (untuk tabel di frontend)"""
+async def list_all_payments(
+    request: Request,
+    http_response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    farmer_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    fields: Optional[str] = None
+):
+    """
+    Get payments (untuk tabel di frontend), keyset pagination di (created_at, id).
+    Halaman berikutnya: kirim next_cursor sebagai ?cursor=
+    """
     try:
+        not_modified = await check_etag(request, http_response)
+        if not_modified:
+            return not_modified
+        
         supabase = get_supabase_client()
-        response = supabase.table("payments").select("*").order("created_at", desc=True).execute()
+
+        query = supabase.table("payments").select(select_fields(fields, PAYMENT_FIELDS))
+        if status:
+            query = query.eq("status", status)
+        if farmer_id:
+            query = query.eq("farmer_id", farmer_id)
+        if start:
+            query = query.gte("created_at", start.isoformat())
+        if end:
+            query = query.lt("created_at", end.isoformat())
+
+        payments, next_cursor = await fetch_page(query, limit, cursor)
         return {
-            "count": len(response.data or []),
-            "payments": response.data or []
+            "count": len(payments),
+            "payments": payments,
+            "next_cursor": next_cursor
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching payments: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{payment_id}", response_model=PaymentResponse)
-async def get_payment(payment_id: str):
+async def get_payment(payment_id: str, request: Request, http_response: Response):
     """Get detail payment"""
     try:
+        not_modified = await check_etag(request, http_response)
+        if not_modified:
+            return not_modified
+        
         supabase = get_supabase_client()
         
-        response = supabase.table("payments").select("*").eq(
+        response = await execute(supabase.table("payments").select("*").eq(
             "id", payment_id
-        ).execute()
+        ))
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Payment not found")
@@ -187,14 +240,18 @@ async def get_payment(payment_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/transaction/{transaction_id}/list")
-async def list_payments(transaction_id: str):
+async def list_payments(transaction_id: str, request: Request, http_response: Response):
     """Get semua payments untuk satu transaction"""
     try:
+        not_modified = await check_transaction_etag(request, http_response, transaction_id)
+        if not_modified:
+            return not_modified
+        
         supabase = get_supabase_client()
         
-        response = supabase.table("payments").select("*").eq(
+        response = await execute(supabase.table("payments").select("*").eq(
             "transaction_id", transaction_id
-        ).order("payment_date", desc=True).execute()
+        ).order("payment_date", desc=True))
         
         return {
             "transaction_id": transaction_id,
@@ -225,94 +282,50 @@ async def approve_payment(
         if update.status not in ["approved", "rejected", "pending"]:
             raise HTTPException(status_code=400, detail="Invalid status")
         
-        # Get payment
-        payment_check = supabase.table("payments").select("*").eq(
-            "id", payment_id
-        ).execute()
-        
-        if not payment_check.data:
-            raise HTTPException(status_code=404, detail="Payment not found")
+        # Approve + hitung ulang payment_status transaction secara atomic di database
+        # (lihat db/migrations/007_approve_payment.sql), satu round trip
+        try:
+            response = await execute(supabase.rpc("approve_payment", {
+                "p_payment_id": payment_id,
+                "p_warehouse_id": x_warehouse_id,
+                "p_status": update.status
+            }))
+        except APIError as e:
+            status_code = APPROVE_ERROR_STATUS.get(e.code)
+            if status_code is None:
+                raise
+            raise HTTPException(status_code=status_code, detail=e.message)
         
-        payment = payment_check.data[0]
-        transaction_id = payment.get("transaction_id")
+        if not response.data:
+            raise HTTPException(status_code=400, detail="Failed to update payment")
         
-        # Validate warehouse authorization (jika transaction ada)
-        if transaction_id:
-            txn_check = supabase.table("transactions").select("*").eq(
-                "id", transaction_id
-            ).execute()
-            
-            if not txn_check.data:
-                raise HTTPException(status_code=404, detail="Transaction not found")
-            
-            txn = txn_check.data[0]
-            if txn["warehouse_id"] != x_warehouse_id:
-                raise HTTPException(status_code=403, detail="Not authorized")
-        else:
-            # Jika transaction belum ada, validate farmer ownership
-            farmer_check = supabase.table("farmers").select("registered_by_warehouse").eq(
-                "id", payment["farmer_id"]
-            ).execute()
-            
-            if not farmer_check.data or farmer_check.data[0]["registered_by_warehouse"] != x_warehouse_id:
-                raise HTTPException(status_code=403, detail="Not authorized")
+        result = response.data[0]
+        transaction_id = result["transaction_id"]
         
-        # 1. Update payment status
-        payment_response = supabase.table("payments").update({
+        event_broker.publish(x_warehouse_id, "payment_status_changed", {
+            "payment_id": payment_id,
             "status": update.status,
-            "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", payment_id).execute()
-        
-        if not payment_response.data:
-            raise HTTPException(status_code=400, detail="Failed to update payment")
+            "transaction_id": transaction_id,
+            "transaction_payment_status": result.get("transaction_payment_status"),
+            "total_approved": float(result.get("total_approved") or 0),
+            "total_price": float(result.get("total_price") or 0)
+        })
         
-        # 2. Jika transaction ada, update transaction payment_status
         if transaction_id:
-            # Calculate total approved payments
-            all_payments_response = supabase.table("payments").select("*").eq(
-                "transaction_id", transaction_id
-            ).execute()
-            
-            all_payments = all_payments_response.data or []
-            total_approved = sum(
-                float(p["amount"]) for p in all_payments if p.get("status") == "approved"
-            )
-            
-            # Get transaction to check total_price
-            txn_check = supabase.table("transactions").select("*").eq(
-                "id", transaction_id
-            ).execute()
-            txn = txn_check.data[0]
-            total_price = txn.get("total_price") or txn.get("initial_price") or 0
+            ownership_cache.set_transaction({
+                "id": transaction_id,
+                "payment_status": result["transaction_payment_status"]
+            })
             
-            # Determine new payment_status (cuma paid atau unpaid)
-            if total_approved >= total_price and total_price > 0:
-                new_payment_status = "paid"
-                payment_completed_at = datetime.utcnow().isoformat()
-            else:
-                new_payment_status = "unpaid"
-                payment_completed_at = None
-
-            # Update transaction
-            update_data = {
-                "payment_status": new_payment_status,
-                "updated_at": datetime.utcnow().isoformat()
-            }
-
-            if new_payment_status == "paid":
-                update_data["payment_completed_at"] = payment_completed_at
-
-            supabase.table("transactions").update(update_data).eq("id", transaction_id).execute()
-           
             return {
                 "success": True,
                 "message": f"Payment {update.status}",
                 "payment_id": payment_id,
                 "payment_status": update.status,
                 "transaction_id": transaction_id,
-                "transaction_payment_status": new_payment_status,
-                "total_approved": total_approved,
-                "total_price": total_price
+                "transaction_payment_status": result["transaction_payment_status"],
+                "total_approved": float(result["total_approved"]),
+                "total_price": float(result["total_price"])
             }
         else:
             # Payment belum attached ke transaction
@@ -332,48 +345,42 @@ async def approve_payment(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/transaction/{transaction_id}/summary")
-async def get_payment_summary(transaction_id: str):
+async def get_payment_summary(transaction_id: str, request: Request, http_response: Response):
     """
     Get ringkasan payment untuk transaction
     Lihat total paid, remaining, status
     """
     try:
+        not_modified = await check_transaction_etag(request, http_response, transaction_id)
+        if not_modified:
+            return not_modified
+        
         supabase = get_supabase_client()
         
-        # Get transaction
-        txn_response = supabase.table("transactions").select("*").eq(
-            "id", transaction_id
-        ).execute()
+        # Transaction + payments dalam satu embedded select
+        txn_response = await execute(
+            supabase.table("transactions")
+            .select(
+                "payment_status, total_price, initial_price, "
+                "payments!transaction_id(*)"
+            )
+            .eq("id", transaction_id)
+        )
         
         if not txn_response.data:
             raise HTTPException(status_code=404, detail="Transaction not found")
         
         txn = txn_response.data[0]
+        payments = txn.get("payments") or []
         
-        # Get payments
-        payment_response = supabase.table("payments").select("*").eq(
-            "transaction_id", transaction_id
-        ).execute()
-        
-        payments = payment_response.data or []
-        
-        # Calculate totals
-        total_approved = sum(
-            float(p["amount"]) for p in payments if p.get("status") == "approved"
-        )
-        total_pending = sum(
-            float(p["amount"]) for p in payments if p.get("status") == "pending"
-        )
+        # Calculate totals (satu pass)
+        totals = summarize_payments(payments)
+        total_approved = totals["total_approved"]
+        total_pending = totals["total_pending"]
+        payment_by_status = totals["payment_by_status"]
         total_price = txn.get("total_price") or txn.get("initial_price") or 0
         remaining_needed = max(0, total_price - total_approved)
         
-        # Payment breakdown by status
-        payment_by_status = {
-            "approved": len([p for p in payments if p["status"] == "approved"]),
-            "pending": len([p for p in payments if p["status"] == "pending"]),
-            "rejected": len([p for p in payments if p["status"] == "rejected"])
-        }
-        
         return {
             "transaction_id": transaction_id,
             "total_price": total_price,
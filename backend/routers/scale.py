@@ -0,0 +1,127 @@
+from fastapi import APIRouter, HTTPException, Header, Query, WebSocket, WebSocketDisconnect, status
+from typing import List, Optional, Tuple
+import json
+
+from db import get_supabase_client, execute, require_warehouse
+from services.events import event_broker
+from services.journal import harvest_journal
+from services.scale import scale_hub
+
+router = APIRouter(prefix="/api/scale", tags=["scale"])
+
+
+def parse_samples(text: str) -> List[Tuple[Optional[float], float]]:
+    """
+    Satu frame WebSocket = satu atau beberapa sample (t, kg):
+    - angka per baris, langsung dari serial: "12.34\\n12.36"
+    - JSON: {"kg": 12.34, "t": 1712345678.12} atau list-nya
+    t (detik, clock device) opsional; tanpa t dipakai waktu terima server.
+    """
+    text = text.strip()
+    if not text:
+        return []
+    if text[0] in "[{":
+        payload = json.loads(text)
+        items = payload if isinstance(payload, list) else [payload]
+        return [
+            (float(item["t"]) if item.get("t") is not None else None, float(item["kg"]))
+            for item in items
+        ]
+    return [(None, float(line)) for line in text.splitlines() if line.strip()]
+
+
+async def attach_weight(warehouse_id: str, station_id: str, record: dict, weight_kg: float) -> bool:
+    """
+    Isi weight_kg record deteksi yang menunggu berat dari timbangan.
+    Return False (tidak diubah) kalau recording transaksinya sudah complete:
+    total_weight_kg / total_price sudah dihitung dari berat sebelumnya.
+    """
+    # Record yang masih di journal write-behind di-flush dulu
+    await harvest_journal.flush_record(record["id"])
+
+    # Cek recording + update dalam satu statement (db/migrations/009_attach_harvest_weight.sql),
+    # jadi complete-recording di antara keduanya tidak bisa terlewat
+    supabase = get_supabase_client()
+    response = await execute(supabase.rpc("attach_harvest_weight", {
+        "p_record_id": record["id"],
+        "p_weight_kg": weight_kg
+    }))
+    if not response.data:
+        return False
+
+    event_broker.publish(warehouse_id, "harvest_record_weighed", {
+        "record_id": record["id"],
+        "transaction_id": record["transaction_id"],
+        "station_id": station_id,
+        "weight_kg": weight_kg,
+        "previous_weight_kg": record.get("weight_kg")
+    })
+    return True
+
+
+@router.websocket("/ws/{station_id}")
+async def scale_stream(
+    websocket: WebSocket,
+    station_id: str,
+    x_warehouse_id: Optional[str] = Header(None),
+    warehouse_id: Optional[str] = Query(None)
+):
+    """
+    Stream sample berat dari timbangan (bridge serial -> WebSocket), 10-50 Hz
+
+    Server menjalankan filter stabilisasi per station dan mengirim balik
+    {"event": "settled", "weight_kg": ..., "record_id": ...} setiap kali berat
+    karung stabil. record_id terisi kalau berat langsung dipasang ke deteksi
+    yang menunggu (detect-and-save dengan station_id yang sama); kalau tidak,
+    berat dipakai deteksi berikutnya. Kalau recording transaksi deteksi itu
+    sudah complete, berat tidak dipasang dan event berisi
+    "skipped": "recording_completed".
+    """
+    warehouse_id = x_warehouse_id or warehouse_id
+    try:
+        if not warehouse_id:
+            raise HTTPException(status_code=400, detail="X-Warehouse-ID header or warehouse_id query is required")
+        await require_warehouse(warehouse_id)
+    except HTTPException as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+        return
+
+    await websocket.accept()
+    print(f"⚖️  Scale station {station_id} connected")
+
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                samples = parse_samples(text)
+            except (ValueError, KeyError, TypeError) as e:
+                await websocket.send_json({"event": "error", "detail": f"Invalid sample: {e}"})
+                continue
+
+            for t, kg in samples:
+                settled = scale_hub.add_sample(warehouse_id, station_id, kg, t)
+                if settled is None:
+                    continue
+
+                weight_kg, record = settled
+                event = {
+                    "event": "settled",
+                    "station_id": station_id,
+                    "weight_kg": weight_kg,
+                    "record_id": None
+                }
+                if record is not None:
+                    try:
+                        if await attach_weight(warehouse_id, station_id, record, weight_kg):
+                            event["record_id"] = record["id"]
+                        else:
+                            event["skipped"] = "recording_completed"
+                            print(f"⚠️  Weight {weight_kg} kg not attached: recording of "
+                                  f"transaction {record['transaction_id']} already completed")
+                    except Exception as e:
+                        print(f"⚠️  Failed to attach weight to harvest record {record['id']}: {e}")
+
+                await websocket.send_json(event)
+
+    except WebSocketDisconnect:
+        print(f"⚖️  Scale station {station_id} disconnected")
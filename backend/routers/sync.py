@@ -0,0 +1,213 @@
+from fastapi import APIRouter, HTTPException, Header, Request
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Literal, Optional
+from datetime import datetime, timezone
+from postgrest.types import ReturnMethod
+import json
+import uuid
+import zlib
+
+import numpy as np
+
+from config import settings
+from db import get_supabase_client, execute, ownership_cache
+from db.cache import TRANSACTION_FIELDS
+from models.online_learner import get_online_learner
+from routers.ml_harvest import COLOR_MAP
+from services.events import publish_harvest_records
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+
+class SyncRecord(BaseModel):
+    id: uuid.UUID  # dibuat di device, jadi replay batch yang sama tidak duplikat
+    transaction_id: uuid.UUID
+    grade: Literal["A", "B", "C"]
+    sack_color: str
+    detection_confidence: float
+    recorded_at: datetime
+    weight_kg: float = 100.0
+    features: Optional[List[float]] = Field(default=None, max_length=4096)
+
+
+class SyncBatchRequest(BaseModel):
+    records: List[SyncRecord]
+
+
+def decode_body(body: bytes, content_encoding: Optional[str]) -> dict:
+    """Body JSON, optional gzip (Content-Encoding: gzip), dengan batas ukuran setelah decompress"""
+    limit = settings.sync_max_body_bytes
+    if len(body) > limit:
+        raise HTTPException(status_code=413, detail="Sync batch too large")
+    if content_encoding and content_encoding.lower() == "gzip":
+        try:
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            body = decompressor.decompress(body, limit + 1)
+        except zlib.error:
+            raise HTTPException(status_code=400, detail="Invalid gzip body")
+        if not decompressor.eof:
+            raise HTTPException(status_code=413, detail="Sync batch too large")
+    elif content_encoding and content_encoding.lower() != "identity":
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {content_encoding}")
+
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+
+async def load_owned_transactions(transaction_ids: List[str], warehouse_id: str) -> dict:
+    """
+    Ownership semua transaction di batch: dari ownership cache, sisanya satu
+    query in_() untuk seluruh batch. Return {transaction_id: error} untuk yang ditolak.
+    """
+    rows, missing = {}, []
+    for transaction_id in transaction_ids:
+        cached = ownership_cache.transactions.get(transaction_id)
+        if cached is not None:
+            rows[transaction_id] = cached
+        else:
+            missing.append(transaction_id)
+
+    if missing:
+        supabase = get_supabase_client()
+        response = await execute(
+            supabase.table("transactions")
+            .select(", ".join(TRANSACTION_FIELDS))
+            .in_("id", missing)
+        )
+        for row in response.data or []:
+            ownership_cache.set_transaction(row)
+            rows[row["id"]] = row
+
+    rejected = {}
+    for transaction_id in transaction_ids:
+        row = rows.get(transaction_id)
+        if row is None:
+            rejected[transaction_id] = "Transaction not found"
+        elif row["warehouse_id"] != warehouse_id:
+            rejected[transaction_id] = "Not authorized for this transaction"
+    return rejected
+
+
+@router.post("/harvest-records", response_model=dict)
+async def sync_harvest_records(
+    request: Request,
+    x_warehouse_id: str = Header(...),
+    content_encoding: Optional[str] = Header(None)
+):
+    """
+    Bulk sync hasil deteksi dari scanning station yang sempat offline.
+
+    Body: JSON {"records": [...]} (boleh gzip, Content-Encoding: gzip), tiap
+    record sudah diklasifikasi di device dan punya id UUID dari client:
+    id, transaction_id, grade, sack_color, detection_confidence, recorded_at,
+    weight_kg (optional), features (optional, untuk online learning; vector
+    yang panjangnya beda dari feature model diabaikan).
+
+    - Dedup by id: record yang sudah pernah tersimpan dilewati (upsert
+      ignore_duplicates), jadi batch yang sama aman di-replay
+    - Ownership dicek untuk semua transaction sekaligus (satu query)
+    - Insert bulk per batch_insert_chunk_size
+    """
+    try:
+        payload = decode_body(await request.body(), content_encoding)
+        try:
+            batch = SyncBatchRequest.model_validate(payload)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+        if len(batch.records) > settings.sync_max_batch_records:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Too many records (max {settings.sync_max_batch_records})"
+            )
+
+        # Dedup dalam batch (retry dari device bisa mengirim record yang sama 2x)
+        unique = {}
+        for record in batch.records:
+            unique.setdefault(str(record.id), record)
+
+        transaction_ids = sorted({str(r.transaction_id) for r in unique.values()})
+        rejected_transactions = await load_owned_transactions(transaction_ids, x_warehouse_id)
+
+        rejected = []
+        accepted = []
+        now = datetime.now(timezone.utc).isoformat()
+        for record_id, record in unique.items():
+            transaction_id = str(record.transaction_id)
+            if transaction_id in rejected_transactions:
+                rejected.append({"id": record_id, "error": rejected_transactions[transaction_id]})
+                continue
+            recorded_at = record.recorded_at
+            if recorded_at.tzinfo is None:
+                recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+            accepted.append((record, {
+                "id": record_id,
+                "transaction_id": transaction_id,
+                "grade": record.grade,
+                "sack_color": COLOR_MAP.get(record.sack_color.lower(), record.sack_color.lower()),
+                "weight_kg": record.weight_kg,
+                "detection_confidence": record.detection_confidence,
+                "recorded_at": recorded_at.isoformat(),
+                "created_at": now
+            }))
+
+        supabase = get_supabase_client()
+        learner = get_online_learner()
+        inserted_ids = set()
+        chunk_size = settings.batch_insert_chunk_size
+        
+        # Feature vector dengan dimensi beda (model device lain / versi lama) tidak
+        # boleh masuk online learner: np.vstack gagal dan holdout jadi rusak
+        feature_count = learner.detector.feature_count if learner is not None else None
+        features_ignored = 0
+
+        for start in range(0, len(accepted), chunk_size):
+            chunk = accepted[start:start + chunk_size]
+            try:
+                # ignore_duplicates: hanya row baru yang di-return
+                response = await execute(
+                    supabase.table("harvest_records")
+                    .upsert(
+                        [row for _, row in chunk],
+                        on_conflict="id",
+                        ignore_duplicates=True,
+                        returning=ReturnMethod.representation
+                    )
+                )
+            except Exception as e:
+                rejected.extend({"id": row["id"], "error": f"Failed to save: {e}"} for _, row in chunk)
+                continue
+
+            chunk_inserted = {row["id"] for row in response.data or []}
+            inserted_ids |= chunk_inserted
+            if learner is not None:
+                for record, row in chunk:
+                    if not record.features or row["id"] not in chunk_inserted:
+                        continue
+                    if len(record.features) != feature_count:
+                        features_ignored += 1
+                        continue
+                    learner.remember_features(row["id"], np.asarray(record.features, dtype=np.float32))
+        
+        if features_ignored:
+            print(f"⚠️  Sync: ignored {features_ignored} feature vectors (expected {feature_count} values)")
+
+        publish_harvest_records(
+            x_warehouse_id, (row for _, row in accepted if row["id"] in inserted_ids), source="sync"
+        )
+
+        return {
+            "received": len(batch.records),
+            "inserted": len(inserted_ids),
+            "duplicates": len(batch.records) - len(inserted_ids) - len(rejected),
+            "rejected": rejected,
+            "features_ignored": features_ignored
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in sync_harvest_records: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,41 +1,34 @@
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, HTTPException, Header, Query, Request, Response
 from datetime import datetime, timezone
-from supabase import create_client, Client
 from pydantic import BaseModel
 from typing import Optional
 from schemas.betelchain import TransactionCreateRequest, TransactionResponse
 import uuid
 
-from config import settings
+from db import get_supabase_client, execute, code_allocator, authorize_transaction, ownership_cache
+from db.pagination import fetch_page, select_fields
+from services.aggregates import summarize_harvest, summarize_payments
+from services.http_cache import check_etag, check_transaction_etag
+from services.journal import harvest_journal, merge_pending
+from services.events import event_broker
 
 router = APIRouter(prefix="/api/transactions", tags=["transactions"])
 
-def get_supabase_client() -> Client:
-    """Lazy initialize Supabase client"""
-    if not settings.supabase_url or not settings.supabase_service_role_key:
-        raise HTTPException(
-            status_code=500, 
-            detail="Supabase configuration is missing"
-        )
-    return create_client(settings.supabase_url, settings.supabase_service_role_key)
+TRANSACTION_FIELDS = (
+    "id", "transaction_code", "warehouse_id", "farmer_id", "initial_price",
+    "total_weight_kg", "total_price", "remaining_price", "payment_status", "deal_at",
+    "recording_status", "recording_started_at", "recording_completed_at",
+    "payment_completed_at", "created_by", "created_at", "updated_at",
+)
 
-def generate_transaction_code() -> str:
-    """Generate unique transaction code: TXN{YYYYMMDD}{SEQUENCE}"""
-    try:
-        supabase = get_supabase_client()
-        today = datetime.utcnow().strftime("%Y%m%d")
-        
-        response = supabase.table("transactions").select("id").like(
-            "transaction_code", f"TXN{today}%"
-        ).execute()
-        
-        sequence = len(response.data) + 1
-        transaction_code = f"TXN{today}{sequence:04d}"
-        
-        return transaction_code
-    except Exception as e:
-        print(f"Error generating transaction code: {e}")
-        return f"TXN{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+async def generate_transaction_code() -> str:
+    """
+    Generate unique transaction code: TXN{YYYYMMDD}{SEQUENCE}
+    Sequence dari counter atomic di database (lihat db/codes.py)
+    """
+    today = datetime.utcnow().strftime("%Y%m%d")
+    sequence = await code_allocator.next(f"TXN{today}")
+    return f"TXN{today}{sequence:04d}"
 
 class TransactionCreateRequest(BaseModel):
     farmer_id: str
@@ -63,26 +56,27 @@ async def create_transaction(
         supabase = get_supabase_client()
         
         # Validate farmer exists
-        farmer_check = supabase.table("farmers").select("*").eq(
+        farmer_check = await execute(supabase.table("farmers").select("*").eq(
             "id", transaction_data.farmer_id
-        ).execute()
+        ))
         
         if not farmer_check.data:
             raise HTTPException(status_code=404, detail="Farmer not found")
         
         # Create transaction - LANGSUNG unpaid, tanpa payment
-        txn_response = supabase.table("transactions").insert({
-            "transaction_code": generate_transaction_code(),
+        txn_response = await execute(supabase.table("transactions").insert({
+            "transaction_code": await generate_transaction_code(),
             "warehouse_id": x_warehouse_id,
             "farmer_id": transaction_data.farmer_id,
             "initial_price": transaction_data.initial_price,
             "payment_status": "unpaid",  # Selalu unpaid di awal
             "created_at": datetime.now(timezone.utc).isoformat()
-        }).execute()
+        }))
         
         if not txn_response.data:
             raise HTTPException(status_code=400, detail="Failed to create transaction")
         
+        ownership_cache.set_transaction(txn_response.data[0])
         return txn_response.data[0]
     
     except HTTPException:
@@ -92,14 +86,18 @@ async def create_transaction(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{transaction_id}", response_model=TransactionResponse)
-async def get_transaction(transaction_id: str):
+async def get_transaction(transaction_id: str, request: Request, http_response: Response):
     """Get detail transaction"""
     try:
+        not_modified = await check_transaction_etag(request, http_response, transaction_id)
+        if not_modified:
+            return not_modified
+        
         supabase = get_supabase_client()
         
-        response = supabase.table("transactions").select("*").eq(
+        response = await execute(supabase.table("transactions").select("*").eq(
             "id", transaction_id
-        ).execute()
+        ))
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Transaction not found")
@@ -125,21 +123,52 @@ async def get_transaction(transaction_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/warehouse/{warehouse_id}/list")
-async def list_transactions(warehouse_id: str):
-    """Get semua transactions dari satu warehouse"""
+async def list_transactions(
+    warehouse_id: str,
+    request: Request,
+    http_response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    farmer_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    fields: Optional[str] = None
+):
+    """
+    Get transactions dari satu warehouse, keyset pagination di (created_at, id).
+    - status: filter payment_status (unpaid / paid)
+    - fields: projection, contoh ?fields=transaction_code,total_price
+    """
     try:
-        supabase = get_supabase_client()
-        
-        response = supabase.table("transactions").select("*").eq(
-            "warehouse_id", warehouse_id
-        ).order("created_at", desc=True).execute()
+        not_modified = await check_etag(request, http_response, warehouse_id)
+        if not_modified:
+            return not_modified
         
+        supabase = get_supabase_client()
+
+        query = supabase.table("transactions").select(
+            select_fields(fields, TRANSACTION_FIELDS)
+        ).eq("warehouse_id", warehouse_id)
+        if status:
+            query = query.eq("payment_status", status)
+        if farmer_id:
+            query = query.eq("farmer_id", farmer_id)
+        if start:
+            query = query.gte("created_at", start.isoformat())
+        if end:
+            query = query.lt("created_at", end.isoformat())
+
+        transactions, next_cursor = await fetch_page(query, limit, cursor)
         return {
             "warehouse_id": warehouse_id,
-            "count": len(response.data or []),
-            "transactions": response.data or []
+            "count": len(transactions),
+            "transactions": transactions,
+            "next_cursor": next_cursor
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching transactions: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -156,22 +185,13 @@ async def start_recording(
     try:
         supabase = get_supabase_client()
         
-        # Check transaction exists & belongs to warehouse
-        txn_check = supabase.table("transactions").select("*").eq(
-            "id", transaction_id
-        ).execute()
-        
-        if not txn_check.data:
-            raise HTTPException(status_code=404, detail="Transaction not found")
-        
-        txn = txn_check.data[0]
-        if txn["warehouse_id"] != x_warehouse_id:
-            raise HTTPException(status_code=403, detail="Not authorized for this transaction")
+        # Check transaction exists & belongs to warehouse (cached)
+        await authorize_transaction(transaction_id, x_warehouse_id)
         
         # Update recording_started_at
-        response = supabase.table("transactions").update({
+        response = await execute(supabase.table("transactions").update({
             "recording_started_at": datetime.now(timezone.utc).isoformat()
-        }).eq("id", transaction_id).execute()
+        }).eq("id", transaction_id))
         
         if not response.data:
             raise HTTPException(status_code=400, detail="Failed to start recording")
@@ -203,24 +223,16 @@ async def complete_recording(
     try:
         supabase = get_supabase_client()
         
-        # Check transaction exists & belongs to warehouse
-        txn_check = supabase.table("transactions").select("*").eq(
-            "id", transaction_id
-        ).execute()
+        # Check transaction exists & belongs to warehouse (cached)
+        txn = await authorize_transaction(transaction_id, x_warehouse_id)
         
-        if not txn_check.data:
-            raise HTTPException(status_code=404, detail="Transaction not found")
-        
-        txn = txn_check.data[0]
-        if txn["warehouse_id"] != x_warehouse_id:
-            raise HTTPException(status_code=403, detail="Not authorized for this transaction")
-        
-        # Get harvest records for this transaction
-        harvest_response = supabase.table("harvest_records").select("*").eq(
+        # Get harvest records for this transaction (+ yang masih di journal write-behind)
+        pending_records = await harvest_journal.pending_for_transaction(transaction_id)
+        harvest_response = await execute(supabase.table("harvest_records").select("*").eq(
             "transaction_id", transaction_id
-        ).execute()
+        ))
         
-        harvest_records = harvest_response.data or []
+        harvest_records = merge_pending(harvest_response.data or [], pending_records)
         
         if not harvest_records:
             raise HTTPException(status_code=400, detail="No harvest records found for this transaction")
@@ -234,11 +246,11 @@ async def complete_recording(
         total_price = price_per_kg * total_weight_kg
         
         # Update transaction
-        response = supabase.table("transactions").update({
+        response = await execute(supabase.table("transactions").update({
             "recording_completed_at": datetime.now(timezone.utc).isoformat(),
             "total_weight_kg": round(total_weight_kg, 2),
             "total_price": round(total_price, 2)
-        }).eq("id", transaction_id).execute()
+        }).eq("id", transaction_id))
         
         if not response.data:
             raise HTTPException(status_code=400, detail="Failed to complete recording")
@@ -252,6 +264,14 @@ async def complete_recording(
             "C": len([r for r in harvest_records if r["grade"] == "C"])
         }
         
+        event_broker.publish(x_warehouse_id, "recording_completed", {
+            "transaction_id": transaction_id,
+            "total_weight_kg": data["total_weight_kg"],
+            "total_price": data["total_price"],
+            "total_records": len(harvest_records),
+            "grades_breakdown": grade_breakdown
+        })
+        
         return {
             "success": True,
             "message": "Recording completed",
@@ -270,7 +290,7 @@ async def complete_recording(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{transaction_id}/summary")
-async def get_transaction_summary(transaction_id: str):
+async def get_transaction_summary(transaction_id: str, request: Request, http_response: Response):
     """
     Get detail summary transaction:
     - Transaction info
@@ -278,49 +298,40 @@ async def get_transaction_summary(transaction_id: str):
     - Payment status
     """
     try:
+        # Record write-behind yang belum ter-flush belum menaikkan data version,
+        # jadi ETag hanya dipakai kalau journal transaction ini kosong
+        pending_records = await harvest_journal.pending_for_transaction(transaction_id)
+        if not pending_records:
+            not_modified = await check_transaction_etag(request, http_response, transaction_id)
+            if not_modified:
+                return not_modified
+        
         supabase = get_supabase_client()
         
-        # Get transaction
-        txn_response = supabase.table("transactions").select("*").eq(
-            "id", transaction_id
-        ).execute()
+        # Transaction + farmer + harvest records + payments dalam satu embedded select
+        # (hint kolom FK payments.transaction_id supaya embed tidak ambigu,
+        # tidak bergantung pada nama constraint)
+        txn_response = await execute(
+            supabase.table("transactions")
+            .select(
+                "*, farmers(farmer_code, full_name), "
+                "harvest_records(id, grade, weight_kg, detection_confidence), "
+                "payments!transaction_id(*)"
+            )
+            .eq("id", transaction_id)
+        )
         
         if not txn_response.data:
             raise HTTPException(status_code=404, detail="Transaction not found")
         
         txn = txn_response.data[0]
+        farmer = txn.get("farmers") or {}
+        harvest_records = merge_pending(txn.get("harvest_records") or [], pending_records)
+        payments = txn.get("payments") or []
         
-        # Get farmer info
-        farmer_response = supabase.table("farmers").select("*").eq(
-            "id", txn["farmer_id"]
-        ).execute()
-        
-        farmer = farmer_response.data[0] if farmer_response.data else {}
-        
-        # Get harvest records
-        harvest_response = supabase.table("harvest_records").select("*").eq(
-            "transaction_id", transaction_id
-        ).execute()
-        
-        harvest_records = harvest_response.data or []
-        
-        # Get payments
-        payment_response = supabase.table("payments").select("*").eq(
-            "transaction_id", transaction_id
-        ).execute()
-        
-        payments = payment_response.data or []
-        
-        # Calculate totals
-        total_approved_payment = sum(
-            float(p["amount"]) for p in payments if p.get("status") == "approved"
-        )
-        
-        grade_breakdown = {
-            "A": len([r for r in harvest_records if r["grade"] == "A"]),
-            "B": len([r for r in harvest_records if r["grade"] == "B"]),
-            "C": len([r for r in harvest_records if r["grade"] == "C"])
-        }
+        # Aggregasi satu pass
+        harvest = summarize_harvest(harvest_records)
+        total_approved_payment = summarize_payments(payments)["total_approved"]
         
         return {
             "transaction": {
@@ -338,12 +349,10 @@ async def get_transaction_summary(transaction_id: str):
                 "created_at": txn["created_at"]
             },
             "harvest_summary": {
-                "total_records": len(harvest_records),
+                "total_records": harvest["total_sacks"],
                 "total_weight_kg": txn.get("total_weight_kg"),
-                "grade_breakdown": grade_breakdown,
-                "average_confidence": round(
-                    sum(float(r["detection_confidence"]) for r in harvest_records) / len(harvest_records), 2
-                ) if harvest_records else 0
+                "grade_breakdown": harvest["grade_breakdown"],
+                "average_confidence": harvest["confidence_avg"]
             },
             "payment_summary": {
                 "total_approved": total_approved_payment,
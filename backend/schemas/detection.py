@@ -24,3 +24,6 @@ class HarvestRecordResponse(BaseModel):
     detection_confidence: float
     recorded_at: str
 
+
+class GradeConfirmRequest(BaseModel):
+    grade: str  # grade hasil koreksi/konfirmasi clerk: A, B, C
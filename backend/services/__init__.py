@@ -0,0 +1,5 @@
+from .health import readiness
+from .aggregates import summarize_harvest, summarize_payments
+from .response_cache import dashboard_cache
+
+__all__ = ["readiness", "summarize_harvest", "summarize_payments", "dashboard_cache"]
@@ -0,0 +1,49 @@
+from typing import Dict, List
+
+GRADES = ("A", "B", "C")
+PAYMENT_STATUSES = ("approved", "pending", "rejected")
+
+
+def summarize_harvest(records: List[dict]) -> Dict:
+    """
+    Satu pass atas harvest records:
+    total_sacks, total_weight_kg, grade_breakdown, confidence_avg
+    """
+    grade_breakdown = {grade: 0 for grade in GRADES}
+    total_weight = 0.0
+    total_confidence = 0.0
+
+    for r in records:
+        grade = r.get("grade")
+        if grade in grade_breakdown:
+            grade_breakdown[grade] += 1
+        total_weight += float(r.get("weight_kg") or 0)
+        total_confidence += float(r.get("detection_confidence") or 0)
+
+    total_sacks = len(records)
+    return {
+        "total_sacks": total_sacks,
+        "total_weight_kg": round(total_weight, 2),
+        "grade_breakdown": grade_breakdown,
+        "confidence_avg": round(total_confidence / total_sacks, 2) if total_sacks else 0,
+    }
+
+
+def summarize_payments(payments: List[dict]) -> Dict:
+    """
+    Satu pass atas payments: total amount + jumlah payment per status
+    """
+    totals = {status: 0.0 for status in PAYMENT_STATUSES}
+    counts = {status: 0 for status in PAYMENT_STATUSES}
+
+    for p in payments:
+        status = p.get("status")
+        if status in counts:
+            counts[status] += 1
+            totals[status] += float(p.get("amount") or 0)
+
+    return {
+        "total_approved": totals["approved"],
+        "total_pending": totals["pending"],
+        "payment_by_status": counts,
+    }
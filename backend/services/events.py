@@ -0,0 +1,181 @@
+import asyncio
+import json
+from collections import Counter, defaultdict, deque
+from typing import AsyncIterator, Deque, Dict, Iterable, Optional, Set, Tuple
+
+from config import settings
+
+# Event harvest_records_saved memuat row lengkap hanya untuk batch kecil
+MAX_EVENT_RECORDS = 50
+
+
+def format_event(event_id: int, event_type: str, data: dict) -> str:
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class Subscriber:
+    __slots__ = ("queue", "overflowed")
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+
+class EventBroker:
+    """
+    Pub/sub live event per warehouse untuk stream SSE (routers/events.py).
+
+    - Event di-serialize sekali saat publish, subscriber hanya menerima string
+      (ratusan subscriber idle = ratusan Queue kosong, tanpa polling / query)
+    - id event naik per warehouse; history terakhir disimpan supaya client yang
+      reconnect dengan Last-Event-ID tidak kehilangan event
+    - Subscriber lambat (queue penuh) tidak memblok publish: event dibuang dan
+      subscriber dikirimi "resync" (client ambil ulang snapshot dari REST)
+
+    Per proses: dengan beberapa worker, subscriber hanya menerima event dari
+    write yang diproses worker yang sama.
+    """
+
+    def __init__(self, queue_size: int, history_size: int):
+        self.queue_size = queue_size
+        self.history_size = history_size
+        self._subscribers: Dict[str, Set[Subscriber]] = defaultdict(set)
+        self._history: Dict[str, Deque[Tuple[int, str]]] = {}
+        self._seq: Dict[str, int] = defaultdict(int)
+        self.published = 0
+        self.dropped = 0
+
+    def subscriber_count(self, warehouse_id: Optional[str] = None) -> int:
+        if warehouse_id is not None:
+            return len(self._subscribers.get(warehouse_id, ()))
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    def publish(self, warehouse_id: str, event_type: str, data: dict) -> int:
+        """
+        Kirim event ke semua subscriber warehouse (non-blocking), return id event.
+        dashboard_cache sengaja tidak di-invalidate: saat scanning ramai tiap
+        karung = satu event, dan cache cukup basi maksimal fresh_s (client
+        live sudah dapat delta dari event).
+        """
+        self._seq[warehouse_id] += 1
+        event_id = self._seq[warehouse_id]
+        message = format_event(event_id, event_type, {"warehouse_id": warehouse_id, **data})
+        history = self._history.get(warehouse_id)
+        if history is None:
+            history = self._history[warehouse_id] = deque(maxlen=self.history_size)
+        history.append((event_id, message))
+        self.published += 1
+
+        for subscriber in self._subscribers.get(warehouse_id, ()):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                subscriber.overflowed = True
+                self.dropped += 1
+        return event_id
+
+    def _subscribe(self, warehouse_id: str, last_event_id: Optional[int]) -> Tuple[Subscriber, list]:
+        """Daftar subscriber + pesan awal (replay sejak Last-Event-ID / resync / ready)"""
+        subscriber = Subscriber(self.queue_size)
+        self._subscribers[warehouse_id].add(subscriber)
+
+        seq = self._seq[warehouse_id]
+        if last_event_id is None:
+            return subscriber, [format_event(seq, "ready", {"warehouse_id": warehouse_id})]
+
+        history = self._history.get(warehouse_id, ())
+        oldest = history[0][0] if history else seq + 1
+        if last_event_id > seq or last_event_id + 1 < oldest:
+            # Restart proses / terlalu lama terputus: event di antaranya tidak ada lagi
+            return subscriber, [format_event(seq, "resync", {"warehouse_id": warehouse_id})]
+        return subscriber, [message for event_id, message in history if event_id > last_event_id]
+
+    def _unsubscribe(self, warehouse_id: str, subscriber: Subscriber):
+        subscribers = self._subscribers.get(warehouse_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[warehouse_id]
+
+    async def stream(
+        self,
+        warehouse_id: str,
+        last_event_id: Optional[int] = None,
+        heartbeat_s: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Body text/event-stream. Heartbeat (komentar SSE) menjaga koneksi lewat
+        proxy dan membuat client yang sudah putus terdeteksi saat send gagal.
+        """
+        heartbeat_s = heartbeat_s or settings.events_heartbeat_s
+        subscriber, initial = self._subscribe(warehouse_id, last_event_id)
+        try:
+            yield f"retry: {settings.events_retry_ms}\n\n"
+            for message in initial:
+                yield message
+
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), heartbeat_s)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield message
+
+                if subscriber.overflowed and subscriber.queue.empty():
+                    subscriber.overflowed = False
+                    yield format_event(self._seq[warehouse_id], "resync", {"warehouse_id": warehouse_id})
+        finally:
+            self._unsubscribe(warehouse_id, subscriber)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": self.subscriber_count(),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+event_broker = EventBroker(
+    queue_size=settings.events_queue_size,
+    history_size=settings.events_history_size,
+)
+
+
+def publish_harvest_records(warehouse_id: str, records: Iterable[dict], source: str):
+    """
+    Event harvest_records_saved: counter delta (jumlah karung, per grade,
+    per transaction) supaya dashboard bisa update tanpa query ulang
+    """
+    records = list(records)
+    if not records:
+        return
+
+    grades = Counter(r["grade"] for r in records)
+    transactions: Dict[str, dict] = {}
+    for record in records:
+        counters = transactions.setdefault(
+            record["transaction_id"], {"sacks": 0, "weight_kg": 0.0, "grades_breakdown": Counter()}
+        )
+        counters["sacks"] += 1
+        counters["weight_kg"] += float(record.get("weight_kg") or 0)
+        counters["grades_breakdown"][record["grade"]] += 1
+
+    data = {
+        "source": source,
+        "sacks": len(records),
+        "grades_breakdown": dict(grades),
+        "transactions": {
+            transaction_id: {**counters, "grades_breakdown": dict(counters["grades_breakdown"])}
+            for transaction_id, counters in transactions.items()
+        },
+    }
+    if len(records) <= MAX_EVENT_RECORDS:
+        data["records"] = [
+            {key: record.get(key) for key in (
+                "id", "transaction_id", "grade", "sack_color", "weight_kg",
+                "detection_confidence", "recorded_at"
+            )}
+            for record in records
+        ]
+    event_broker.publish(warehouse_id, "harvest_records_saved", data)
@@ -0,0 +1,68 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+from config import settings
+from db import get_supabase_client, execute
+
+
+class Readiness:
+    """
+    State readiness instance:
+    - model sudah di-load & warm-up
+    - Supabase reachable, round-trip latency diukur (di-cache beberapa detik
+      supaya probe load balancer tidak membebani database)
+    """
+
+    def __init__(self):
+        self.model_version: Optional[str] = None
+        self.warmup_ms: Optional[float] = None
+        self.warmed_up = False
+        self.db_latency_ms: Optional[float] = None
+        self.db_error: Optional[str] = None
+        self._db_checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def mark_warmed_up(self, model_version: str, warmup_ms: float):
+        self.model_version = model_version
+        self.warmup_ms = round(warmup_ms, 2)
+        self.warmed_up = True
+
+    async def _ping_supabase(self) -> float:
+        supabase = get_supabase_client()
+        started = time.perf_counter()
+        await execute(supabase.table("warehouses").select("id").limit(1))
+        return (time.perf_counter() - started) * 1000
+
+    async def check_database(self):
+        async with self._lock:
+            if time.monotonic() - self._db_checked_at < settings.readiness_probe_interval_s:
+                return
+            try:
+                self.db_latency_ms = round(await self._ping_supabase(), 2)
+                self.db_error = None
+            except Exception as e:
+                self.db_latency_ms = None
+                self.db_error = getattr(e, "detail", None) or str(e)
+            self._db_checked_at = time.monotonic()
+
+    def report(self) -> Dict:
+        checks = {
+            "model": self.warmed_up,
+            "database": self.db_error is None and self.db_latency_ms is not None,
+            "database_latency": (
+                self.db_latency_ms is not None
+                and self.db_latency_ms <= settings.readiness_max_db_latency_ms
+            ),
+        }
+        return {
+            "status": "ready" if all(checks.values()) else "not_ready",
+            "checks": checks,
+            "model_version": self.model_version,
+            "warmup_latency_ms": self.warmup_ms,
+            "supabase_latency_ms": self.db_latency_ms,
+            "supabase_error": self.db_error,
+        }
+
+
+readiness = Readiness()
@@ -0,0 +1,145 @@
+import asyncio
+import contextvars
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Set
+
+from fastapi import Request, Response
+
+from config import settings
+from db import get_supabase_client, execute, ownership_cache
+
+# Version terakhir yang pernah dibaca proses ini, per warehouse (None = global).
+# Version hanya naik, jadi nilai ini batas bawah version saat payload dibaca:
+# ETag dengan version lama paling-paling tidak pernah match (200 biasa),
+# tidak pernah menghasilkan 304 yang salah.
+_known_versions: "OrderedDict[Optional[str], int]" = OrderedDict()
+_refreshing: Set[Optional[str]] = set()
+_background: Set[asyncio.Task] = set()
+
+
+def remember_version(warehouse_id: Optional[str], version: int):
+    _known_versions[warehouse_id] = version
+    _known_versions.move_to_end(warehouse_id)
+    while len(_known_versions) > settings.ownership_cache_size:
+        _known_versions.popitem(last=False)
+
+
+def forget_versions():
+    _known_versions.clear()
+
+
+async def get_data_version(warehouse_id: Optional[str] = None) -> int:
+    """
+    Version data warehouse (naik setiap ada write, lihat
+    db/migrations/008_warehouse_versions.sql). Tanpa warehouse_id = version global.
+    """
+    supabase = get_supabase_client()
+    response = await execute(supabase.rpc("data_version", {"p_warehouse_id": warehouse_id}))
+    version = int(response.data or 0)
+    remember_version(warehouse_id, version)
+    return version
+
+
+def _refresh_in_background(warehouse_id: Optional[str]):
+    """Isi _known_versions di luar request (tidak menambah round trip / trace request)"""
+    if warehouse_id in _refreshing:
+        return
+
+    async def refresh():
+        try:
+            await get_data_version(warehouse_id)
+        except Exception as e:
+            print(f"⚠️  Data version refresh failed for {warehouse_id or 'global'}: {e}")
+        finally:
+            _refreshing.discard(warehouse_id)
+
+    _refreshing.add(warehouse_id)
+    task = asyncio.get_running_loop().create_task(refresh(), context=contextvars.Context())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+def make_etag(request: Request, warehouse_id: Optional[str], version: int) -> str:
+    """Strong ETag dari URL (path + query) + warehouse + version data"""
+    raw = f"{request.url.path}?{request.url.query}|{warehouse_id or '*'}|{version}"
+    return '"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [c.strip() for c in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def apply_etag(
+    request: Request,
+    response: Response,
+    warehouse_id: Optional[str],
+    version: int,
+) -> Optional[Response]:
+    """
+    Set ETag di response. Return 304 Response kalau If-None-Match cocok,
+    jadi endpoint bisa langsung return tanpa membangun payload.
+    """
+    remember_version(warehouse_id, version)
+    etag = make_etag(request, warehouse_id, version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+async def check_etag(
+    request: Request,
+    response: Response,
+    warehouse_id: Optional[str] = None,
+) -> Optional[Response]:
+    """
+    Conditional GET tanpa menambah round trip ke request biasa:
+    - dengan If-None-Match: ambil version (satu query ringan) -> 304 atau ETag baru
+    - tanpa If-None-Match: ETag dari version yang sudah diketahui proses ini
+      (tanpa query); belum diketahui -> tanpa ETag, version diambil di background
+    Version gagal dibaca: log, response dikirim tanpa ETag (bukan 500).
+    """
+    if not request.headers.get("if-none-match"):
+        version = _known_versions.get(warehouse_id)
+        if version is None:
+            _refresh_in_background(warehouse_id)
+            return None
+        return apply_etag(request, response, warehouse_id, version)
+
+    try:
+        version = await get_data_version(warehouse_id)
+    except Exception as e:
+        print(f"⚠️  Data version unavailable, serving without ETag: {e}")
+        return None
+    return apply_etag(request, response, warehouse_id, version)
+
+
+async def check_transaction_etag(
+    request: Request,
+    response: Response,
+    transaction_id: str,
+) -> Optional[Response]:
+    """
+    ETag untuk endpoint per transaction: warehouse dari ownership cache.
+    Tanpa If-None-Match hanya pakai entry yang sudah ada di cache (tanpa query).
+    """
+    if not request.headers.get("if-none-match"):
+        txn = ownership_cache.peek_transaction(transaction_id)
+        if txn is None:
+            return None
+        return await check_etag(request, response, txn["warehouse_id"])
+
+    try:
+        txn = await ownership_cache.get_transaction(transaction_id)
+    except Exception as e:
+        print(f"⚠️  Transaction lookup failed, serving without ETag: {e}")
+        return None
+    if txn is None:
+        return None  # biar endpoint yang return 404
+    return await check_etag(request, response, txn["warehouse_id"])
@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, Union
+
+from fastapi import HTTPException, Response
+
+from config import settings
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyStore:
+    """
+    Hasil request per Idempotency-Key (LRU + TTL, per proses).
+
+    - Key yang sudah selesai: return hasil awal tanpa menjalankan handler lagi
+    - Key yang sedang diproses: request kedua menunggu hasil request pertama
+      (serialized, bukan inference / insert kedua)
+    - Handler gagal: tidak disimpan, retry berikutnya menjalankan ulang
+    - Key sama dengan payload beda (fingerprint beda): 422
+    """
+
+    def __init__(self, maxsize: int, ttl_s: float):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[Hashable, Tuple[float, str, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, Tuple[str, asyncio.Future]] = {}
+
+    @staticmethod
+    def _check(stored: str, fingerprint: str):
+        if stored != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key already used with a different request"
+            )
+
+    async def run(self, key: Hashable, fingerprint: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (hasil, replayed)"""
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._check(entry[1], fingerprint)
+                    self._entries.move_to_end(key)
+                    return entry[2], True
+                self._entries.pop(key, None)
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self._check(inflight[0], fingerprint)
+            try:
+                return await asyncio.shield(inflight[1]), True
+            except asyncio.CancelledError:
+                if not inflight[1].cancelled():
+                    raise  # request ini sendiri yang di-cancel
+                # Request pertama di-cancel (client putus): coba ambil alih
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = (fingerprint, future)
+        try:
+            value = await compute()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        self._entries[key] = (time.monotonic() + self.ttl_s, fingerprint, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        future.set_result(value)
+        return value, False
+
+    def clear(self):
+        self._entries.clear()
+
+
+idempotency_store = IdempotencyStore(
+    maxsize=settings.idempotency_cache_size,
+    ttl_s=settings.idempotency_ttl_s,
+)
+
+
+def request_fingerprint(*parts: Union[str, bytes, None]) -> str:
+    """Hash payload request (form fields, isi file, body JSON)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode()
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+async def idempotent(
+    response: Response,
+    idempotency_key: Optional[str],
+    scope: Tuple[Hashable, ...],
+    fingerprint: str,
+    compute: Callable[[], Awaitable[Any]],
+) -> Any:
+    """
+    Jalankan compute() sekali per (scope, Idempotency-Key). Tanpa header =
+    perilaku biasa. Response replay diberi header Idempotent-Replayed: true.
+    """
+    if not idempotency_key:
+        return await compute()
+    if len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key too long")
+
+    value, replayed = await idempotency_store.run((*scope, idempotency_key), fingerprint, compute)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return value
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+import anyio
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+
+from config import settings
+from db import get_supabase_client, execute
+
+
+def merge_pending(records: List[dict], pending: List[dict]) -> List[dict]:
+    """
+    records dari database + record journal yang belum ter-flush (read-your-writes).
+    Baca pending SEBELUM query database: record yang ter-flush di antaranya
+    muncul di dua-duanya (di-dedup by id), bukan hilang dari dua-duanya.
+    """
+    if not pending:
+        return records
+    saved = {r.get("id") for r in records}
+    return records + [r for r in pending if r["id"] not in saved]
+
+
+def _is_constraint_violation(error: APIError) -> bool:
+    # SQLSTATE class 23 = integrity constraint violation (FK, not null, check)
+    return str(error.code or "").startswith("23")
+
+
+class HarvestJournal:
+    """
+    Write-behind untuk harvest_records (WRITE_BEHIND_ENABLED=true).
+
+    detect-and-save menulis record ke journal SQLite lokal (WAL, synchronous=FULL,
+    jadi tetap ada setelah crash / restart) lalu langsung return. Flusher di
+    background mengirim isi journal ke database per batch (upsert by id, jadi
+    retry setelah sukses parsial tidak membuat duplikat) dengan exponential
+    backoff kalau database error. Row dihapus dari journal setelah tersimpan.
+
+    Endpoint summary menggabungkan record yang masih pending (read-your-writes).
+    """
+
+    def __init__(self, path: str, flush_interval_s: float, max_backoff_s: float, batch_size: int):
+        self.path = path
+        self.flush_interval_s = flush_interval_s
+        self.max_backoff_s = max_backoff_s
+        self.batch_size = batch_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.flushed = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # SQLite (dipanggil di worker thread)
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS harvest_journal ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " id TEXT NOT NULL UNIQUE,"
+                " transaction_id TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " last_error TEXT,"
+                " dead INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS harvest_journal_transaction_id_idx"
+                " ON harvest_journal (transaction_id)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _append(self, rows: List[dict]):
+        with self._lock:
+            self._connect().executemany(
+                "INSERT OR IGNORE INTO harvest_journal (id, transaction_id, payload) VALUES (?, ?, ?)",
+                [(row["id"], row["transaction_id"], json.dumps(row)) for row in rows],
+            )
+
+    def _select(self, where: str = "", params: tuple = (), limit: Optional[int] = None) -> List[dict]:
+        sql = f"SELECT payload FROM harvest_journal WHERE dead = 0 {where} ORDER BY seq"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return [json.loads(payload) for (payload,) in self._connect().execute(sql, params)]
+
+    def _remove(self, ids: List[str]):
+        with self._lock:
+            self._connect().executemany("DELETE FROM harvest_journal WHERE id = ?", [(i,) for i in ids])
+
+    def _mark_failed(self, ids: List[str], error: str):
+        with self._lock:
+            self._connect().executemany(
+                "UPDATE harvest_journal SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                [(error, i) for i in ids],
+            )
+
+    def _mark_dead(self, record_id: str, error: str):
+        with self._lock:
+            self._connect().execute(
+                "UPDATE harvest_journal SET dead = 1, attempts = attempts + 1, last_error = ? WHERE id = ?",
+                (error, record_id),
+            )
+
+    def pending_count(self, dead: bool = False) -> int:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT count(*) FROM harvest_journal WHERE dead = ?", (int(dead),)
+            ).fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # API async
+    # ------------------------------------------------------------------
+
+    async def append(self, row: dict):
+        """Tulis (durable) ke journal; flusher dibangunkan supaya cepat terkirim"""
+        await anyio.to_thread.run_sync(self._append, [row])
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def pending_for_transaction(self, transaction_id: str) -> List[dict]:
+        if not settings.write_behind_enabled:
+            return []
+        return await anyio.to_thread.run_sync(
+            lambda: self._select("AND transaction_id = ?", (transaction_id,))
+        )
+
+    async def _write(self, rows: List[dict]):
+        supabase = get_supabase_client()
+        await execute(
+            supabase.table("harvest_records")
+            .upsert(rows, on_conflict="id", ignore_duplicates=True, returning=ReturnMethod.minimal)
+        )
+        await anyio.to_thread.run_sync(self._remove, [row["id"] for row in rows])
+        self.flushed += len(rows)
+
+    async def flush_record(self, record_id: str):
+        """Pastikan satu record sudah ada di database (sebelum di-update langsung)"""
+        if not settings.write_behind_enabled:
+            return
+        rows = await anyio.to_thread.run_sync(lambda: self._select("AND id = ?", (record_id,)))
+        if rows:
+            await self._write(rows)
+
+    async def flush_once(self) -> int:
+        """Kirim satu batch (yang paling lama dulu); return jumlah row"""
+        rows = await anyio.to_thread.run_sync(lambda: self._select(limit=self.batch_size))
+        if not rows:
+            return 0
+        try:
+            try:
+                await self._write(rows)
+            except APIError as e:
+                if not _is_constraint_violation(e):
+                    raise
+                await self._write_one_by_one(rows)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            await anyio.to_thread.run_sync(self._mark_failed, [row["id"] for row in rows], str(e))
+            raise
+        return len(rows)
+
+    async def _write_one_by_one(self, rows: List[dict]):
+        """
+        Batch ditolak constraint (mis. transaction sudah dihapus): tulis per row,
+        row yang tetap ditolak dipindah ke dead letter supaya tidak memblok antrian
+        """
+        for row in rows:
+            try:
+                await self._write([row])
+            except APIError as e:
+                if not _is_constraint_violation(e):
+                    raise
+                print(f"⚠️  Harvest record {row['id']} rejected by database, moved to dead letter: {e}")
+                await anyio.to_thread.run_sync(self._mark_dead, row["id"], str(e))
+
+    async def _run(self):
+        backoff = 0.0
+        while True:
+            self._wakeup.clear()
+            try:
+                flushed = await self.flush_once()
+                backoff = 0.0
+                if flushed == self.batch_size:
+                    continue  # masih ada backlog
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                backoff = min(max(backoff * 2, self.flush_interval_s), self.max_backoff_s)
+                print(f"⚠️  Journal flush failed, retry in {backoff:.1f}s: {e}")
+                await asyncio.sleep(backoff)
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval_s)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        self._connect()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        pending = self.pending_count()
+        if pending:
+            print(f"📒 Harvest journal: {pending} pending records from previous run")
+
+    async def stop(self, drain_timeout_s: float = 5.0):
+        """Stop flusher, coba kirim sisa journal (sisanya tetap aman di disk)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            with anyio.fail_after(drain_timeout_s):
+                while await self.flush_once():
+                    pass
+        except Exception as e:
+            print(f"⚠️  Journal not fully drained ({self.pending_count()} pending): {e}")
+        self._wakeup = None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "pending": self.pending_count(),
+            "dead": self.pending_count(dead=True),
+            "flushed": self.flushed,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+harvest_journal = HarvestJournal(
+    path=settings.write_behind_journal_path,
+    flush_interval_s=settings.write_behind_flush_interval_s,
+    max_backoff_s=settings.write_behind_max_backoff_s,
+    batch_size=settings.batch_insert_chunk_size,
+)
@@ -0,0 +1,79 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from config import settings
+
+
+class ResponseCache:
+    """
+    Stale-while-revalidate cache dengan single-flight, key diawali warehouse_id.
+
+    - umur <= fresh_s               : langsung return
+    - fresh_s < umur <= fresh_s + stale_s : return data lama, refresh di background
+    - lebih tua / belum ada         : hitung, request lain untuk key yang sama
+                                      menunggu komputasi yang sama (bukan query baru)
+    """
+
+    def __init__(self, fresh_s: float, stale_s: float, maxsize: int):
+        self.fresh_s = fresh_s
+        self.stale_s = stale_s
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        self.computations = 0
+
+    async def get_or_compute(self, key: Tuple[Hashable, ...], compute: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age <= self.fresh_s:
+                self._entries.move_to_end(key)
+                return entry[1]
+            if age <= self.fresh_s + self.stale_s:
+                self._entries.move_to_end(key)
+                self._start(key, compute)
+                return entry[1]
+
+        return await asyncio.shield(self._start(key, compute))
+
+    def _start(self, key: Tuple, compute: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, compute))
+            # Refresh background yang gagal tidak punya waiter: ambil exception-nya
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return task
+
+    async def _run(self, key: Tuple, compute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            self.computations += 1
+            value = await compute()
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return value
+        except Exception as e:
+            if key in self._entries:
+                print(f"⚠️  Background refresh failed for {key[:2]}, serving stale: {e}")
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, warehouse_id: str):
+        """Buang semua entry milik satu warehouse (setelah ada write)"""
+        for key in [k for k in self._entries if k[0] == warehouse_id]:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+dashboard_cache = ResponseCache(
+    fresh_s=settings.dashboard_cache_fresh_s,
+    stale_s=settings.dashboard_cache_stale_s,
+    maxsize=settings.dashboard_cache_size,
+)
@@ -0,0 +1,182 @@
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Optional, Tuple
+
+from config import settings
+
+# weight_kg kalau tidak ada timbangan / belum ada berat stabil
+DEFAULT_WEIGHT_KG = 100.0
+
+
+class WeightStabilizer:
+    """
+    Deteksi berat stabil dari stream sample timbangan (10-50 Hz).
+
+    Berat dianggap settled kalau sample selama window_s terakhir semuanya
+    di atas min_load_kg dan selisih max-min <= tolerance_kg. Satu karung = satu
+    berat: setelah settled, stabilizer baru aktif lagi setelah timbangan
+    kosong (sample < min_load_kg). Memory dibatasi max_samples per station.
+    """
+
+    __slots__ = ("window_s", "tolerance_kg", "min_load_kg", "samples", "armed")
+
+    def __init__(self, window_s: float, tolerance_kg: float, min_load_kg: float, max_samples: int):
+        self.window_s = window_s
+        self.tolerance_kg = tolerance_kg
+        self.min_load_kg = min_load_kg
+        self.samples: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+        self.armed = True
+
+    def add(self, t: float, kg: float) -> Optional[float]:
+        """Tambah satu sample; return berat settled (sekali per karung) atau None"""
+        if kg < self.min_load_kg:
+            self.armed = True
+            self.samples.clear()
+            return None
+        if not self.armed:
+            return None  # karung yang sama masih di timbangan
+
+        samples = self.samples
+        if samples and t < samples[-1][0]:
+            samples.clear()  # timestamp mundur (device reset): mulai ulang window
+        samples.append((t, kg))
+        # Simpan sample minimum yang masih menutup window_s
+        while len(samples) > 1 and t - samples[1][0] >= self.window_s:
+            samples.popleft()
+        if t - samples[0][0] < self.window_s:
+            return None
+
+        low = min(kg for _, kg in samples)
+        high = max(kg for _, kg in samples)
+        if high - low > self.tolerance_kg:
+            return None
+
+        self.armed = False
+        return round(sum(kg for _, kg in samples) / len(samples), 2)
+
+
+class ScaleStation:
+    __slots__ = ("stabilizer", "settled", "awaiting", "last_weight_kg", "samples")
+
+    def __init__(self, stabilizer: WeightStabilizer, max_pending: int):
+        self.stabilizer = stabilizer
+        self.settled: Deque[Tuple[float, float]] = deque(maxlen=max_pending)  # (monotonic, kg)
+        self.awaiting: Deque[Tuple[float, dict]] = deque(maxlen=max_pending)  # (monotonic, record)
+        self.last_weight_kg: Optional[float] = None
+        self.samples = 0
+
+
+class ScaleHub:
+    """
+    State timbangan per (warehouse, station) dan pencocokan berat <-> deteksi.
+
+    Urutan di lapangan bisa dua-duanya:
+    - berat settled dulu, lalu karung di-scan: detect-and-save mengambil berat
+      yang belum dipakai (claim_weight)
+    - karung di-scan dulu: record menunggu (await_weight) dan diisi saat berat
+      berikutnya settled (add_sample return record tersebut)
+
+    Pasangan hanya dicocokkan kalau selisih waktunya <= match_window_s.
+    Jumlah station dibatasi (LRU), antrian per station juga dibatasi.
+    Semua method sync dan dipanggil dari event loop, jadi tidak perlu lock.
+    """
+
+    def __init__(
+        self,
+        window_s: float,
+        tolerance_kg: float,
+        min_load_kg: float,
+        match_window_s: float,
+        max_samples: int,
+        max_pending: int,
+        max_stations: int
+    ):
+        self.window_s = window_s
+        self.tolerance_kg = tolerance_kg
+        self.min_load_kg = min_load_kg
+        self.match_window_s = match_window_s
+        self.max_samples = max_samples
+        self.max_pending = max_pending
+        self.max_stations = max_stations
+        self._stations: "OrderedDict[Tuple[str, str], ScaleStation]" = OrderedDict()
+
+    def station(self, warehouse_id: str, station_id: str) -> ScaleStation:
+        key = (warehouse_id, station_id)
+        station = self._stations.get(key)
+        if station is None:
+            station = ScaleStation(
+                WeightStabilizer(self.window_s, self.tolerance_kg, self.min_load_kg, self.max_samples),
+                self.max_pending
+            )
+            self._stations[key] = station
+            while len(self._stations) > self.max_stations:
+                self._stations.popitem(last=False)
+        else:
+            self._stations.move_to_end(key)
+        return station
+
+    def _fresh(self, queue: deque, now: float) -> Optional[tuple]:
+        """Ambil entry paling lama yang belum kadaluarsa (yang kadaluarsa dibuang)"""
+        while queue:
+            entry = queue.popleft()
+            if now - entry[0] <= self.match_window_s:
+                return entry
+        return None
+
+    def add_sample(
+        self,
+        warehouse_id: str,
+        station_id: str,
+        kg: float,
+        t: Optional[float] = None
+    ) -> Optional[Tuple[float, Optional[dict]]]:
+        """
+        Return None, atau (berat settled, record deteksi yang menunggu berat ini
+        atau None kalau berat disimpan untuk deteksi berikutnya)
+        """
+        now = time.monotonic()
+        station = self.station(warehouse_id, station_id)
+        station.samples += 1
+        weight_kg = station.stabilizer.add(now if t is None else t, kg)
+        if weight_kg is None:
+            return None
+
+        station.last_weight_kg = weight_kg
+        entry = self._fresh(station.awaiting, now)
+        if entry is not None:
+            return weight_kg, entry[1]
+        station.settled.append((now, weight_kg))
+        return weight_kg, None
+
+    def claim_weight(self, warehouse_id: str, station_id: str) -> Optional[Tuple[float, float]]:
+        """
+        Berat settled yang belum dipakai deteksi lain: (waktu settled, kg) atau None.
+        Kalau record gagal disimpan, kembalikan dengan release_weight supaya
+        karung berikutnya tidak bergeser ke berat yang salah.
+        """
+        return self._fresh(self.station(warehouse_id, station_id).settled, time.monotonic())
+
+    def release_weight(self, warehouse_id: str, station_id: str, claim: Tuple[float, float]):
+        """Kembalikan berat yang di-claim ke depan antrian (urutan tetap)"""
+        self.station(warehouse_id, station_id).settled.appendleft(claim)
+
+    def await_weight(self, warehouse_id: str, station_id: str, record: dict):
+        """Record deteksi tanpa berat: isi dengan berat settled berikutnya"""
+        self.station(warehouse_id, station_id).awaiting.append((time.monotonic(), record))
+
+    def station_count(self) -> int:
+        return len(self._stations)
+
+    def clear(self):
+        self._stations.clear()
+
+
+scale_hub = ScaleHub(
+    window_s=settings.scale_window_s,
+    tolerance_kg=settings.scale_tolerance_kg,
+    min_load_kg=settings.scale_min_load_kg,
+    match_window_s=settings.scale_match_window_s,
+    max_samples=settings.scale_max_samples,
+    max_pending=settings.scale_max_pending,
+    max_stations=settings.scale_max_stations,
+)
@@ -0,0 +1,70 @@
+import time
+
+from config import settings
+from db.query import trace_queries, QueryTrace
+
+# Batas entry per-query di header (header besar ditolak sebagian proxy)
+MAX_TIMING_ENTRIES = 20
+
+
+def server_timing(trace: QueryTrace, total_ms: float) -> str:
+    """
+    Header Server-Timing, contoh:
+    db;dur=31.2;desc="3 queries", q1;dur=10.4;desc="GET transactions", ..., total;dur=45.0
+    """
+    entries = [f'db;dur={trace.total_ms:.1f};desc="{trace.count} queries"']
+    entries += [
+        f'q{i};dur={ms:.1f};desc="{target}"'
+        for i, (target, ms) in enumerate(trace.queries[:MAX_TIMING_ENTRIES], start=1)
+    ]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+class QueryTracingMiddleware:
+    """
+    ASGI middleware: catat round trip database per request (db.query.execute),
+    kirim sebagai header Server-Timing dan log request yang lambat.
+
+    Pure ASGI (bukan BaseHTTPMiddleware) supaya StreamingResponse export tetap
+    streaming; untuk response streaming header hanya memuat query sebelum
+    byte pertama dikirim. Stream SSE (text/event-stream) memang berumur panjang,
+    jadi tidak dilog sebagai slow request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 0, "event_stream": False}
+
+        with trace_queries() as trace:
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    status["code"] = message["status"]
+                    status["event_stream"] = any(
+                        name == b"content-type" and value.startswith(b"text/event-stream")
+                        for name, value in message.get("headers", [])
+                    )
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(trace, elapsed_ms).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                if elapsed_ms >= settings.slow_request_ms and not status["event_stream"]:
+                    slowest = sorted(trace.queries, key=lambda q: q[1], reverse=True)[:3]
+                    print(
+                        f"🐢 Slow request {scope['method']} {scope['path']} -> {status['code']}: "
+                        f"{elapsed_ms:.0f} ms, {trace.count} queries ({trace.total_ms:.0f} ms db)"
+                        + "".join(f"\n   - {target}: {ms:.1f} ms" for target, ms in slowest)
+                    )
@@ -0,0 +1,203 @@
+import sys
+import asyncio
+import random
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+print("=" * 70)
+print("🧪 CODE ALLOCATOR CONCURRENCY TEST")
+print("=" * 70)
+
+from db.codes import CodeAllocator
+import db.codes
+
+
+class FakeCounterDB:
+    """Emulasi RPC allocate_code_block: counter atomic + latency round trip"""
+
+    def __init__(self, latency_s: float = 0.005):
+        self.latency_s = latency_s
+        self.counters = {}
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def rpc(self, name, params):
+        db = self
+
+        class Call:
+            def execute(self):
+                time.sleep(db.latency_s)
+                with db.lock:
+                    db.calls += 1
+                    value = db.counters.get(params["p_prefix"], 0) + params["p_count"]
+                    db.counters[params["p_prefix"]] = value
+
+                class Response:
+                    data = value
+                return Response()
+
+        return Call()
+
+
+fake_db = FakeCounterDB()
+real_get_supabase_client = db.codes.get_supabase_client
+db.codes.get_supabase_client = lambda: fake_db
+
+WORKERS = 4
+CODES_PER_WORKER = 2500
+
+
+async def run_worker(allocator: CodeAllocator):
+    async def one():
+        sequence = await allocator.next("TXN20251130")
+        return f"TXN20251130{sequence:04d}"
+    return await asyncio.gather(*(one() for _ in range(CODES_PER_WORKER)))
+
+
+def run_in_thread(results, allocator):
+    # Setiap "worker" punya event loop + allocator sendiri, counter DB di-share
+    results.extend(asyncio.run(run_worker(allocator)))
+
+
+print(f"\n1️⃣  Allocating {WORKERS * CODES_PER_WORKER} codes from {WORKERS} workers in parallel...")
+results = []
+threads = [
+    threading.Thread(target=run_in_thread, args=(results, CodeAllocator(block_size=20)))
+    for _ in range(WORKERS)
+]
+started = time.perf_counter()
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+elapsed = time.perf_counter() - started
+
+duplicates = len(results) - len(set(results))
+print(f"   - Codes: {len(results)} in {elapsed:.2f}s")
+print(f"   - Round trips: {fake_db.calls}")
+print(f"   - Duplicates: {duplicates}")
+
+if len(results) != WORKERS * CODES_PER_WORKER or duplicates:
+    print("   ❌ Failed")
+    sys.exit(1)
+print("   ✅ No duplicates")
+
+print("\n2️⃣  Checking round trips are amortized by block preallocation...")
+if fake_db.calls > (WORKERS * CODES_PER_WORKER) // 20 + WORKERS:
+    print(f"   ❌ Too many round trips: {fake_db.calls}")
+    sys.exit(1)
+print(f"   ✅ {fake_db.calls} round trips for {len(results)} codes")
+
+print("\n3️⃣  Checking prefixes are independent...")
+allocator = CodeAllocator(block_size=5)
+first = asyncio.run(allocator.next("F20251201"))
+if first != 1:
+    print(f"   ❌ Expected new prefix to start at 1, got {first}")
+    sys.exit(1)
+print("   ✅ New prefix starts at 1")
+
+db.codes.get_supabase_client = real_get_supabase_client
+
+print("\n4️⃣  Creating transactions & farmers in parallel through the API (local database)...")
+import httpx
+
+from config import settings
+from db.local import LocalDatabase, reset_local_database
+from db.local_seed import seed
+
+settings.database_backend = "local"
+database = LocalDatabase(latency_ms=2)
+seed(database, warehouses=4, farmers_per_warehouse=5, transactions_per_farmer=0, sacks_per_transaction=0)
+reset_local_database(database)
+
+from fastapi import FastAPI
+import routers.farmers
+import routers.transactions
+
+app = FastAPI()
+app.include_router(routers.farmers.router)
+app.include_router(routers.transactions.router)
+
+TRANSACTIONS = 3000
+FARMERS = 1000
+
+
+class WorkerAllocators:
+    """Simulasi beberapa proses API: tiap request acak ke allocator (blok) salah satu worker"""
+
+    def __init__(self, count: int):
+        self.allocators = [CodeAllocator(block_size=20) for _ in range(count)]
+        self.rng = random.Random(1)
+
+    async def next(self, prefix: str) -> int:
+        return await self.rng.choice(self.allocators).next(prefix)
+
+
+routers.transactions.code_allocator = WorkerAllocators(WORKERS)
+routers.farmers.code_allocator = WorkerAllocators(WORKERS)
+
+warehouse_farmers = [
+    (farmer["registered_by_warehouse"], farmer["id"])
+    for farmer in database.tables["farmers"].rows.values()
+]
+
+
+async def create_all():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://codes") as client:
+        transactions = [
+            client.post(
+                "/api/transactions/create",
+                headers={"X-Warehouse-ID": warehouse_farmers[i % len(warehouse_farmers)][0]},
+                json={"farmer_id": warehouse_farmers[i % len(warehouse_farmers)][1], "initial_price": 5000},
+            )
+            for i in range(TRANSACTIONS)
+        ]
+        farmers = [
+            client.post(
+                "/api/farmers/register",
+                headers={"X-Warehouse-ID": warehouse_farmers[i % len(warehouse_farmers)][0]},
+                json={"full_name": f"Petani {i}", "phone": f"08{i:010d}"},
+            )
+            for i in range(FARMERS)
+        ]
+        return await asyncio.gather(*transactions, *farmers)
+
+
+started = time.perf_counter()
+responses = asyncio.run(create_all())
+elapsed = time.perf_counter() - started
+
+failed = [r for r in responses if r.status_code != 200]
+if failed:
+    print(f"   ❌ {len(failed)} requests failed, first: {failed[0].status_code} {failed[0].text}")
+    sys.exit(1)
+
+transaction_codes = [
+    t["transaction_code"] for t in database.tables["transactions"].rows.values()
+    if t["transaction_code"].startswith("TXN") and not t["transaction_code"].startswith("TXNSEED")
+]
+farmer_codes = [
+    f["farmer_code"] for f in database.tables["farmers"].rows.values()
+    if not f["farmer_code"].startswith("FSEED")
+]
+print(f"   - {len(responses)} requests in {elapsed:.2f}s")
+print(f"   - Transaction codes: {len(transaction_codes)}, unique: {len(set(transaction_codes))}")
+print(f"   - Farmer codes: {len(farmer_codes)}, unique: {len(set(farmer_codes))}")
+
+if len(transaction_codes) != TRANSACTIONS or len(set(transaction_codes)) != TRANSACTIONS:
+    print("   ❌ Duplicate or missing transaction codes")
+    sys.exit(1)
+if len(farmer_codes) != FARMERS or len(set(farmer_codes)) != FARMERS:
+    print("   ❌ Duplicate or missing farmer codes")
+    sys.exit(1)
+print("   ✅ No duplicates in stored transaction_code / farmer_code")
+
+reset_local_database()
+
+print("\n" + "=" * 70)
+print("✅ ALL TESTS PASSED!")
+print("=" * 70)
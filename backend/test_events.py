@@ -0,0 +1,227 @@
+import sys
+import asyncio
+import json
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+print("=" * 70)
+print("🧪 LIVE EVENTS (SSE) TEST")
+print("=" * 70)
+
+import httpx
+
+from config import settings
+from db.local import LocalDatabase, reset_local_database
+from db.local_seed import seed
+from benchmarks.loadtest import make_sack_images
+
+settings.database_backend = "local"
+settings.online_learning_enabled = False
+settings.write_behind_enabled = False
+
+database = LocalDatabase(latency_ms=2)
+seed(database, warehouses=2, farmers_per_warehouse=2, transactions_per_farmer=1, sacks_per_transaction=0)
+reset_local_database(database)
+
+from fastapi import FastAPI
+import routers.events
+import routers.ml_harvest
+import routers.payments
+import routers.sync
+import routers.transactions
+from services.events import event_broker
+from services.response_cache import dashboard_cache
+
+app = FastAPI()
+for module in (routers.events, routers.ml_harvest, routers.payments, routers.sync, routers.transactions):
+    app.include_router(module.router)
+
+WAREHOUSE_ID, OTHER_WAREHOUSE_ID = list(database.tables["warehouses"].rows)
+TRANSACTION_ID = database.tables["transactions"].lookup("warehouse_id", WAREHOUSE_ID)[0]["id"]
+HEADERS = {"X-Warehouse-ID": WAREHOUSE_ID}
+SUBSCRIBERS = 300
+
+
+def fail(message):
+    print(f"   ❌ {message}")
+    sys.exit(1)
+
+
+class Stream:
+    """Client SSE langsung lewat ASGI (httpx.ASGITransport menunggu body selesai)"""
+
+    def __init__(self, headers, query=""):
+        self.events = asyncio.Queue()
+        self.disconnected = asyncio.Event()
+        self.status = None
+        self._buffer = ""
+        scope = {
+            "type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": "/api/events/stream",
+            "raw_path": b"/api/events/stream", "query_string": query.encode(), "root_path": "",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+            "client": ("test", 1), "server": ("test", 80),
+        }
+        self.task = asyncio.create_task(app(scope, self._receive, self._send))
+
+    async def _receive(self):
+        await self.disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def _send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message["type"] == "http.response.body":
+            self._buffer += message.get("body", b"").decode()
+            while "\n\n" in self._buffer:
+                block, self._buffer = self._buffer.split("\n\n", 1)
+                fields = dict(line.split(": ", 1) for line in block.split("\n") if ": " in line)
+                if "event" in fields:
+                    await self.events.put(fields)
+
+    async def next(self, event_type=None, timeout=2.0):
+        while True:
+            event = await asyncio.wait_for(self.events.get(), timeout)
+            if event_type is None or event["event"] == event_type:
+                return event
+
+    async def close(self):
+        self.disconnected.set()
+        await asyncio.wait_for(self.task, 2.0)
+
+
+async def main():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://events") as client:
+        print(f"\n1️⃣  {SUBSCRIBERS} idle subscribers...")
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        streams = [Stream(HEADERS) for _ in range(SUBSCRIBERS)]
+        for stream in streams:
+            await stream.next("ready")
+        per_subscriber_kb = (tracemalloc.get_traced_memory()[0] - baseline) / 1024 / SUBSCRIBERS
+        tracemalloc.stop()
+        if event_broker.subscriber_count(WAREHOUSE_ID) != SUBSCRIBERS:
+            fail(f"Expected {SUBSCRIBERS} subscribers, got {event_broker.subscriber_count(WAREHOUSE_ID)}")
+        if per_subscriber_kb > 64:
+            fail(f"Idle subscriber too expensive: {per_subscriber_kb:.1f} KB")
+        print(f"   ✅ {per_subscriber_kb:.1f} KB per idle subscriber")
+
+        other = Stream({}, query=f"warehouse_id={OTHER_WAREHOUSE_ID}")
+        await other.next("ready")
+
+        print("\n2️⃣  detect-and-save fans out to all subscribers...")
+        started = time.perf_counter()
+        response = await client.post(
+            "/api/ml-harvest/detect-and-save", headers=HEADERS,
+            data={"transaction_id": TRANSACTION_ID},
+            files={"file": ("sack.jpg", make_sack_images(1)[0], "image/jpeg")},
+        )
+        if response.status_code != 200:
+            fail(f"{response.status_code}: {response.text}")
+        events = [await stream.next("harvest_records_saved") for stream in streams]
+        fanout_ms = (time.perf_counter() - started) * 1000
+        data = json.loads(events[0]["data"])
+        if data["sacks"] != 1 or data["records"][0]["id"] != response.json()["id"]:
+            fail(f"Unexpected event: {data}")
+        if data["transactions"][TRANSACTION_ID]["sacks"] != 1:
+            fail(f"Missing counters: {data}")
+        if not other.events.empty():
+            fail("Event leaked to another warehouse")
+        print(f"   ✅ {SUBSCRIBERS} subscribers notified in {fanout_ms:.0f} ms (incl. inference)")
+
+        for stream in streams[1:]:
+            await stream.close()
+        if event_broker.subscriber_count(WAREHOUSE_ID) != 1:
+            fail(f"Subscribers not cleaned up: {event_broker.subscriber_count(WAREHOUSE_ID)}")
+        stream = streams[0]
+
+        print("\n3️⃣  Sync, complete-recording and payments publish events...")
+        cached = {"sacks": 0}
+        await dashboard_cache.get_or_compute((WAREHOUSE_ID, "test"), lambda: asyncio.sleep(0, cached))
+        now = datetime.now(timezone.utc).isoformat()
+        records = [
+            {"id": str(uuid.uuid4()), "transaction_id": TRANSACTION_ID, "grade": grade,
+             "sack_color": "merah", "detection_confidence": 90.0, "recorded_at": now}
+            for grade in "AAB"
+        ]
+        await client.post("/api/sync/harvest-records", headers=HEADERS, json={"records": records})
+        synced = json.loads((await stream.next("harvest_records_saved"))["data"])
+        if synced["source"] != "sync" or synced["grades_breakdown"] != {"A": 2, "B": 1}:
+            fail(f"Unexpected sync event: {synced}")
+
+        await client.post(f"/api/transactions/{TRANSACTION_ID}/complete-recording", headers=HEADERS)
+        completed = json.loads((await stream.next("recording_completed"))["data"])
+        if completed["total_records"] != 4:
+            fail(f"Unexpected recording event: {completed}")
+
+        payment = (await client.post("/api/payments/create", headers=HEADERS, json={
+            "transaction_id": TRANSACTION_ID, "amount": 50000, "payment_method": "cash"
+        })).json()
+        created = json.loads((await stream.next("payment_created"))["data"])
+        await client.put(f"/api/payments/{payment['id']}/approve", headers=HEADERS, json={"status": "approved"})
+        approved_event = await stream.next("payment_status_changed")
+        approved = json.loads(approved_event["data"])
+        if created["payment_id"] != payment["id"] or approved["total_approved"] != 50000:
+            fail(f"Unexpected payment events: {created} / {approved}")
+        cached_now = await dashboard_cache.get_or_compute((WAREHOUSE_ID, "test"), lambda: asyncio.sleep(0, {}))
+        if cached_now is not cached:
+            fail("Publishing events dropped the dashboard cache")
+        print("   ✅ sync, recording_completed, payment_created, payment_status_changed")
+        print("   ✅ Dashboard cache kept (refreshed by fresh_s, not per event)")
+
+        print("\n4️⃣  Reconnect with Last-Event-ID replays missed events...")
+        last_id = int(approved_event["id"])
+        await stream.close()
+        await client.post("/api/payments/create", headers=HEADERS, json={
+            "transaction_id": TRANSACTION_ID, "amount": 1000, "payment_method": "cash"
+        })
+        resumed = Stream({**HEADERS, "Last-Event-ID": str(last_id)})
+        missed = await resumed.next()
+        if missed["event"] != "payment_created" or int(missed["id"]) != last_id + 1:
+            fail(f"Expected replayed payment_created, got {missed}")
+        stale = Stream({**HEADERS, "Last-Event-ID": "999999"})
+        if (await stale.next())["event"] != "resync":
+            fail("Unknown Last-Event-ID must trigger resync")
+        print("   ✅ Missed event replayed, unknown id -> resync")
+
+        print("\n5️⃣  Slow subscriber does not block publishers...")
+        queue_size = event_broker.queue_size
+        existing = set(event_broker._subscribers[WAREHOUSE_ID])
+        slow = Stream(HEADERS)
+        await slow.next("ready")
+        slow_sub = next(iter(event_broker._subscribers[WAREHOUSE_ID] - existing))
+        for _ in range(queue_size):
+            slow_sub.queue.put_nowait("")
+        dropped = event_broker.dropped
+        event_broker.publish(WAREHOUSE_ID, "test", {})
+        if event_broker.dropped != dropped + 1 or not slow_sub.overflowed:
+            fail("Overflow not detected")
+        for _ in range(queue_size):
+            slow_sub.queue.get_nowait()
+        slow_sub.queue.put_nowait("")
+        if (await slow.next())["event"] != "resync":
+            fail("Overflowed subscriber did not get resync")
+        print("   ✅ Event dropped for the slow subscriber, resync sent")
+
+        for s in (resumed, stale, slow, other):
+            await s.close()
+        if event_broker.subscriber_count() != 0:
+            fail(f"Leaked subscribers: {event_broker.subscriber_count()}")
+
+        missing = await client.get("/api/events/stream")
+        if missing.status_code != 400:
+            fail(f"Expected 400 without warehouse, got {missing.status_code}")
+
+
+asyncio.run(main())
+reset_local_database()
+
+print("\n" + "=" * 70)
+print("✅ ALL TESTS PASSED!")
+print("=" * 70)
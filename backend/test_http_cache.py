@@ -0,0 +1,112 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+print("=" * 70)
+print("🧪 ETAG / CONDITIONAL GET TEST")
+print("=" * 70)
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routers.dashboard
+import routers.farmers
+import services.http_cache
+from services.response_cache import dashboard_cache
+
+WAREHOUSE_ID = "51b51eb1-2552-431e-b53b-b5bfb856a70b"
+HEADERS = {"X-Warehouse-ID": WAREHOUSE_ID}
+
+state = {"version": 1, "payload_queries": 0}
+
+
+async def fake_data_version(warehouse_id=None):
+    return state["version"]
+
+
+async def fake_execute(query):
+    state["payload_queries"] += 1
+
+    class Response:
+        data = [{"farmers_count": 3, "total_spent": 1000, "grade_a": 5, "grade_b": 2, "grade_c": 1}]
+    return Response()
+
+
+async def fake_fetch_page(query, limit, cursor=None):
+    state["payload_queries"] += 1
+    return [{"id": "f1", "created_at": "2025-11-30T08:00:00+00:00"}], None
+
+
+class FakeClient:
+    def rpc(self, name, params):
+        return None
+
+    def table(self, name):
+        class Query:
+            def select(self, *args, **kwargs):
+                return self
+
+            def eq(self, *args):
+                return self
+        return Query()
+
+
+services.http_cache.get_data_version = fake_data_version
+routers.dashboard.get_data_version = fake_data_version
+routers.dashboard.execute = fake_execute
+routers.dashboard.get_supabase_client = lambda: FakeClient()
+routers.farmers.fetch_page = fake_fetch_page
+routers.farmers.get_supabase_client = lambda: FakeClient()
+
+app = FastAPI()
+app.include_router(routers.dashboard.router)
+app.include_router(routers.farmers.router)
+client = TestClient(app)
+
+
+def fail(message):
+    print(f"   ❌ {message}")
+    sys.exit(1)
+
+
+print("\n1️⃣  First request returns payload + strong ETag...")
+r = client.get("/api/dashboard/warehouse-summary", headers=HEADERS)
+etag = r.headers.get("etag")
+if r.status_code != 200 or not etag or etag.startswith("W/"):
+    fail(f"Expected 200 with strong ETag, got {r.status_code} {etag}")
+print(f"   ✅ 200, ETag {etag}")
+
+print("\n2️⃣  If-None-Match answered with 304, no payload query...")
+before = state["payload_queries"]
+r = client.get("/api/dashboard/warehouse-summary", headers={**HEADERS, "If-None-Match": etag})
+if r.status_code != 304 or r.content or r.headers.get("etag") != etag:
+    fail(f"Expected empty 304, got {r.status_code}")
+if state["payload_queries"] != before:
+    fail("Payload was rebuilt for a 304")
+print("   ✅ 304 from cached version")
+
+print("\n3️⃣  New data version -> new ETag + 200...")
+state["version"] = 2
+dashboard_cache.invalidate(WAREHOUSE_ID)
+r = client.get("/api/dashboard/warehouse-summary", headers={**HEADERS, "If-None-Match": etag})
+if r.status_code != 200 or r.headers.get("etag") == etag:
+    fail(f"Expected 200 with new ETag, got {r.status_code}")
+print("   ✅ 200 with new ETag")
+
+print("\n4️⃣  List endpoint: 304 skips the list query, ETag depends on query params...")
+url = f"/api/farmers/warehouse/{WAREHOUSE_ID}/list"
+r = client.get(url)
+list_etag = r.headers.get("etag")
+before = state["payload_queries"]
+r = client.get(url, headers={"If-None-Match": list_etag})
+if r.status_code != 304 or state["payload_queries"] != before:
+    fail(f"Expected 304 without list query, got {r.status_code}")
+r = client.get(url + "?limit=10", headers={"If-None-Match": list_etag})
+if r.status_code != 200:
+    fail("Different query params must not match the ETag")
+print("   ✅ 304 without list query, params change ETag")
+
+print("\n" + "=" * 70)
+print("✅ ALL TESTS PASSED!")
+print("=" * 70)
@@ -0,0 +1,167 @@
+import sys
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+print("=" * 70)
+print("🧪 IDEMPOTENCY KEY TEST")
+print("=" * 70)
+
+import httpx
+
+from config import settings
+from db.local import LocalDatabase, reset_local_database
+from db.local_seed import seed
+from benchmarks.loadtest import make_sack_images
+
+settings.database_backend = "local"
+settings.online_learning_enabled = False
+settings.write_behind_enabled = False
+
+database = LocalDatabase(latency_ms=20)
+seed(database, warehouses=1, farmers_per_warehouse=1, transactions_per_farmer=1, sacks_per_transaction=0)
+reset_local_database(database)
+
+from fastapi import FastAPI
+import models.sack_detector
+import routers.ml_harvest
+import routers.payments
+from services.idempotency import idempotency_store
+
+app = FastAPI()
+app.include_router(routers.ml_harvest.router)
+app.include_router(routers.payments.router)
+
+WAREHOUSE_ID = next(iter(database.tables["warehouses"].rows))
+TRANSACTION_ID = next(iter(database.tables["transactions"].rows))
+IMAGES = make_sack_images(2)
+
+
+def fail(message):
+    print(f"   ❌ {message}")
+    sys.exit(1)
+
+
+def headers(key=None):
+    result = {"X-Warehouse-ID": WAREHOUSE_ID}
+    if key:
+        result["Idempotency-Key"] = key
+    return result
+
+
+def count(table):
+    return len(database.tables[table].rows)
+
+
+async def scan(client, key, image=0):
+    return await client.post(
+        "/api/ml-harvest/detect-and-save", headers=headers(key),
+        data={"transaction_id": TRANSACTION_ID},
+        files={"file": ("sack.jpg", IMAGES[image], "image/jpeg")},
+    )
+
+
+async def main():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://idempotency") as client:
+        await scan(client, None)  # warm-up: load model + ownership cache
+
+        detector = models.sack_detector.get_detector(
+            settings.model_path, settings.meta_path, settings.features_path
+        )
+        original_predict = detector.predict_with_features
+        inferences = []
+
+        def counting_predict(img_rgb):
+            inferences.append(1)
+            return original_predict(img_rgb)
+
+        detector.predict_with_features = counting_predict
+
+        print("\n1️⃣  Retry detect-and-save with the same key...")
+        before = count("harvest_records")
+        first = await scan(client, "scan-1")
+        retry = await scan(client, "scan-1")
+        if first.status_code != 200 or retry.status_code != 200:
+            fail(f"{first.status_code} / {retry.status_code}: {retry.text}")
+        if retry.json()["id"] != first.json()["id"] or retry.headers.get("idempotent-replayed") != "true":
+            fail("Retry did not replay the original record")
+        if count("harvest_records") != before + 1 or len(inferences) != 1:
+            fail(f"Expected 1 row / 1 inference, got {count('harvest_records') - before} / {len(inferences)}")
+        print("   ✅ Same record returned, 1 inference, 1 row")
+
+        print("\n2️⃣  10 concurrent requests with the same key...")
+        before, inferences[:] = count("harvest_records"), []
+        responses = await asyncio.gather(*(scan(client, "scan-2") for _ in range(10)))
+        ids = {r.json()["id"] for r in responses if r.status_code == 200}
+        if len(ids) != 1 or count("harvest_records") != before + 1 or len(inferences) != 1:
+            fail(f"ids={len(ids)} rows={count('harvest_records') - before} inferences={len(inferences)}")
+        replayed = sum(r.headers.get("idempotent-replayed") == "true" for r in responses)
+        print(f"   ✅ 1 inference, 1 row, {replayed} replayed")
+
+        print("\n3️⃣  Same key with a different image is rejected...")
+        conflict = await scan(client, "scan-1", image=1)
+        if conflict.status_code != 422:
+            fail(f"Expected 422, got {conflict.status_code}")
+        other_warehouse = await client.post(
+            "/api/ml-harvest/detect-and-save",
+            headers={"X-Warehouse-ID": "other", "Idempotency-Key": "scan-1"},
+            data={"transaction_id": TRANSACTION_ID},
+            files={"file": ("sack.jpg", IMAGES[0], "image/jpeg")},
+        )
+        if other_warehouse.status_code == 200:
+            fail("Key leaked across warehouses")
+        print(f"   ✅ 422 for a different payload, key scoped per warehouse ({other_warehouse.status_code})")
+
+        print("\n4️⃣  Batch detect replay...")
+        before, inferences[:] = count("harvest_records"), []
+        files = [("files", (f"sack{i}.jpg", IMAGES[i], "image/jpeg")) for i in range(2)]
+        batch = [
+            await client.post("/api/ml-harvest/batch-detect", headers=headers("batch-1"),
+                              data={"transaction_id": TRANSACTION_ID}, files=files)
+            for _ in range(2)
+        ]
+        if batch[0].json() != batch[1].json() or count("harvest_records") != before + 2 or len(inferences) != 2:
+            fail(f"rows={count('harvest_records') - before} inferences={len(inferences)}")
+        print("   ✅ 2 files saved once")
+
+        print("\n5️⃣  Payment create retries...")
+        before = count("payments")
+        body = {"transaction_id": TRANSACTION_ID, "amount": 150000, "payment_method": "cash"}
+        payments = await asyncio.gather(*(
+            client.post("/api/payments/create", headers=headers("pay-1"), json=body) for _ in range(5)
+        ))
+        if {p.status_code for p in payments} != {200} or len({p.json()["id"] for p in payments}) != 1:
+            fail(f"{[p.status_code for p in payments]}")
+        if count("payments") != before + 1:
+            fail(f"Expected 1 payment, got {count('payments') - before}")
+        changed = await client.post("/api/payments/create", headers=headers("pay-1"), json={**body, "amount": 1})
+        without_key = [await client.post("/api/payments/create", headers=headers(), json=body) for _ in range(2)]
+        if changed.status_code != 422 or count("payments") != before + 3:
+            fail(f"changed={changed.status_code} payments={count('payments') - before}")
+        if without_key[0].json()["id"] == without_key[1].json()["id"]:
+            fail("Requests without a key must not be deduplicated")
+        print("   ✅ 1 payment per key, 422 for a changed amount, no key = normal behaviour")
+
+        print("\n6️⃣  Failed requests are not cached...")
+        idempotency_store.clear()
+        missing = await client.post(
+            "/api/payments/create", headers=headers("pay-2"),
+            json={**body, "transaction_id": "00000000-0000-0000-0000-000000000000"},
+        )
+        again = await client.post(
+            "/api/payments/create", headers=headers("pay-2"),
+            json={**body, "transaction_id": "00000000-0000-0000-0000-000000000000"},
+        )
+        if missing.status_code < 400 or "idempotent-replayed" in again.headers:
+            fail(f"Error response was replayed ({missing.status_code} / {again.status_code})")
+        print(f"   ✅ {missing.status_code} not stored, retry runs again")
+
+
+asyncio.run(main())
+reset_local_database()
+
+print("\n" + "=" * 70)
+print("✅ ALL TESTS PASSED!")
+print("=" * 70)
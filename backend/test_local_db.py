@@ -0,0 +1,188 @@
+import io
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+print("=" * 70)
+print("🧪 LOCAL (IN-MEMORY) DATABASE TEST")
+print("=" * 70)
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
+import pyarrow.parquet as pq
+
+from config import settings
+from db.local import LocalDatabase, parse_timestamp, reset_local_database
+from db.local_seed import seed
+import routers.dashboard
+import routers.export
+import routers.farmers
+import routers.payments
+import routers.transactions
+
+settings.database_backend = "local"
+db = LocalDatabase()
+counts = seed(db, warehouses=2, farmers_per_warehouse=20, transactions_per_farmer=3, sacks_per_transaction=10)
+reset_local_database(db)
+
+WAREHOUSE_ID = db.table("warehouses").select("id").order("created_at").limit(1).execute().data[0]["id"]
+HEADERS = {"X-Warehouse-ID": WAREHOUSE_ID}
+
+app = FastAPI()
+for module in (routers.dashboard, routers.export, routers.farmers, routers.payments, routers.transactions):
+    app.include_router(module.router)
+client = TestClient(app)
+
+
+def fail(message):
+    print(f"   ❌ {message}")
+    sys.exit(1)
+
+
+print("\n1️⃣  Query builder: filters, or_, order, limit, count...")
+farmers = db.table("farmers").select("id, full_name", count="exact") \
+    .eq("registered_by_warehouse", WAREHOUSE_ID).order("full_name").limit(5).execute()
+if farmers.count != 20 or len(farmers.data) != 5 or set(farmers.data[0]) != {"id", "full_name"}:
+    fail(f"Unexpected select result: count={farmers.count} rows={len(farmers.data)}")
+names = [f["full_name"] for f in farmers.data]
+if names != sorted(names):
+    fail("Rows not ordered")
+both = db.table("payments").select("id").in_("status", ["approved", "pending"]).execute().data
+ored = db.table("payments").select("id").or_("status.eq.approved,and(status.eq.pending,amount.gt.0)").execute().data
+if len(both) != counts["payments"] or len(ored) != len(both):
+    fail("in_ / or_ mismatch")
+print(f"   ✅ count={farmers.count}, in_ / or_ agree ({len(both)} rows)")
+
+print("\n2️⃣  Embedded !inner join filters on parent column...")
+records = db.table("harvest_records").select("id, transactions!inner(warehouse_id)") \
+    .eq("transactions.warehouse_id", WAREHOUSE_ID).execute().data
+if len(records) != counts["harvest_records"] // 2:
+    fail(f"Expected {counts['harvest_records'] // 2} records, got {len(records)}")
+if any(r["transactions"]["warehouse_id"] != WAREHOUSE_ID for r in records):
+    fail("Embedded filter leaked other warehouse")
+print(f"   ✅ {len(records)} records for one warehouse")
+
+print("\n3️⃣  Unique constraint -> APIError 23505...")
+existing = db.table("farmers").select("farmer_code").limit(1).execute().data[0]["farmer_code"]
+try:
+    db.table("farmers").insert({"farmer_code": existing, "full_name": "Dup"}).execute()
+    fail("Duplicate insert accepted")
+except APIError as e:
+    if e.code != "23505":
+        fail(f"Wrong error code {e.code}")
+print("   ✅ Duplicate rejected")
+
+print("\n4️⃣  Full flow through the routers...")
+r = client.post("/api/farmers/register", headers=HEADERS, json={"full_name": "Pak Budi", "phone": "0812"})
+if r.status_code != 200:
+    fail(f"register farmer: {r.status_code} {r.text}")
+farmer_id = r.json()["id"]
+r = client.post("/api/transactions/create", headers=HEADERS, json={"farmer_id": farmer_id, "initial_price": 500000})
+if r.status_code != 200:
+    fail(f"create transaction: {r.status_code} {r.text}")
+transaction_id = r.json()["id"]
+r = client.post("/api/payments/create", headers=HEADERS, json={
+    "transaction_id": transaction_id, "amount": 500000, "payment_method": "cash",
+})
+if r.status_code != 200:
+    fail(f"create payment: {r.status_code} {r.text}")
+payment_id = r.json()["id"]
+r = client.put(f"/api/payments/{payment_id}/approve", headers=HEADERS, json={"status": "approved"})
+if r.status_code != 200:
+    fail(f"approve payment: {r.status_code} {r.text}")
+txn = client.get(f"/api/transactions/{transaction_id}", headers=HEADERS).json()
+if txn["payment_status"] != "paid":
+    fail(f"Transaction not marked paid: {txn['payment_status']}")
+r = client.put(f"/api/payments/{payment_id}/approve", headers={"X-Warehouse-ID": "other"}, json={"status": "approved"})
+if r.status_code != 403:
+    fail(f"Expected 403 for other warehouse, got {r.status_code}")
+print("   ✅ register -> transaction -> payment -> approve (paid, 403 for other warehouse)")
+
+print("\n5️⃣  Dashboard RPCs see seeded + new data...")
+summary = client.get("/api/dashboard/warehouse-summary", headers=HEADERS).json()
+expected_spent = sum(
+    p["amount"] for p in db.table("payments").select("amount, transactions!inner(warehouse_id)")
+    .eq("status", "approved").eq("transactions.warehouse_id", WAREHOUSE_ID).execute().data
+)
+if abs(summary["total_spent"] - expected_spent) > 0.01:
+    fail(f"total_spent {summary['total_spent']} != {expected_spent}")
+r = client.get("/api/dashboard/farmers-payment-summary?sort=totalPaid&desc=true&limit=5", headers=HEADERS)
+paid = [row["totalPaid"] for row in r.json()]
+if r.headers.get("x-total-count") != "21" or len(paid) != 5 or paid != sorted(paid, reverse=True):
+    fail(f"farmers-payment-summary: total={r.headers.get('x-total-count')} paid={paid}")
+r = client.get("/api/dashboard/farmers-payment-summary?limit=5&offset=100", headers=HEADERS)
+if r.json() != [] or r.headers.get("x-total-count") != "21":
+    fail(f"Offset past the end: total={r.headers.get('x-total-count')} rows={len(r.json())}")
+print(f"   ✅ total_spent={summary['total_spent']:,.0f}, top farmer paid {paid[0]:,.0f}, "
+      f"X-Total-Count kept past the last page")
+
+# Range tidak rata jam: hanya payment di [start, end] (inklusif) yang dihitung
+approved = db.table("payments").select("amount, payment_date, created_at, transactions!inner(warehouse_id)") \
+    .eq("status", "approved").eq("transactions.warehouse_id", WAREHOUSE_ID).execute().data
+stamps = sorted(parse_timestamp(p["payment_date"] or p["created_at"]) for p in approved)
+start, end = stamps[2] + timedelta(seconds=1), stamps[-3]
+in_range = [p for p in approved if start <= parse_timestamp(p["payment_date"] or p["created_at"]) <= end]
+for granularity, tz in (("hour", "UTC"), ("day", "Asia/Kolkata"), ("week", "Asia/Kathmandu")):
+    expected = {}
+    for p in in_range:
+        local = parse_timestamp(p["payment_date"] or p["created_at"]).astimezone(ZoneInfo(tz))
+        local = local.replace(minute=0, second=0, microsecond=0)
+        if granularity != "hour":
+            local = local.replace(hour=0) - timedelta(days=local.weekday() if granularity == "week" else 0)
+        expected[local] = expected.get(local, 0) + p["amount"]
+    r = client.get("/api/dashboard/timeseries", headers=HEADERS, params={
+        "start": start.isoformat(), "end": end.isoformat(), "granularity": granularity, "tz": tz
+    })
+    got = {datetime.fromisoformat(row["bucket"]): row["spent"] for row in r.json() if row["payments_count"]}
+    if got.keys() != expected.keys() or any(abs(got[k] - expected[k]) > 0.01 for k in got):
+        fail(f"timeseries {granularity}/{tz} does not match raw payments in [start, end]")
+hourly = client.get("/api/dashboard/spent-by-hour", headers=HEADERS, params={
+    "start": start.isoformat(), "end": end.isoformat()
+}).json()
+if abs(sum(item["amount"] for item in hourly) - sum(p["amount"] for p in in_range)) > 0.01:
+    fail("spent-by-hour includes payments outside [start, end]")
+print(f"   ✅ timeseries / spent-by-hour exact for [start, end] ({len(in_range)} payments, "
+      f"UTC / +05:30 / +05:45)")
+
+print("\n6️⃣  Keyset pagination + export stream...")
+seen, cursor = [], None
+while True:
+    url = f"/api/transactions/warehouse/{WAREHOUSE_ID}/list?limit=7" + (f"&cursor={cursor}" if cursor else "")
+    body = client.get(url).json()
+    seen.extend(t["id"] for t in body["transactions"])
+    cursor = body.get("next_cursor")
+    if not cursor:
+        break
+if len(seen) != len(set(seen)) or len(seen) != 20 * 3 + 1:
+    fail(f"Pagination returned {len(seen)} rows ({len(set(seen))} unique)")
+export = client.get("/api/export/harvest-records?format=ndjson", headers=HEADERS)
+if export.status_code != 200 or len(export.text.splitlines()) != counts["harvest_records"] // 2:
+    fail(f"Export returned {export.status_code} / {len(export.text.splitlines())} lines")
+print(f"   ✅ {len(seen)} transactions over pages, {len(export.text.splitlines())} exported records")
+
+parquet = client.get("/api/export/harvest-records?format=parquet", headers=HEADERS)
+if parquet.status_code != 200 or pq.read_table(io.BytesIO(parquet.content)).num_rows != counts["harvest_records"] // 2:
+    fail(f"Parquet export returned {parquet.status_code}")
+print("   ✅ Parquet export readable by pyarrow")
+
+print("\n7️⃣  Injected latency applies per round trip...")
+db.latency_ms = 20
+started = time.perf_counter()
+for _ in range(5):
+    db.table("warehouses").select("id").limit(1).execute()
+elapsed_ms = (time.perf_counter() - started) * 1000
+db.latency_ms = 0
+if elapsed_ms < 100:
+    fail(f"Expected >= 100 ms, got {elapsed_ms:.0f} ms")
+print(f"   ✅ 5 round trips took {elapsed_ms:.0f} ms")
+
+reset_local_database()
+
+print("\n" + "=" * 70)
+print("✅ ALL TESTS PASSED!")
+print("=" * 70)
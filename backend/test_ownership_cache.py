@@ -0,0 +1,156 @@
+import sys
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+print("=" * 70)
+print("🧪 OWNERSHIP CACHE TEST")
+print("=" * 70)
+
+from fastapi import HTTPException
+
+from db.cache import OwnershipCache
+import db.cache
+
+WAREHOUSE_ID = "51b51eb1-2552-431e-b53b-b5bfb856a70b"
+TRANSACTION_ID = "0d9c6a8e-1111-4a4a-9b9b-000000000001"
+
+
+class FakeDB:
+    """Emulasi select by id di transactions / warehouses + latency round trip"""
+
+    def __init__(self, latency_s: float = 0.01):
+        self.latency_s = latency_s
+        self.rows = {
+            "transactions": {
+                TRANSACTION_ID: {
+                    "id": TRANSACTION_ID, "warehouse_id": WAREHOUSE_ID, "farmer_id": "f1",
+                    "payment_status": "unpaid", "initial_price": 500000.0,
+                },
+            },
+            "warehouses": {WAREHOUSE_ID: {"id": WAREHOUSE_ID}},
+        }
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        db = self
+
+        class Query:
+            def select(self, columns):
+                return self
+
+            def eq(self, column, value):
+                self.value = value
+                return self
+
+            def execute(self):
+                time.sleep(db.latency_s)
+                with db.lock:
+                    db.calls += 1
+                row = db.rows[name].get(self.value)
+
+                class Response:
+                    data = [row] if row else []
+                return Response()
+
+        return Query()
+
+
+fake_db = FakeDB()
+db.cache.get_supabase_client = lambda: fake_db
+cache = OwnershipCache(maxsize=100, ttl_s=60)
+db.cache.ownership_cache = cache
+
+SACKS = 200
+
+
+async def scan_session():
+    return await asyncio.gather(*(
+        db.cache.authorize_transaction(TRANSACTION_ID, WAREHOUSE_ID) for _ in range(SACKS)
+    ))
+
+
+print(f"\n1️⃣  {SACKS} concurrent ownership checks for one transaction...")
+results = asyncio.run(scan_session())
+print(f"   - Round trips: {fake_db.calls}")
+if fake_db.calls != 1 or any(r["warehouse_id"] != WAREHOUSE_ID for r in results):
+    print("   ❌ Failed")
+    sys.exit(1)
+print("   ✅ One lookup for the whole scan session")
+
+print(f"\n2️⃣  {SACKS} sequential checks hit the cache...")
+fake_db.calls = 0
+
+async def sequential():
+    for _ in range(SACKS):
+        await db.cache.authorize_transaction(TRANSACTION_ID, WAREHOUSE_ID)
+
+asyncio.run(sequential())
+if fake_db.calls != 0:
+    print(f"   ❌ Expected 0 round trips, got {fake_db.calls}")
+    sys.exit(1)
+print("   ✅ 0 round trips")
+
+print("\n3️⃣  Checking 403 / 404 and that not-found is not cached...")
+try:
+    asyncio.run(db.cache.authorize_transaction(TRANSACTION_ID, "other-warehouse"))
+    print("   ❌ Expected 403")
+    sys.exit(1)
+except HTTPException as e:
+    if e.status_code != 403:
+        print(f"   ❌ Expected 403, got {e.status_code}")
+        sys.exit(1)
+
+fake_db.calls = 0
+for _ in range(2):
+    try:
+        asyncio.run(db.cache.authorize_transaction("missing", WAREHOUSE_ID))
+        print("   ❌ Expected 404")
+        sys.exit(1)
+    except HTTPException as e:
+        if e.status_code != 404:
+            print(f"   ❌ Expected 404, got {e.status_code}")
+            sys.exit(1)
+if fake_db.calls != 2:
+    print(f"   ❌ Not-found should be re-queried, got {fake_db.calls} round trips")
+    sys.exit(1)
+print("   ✅ 403 for other warehouse, 404 re-queried")
+
+print("\n4️⃣  Checking our own writes update the cache...")
+cache.set_transaction({"id": TRANSACTION_ID, "payment_status": "paid", "updated_at": "now"})
+txn = asyncio.run(cache.get_transaction(TRANSACTION_ID))
+if txn["payment_status"] != "paid" or "updated_at" in txn:
+    print(f"   ❌ Unexpected cached row: {txn}")
+    sys.exit(1)
+cache.set_transaction({"id": "new-txn", "payment_status": "unpaid"})
+if cache.transactions.get("new-txn") is not None:
+    print("   ❌ Partial row should not be cached")
+    sys.exit(1)
+print("   ✅ payment_status updated, partial rows not cached")
+
+print("\n5️⃣  Checking warehouse existence + TTL expiry...")
+fake_db.calls = 0
+short = OwnershipCache(maxsize=100, ttl_s=0.05)
+
+async def warehouses():
+    exists = [await short.warehouse_exists(WAREHOUSE_ID) for _ in range(10)]
+    await asyncio.sleep(0.1)
+    exists.append(await short.warehouse_exists(WAREHOUSE_ID))
+    return exists
+
+exists = asyncio.run(warehouses())
+if not all(exists) or fake_db.calls != 2:
+    print(f"   ❌ Expected 2 round trips (initial + after expiry), got {fake_db.calls}")
+    sys.exit(1)
+if asyncio.run(short.warehouse_exists("missing")):
+    print("   ❌ Missing warehouse reported as existing")
+    sys.exit(1)
+print("   ✅ Cached until TTL expires")
+
+print("\n" + "=" * 70)
+print("✅ ALL TESTS PASSED!")
+print("=" * 70)
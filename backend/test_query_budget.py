@@ -0,0 +1,121 @@
+import sys
+import asyncio
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+print("=" * 70)
+print("🧪 QUERY BUDGET TEST")
+print("=" * 70)
+
+import httpx
+
+from config import settings
+from db import ownership_cache
+from db.local import LocalDatabase, reset_local_database
+from db.local_seed import seed
+from db.query import trace_queries
+from services.response_cache import dashboard_cache
+
+settings.database_backend = "local"
+settings.online_learning_enabled = False
+database = LocalDatabase()
+seed(database, warehouses=2, farmers_per_warehouse=30, transactions_per_farmer=4, sacks_per_transaction=15)
+reset_local_database(database)
+
+from main import app
+
+WAREHOUSE_ID = next(iter(database.tables["warehouses"].rows))
+HEADERS = {"X-Warehouse-ID": WAREHOUSE_ID}
+TRANSACTION = next(
+    t for t in database.tables["transactions"].rows.values() if t["warehouse_id"] == WAREHOUSE_ID
+)
+PAYMENT_ID = next(iter(database.tables["payments"].lookup("transaction_id", TRANSACTION["id"])))["id"]
+NOW = datetime.now(timezone.utc)
+TIMESERIES = {"start": (NOW - timedelta(days=7)).isoformat(), "end": NOW.isoformat(), "granularity": "day"}
+
+# (method, url, kwargs, max round trips dengan cache dingin)
+BUDGETS = [
+    ("GET", f"/api/transactions/{TRANSACTION['id']}", {}, 1),
+    ("GET", f"/api/transactions/{TRANSACTION['id']}/summary", {}, 1),
+    ("GET", f"/api/transactions/warehouse/{WAREHOUSE_ID}/list", {}, 1),
+    ("GET", f"/api/farmers/warehouse/{WAREHOUSE_ID}/list", {}, 1),
+    ("GET", "/api/payments/list", {}, 1),
+    ("GET", f"/api/payments/transaction/{TRANSACTION['id']}/summary", {}, 1),
+    ("GET", "/api/dashboard/warehouse-summary", {}, 2),
+    ("GET", "/api/dashboard/timeseries", {"params": TIMESERIES}, 2),
+    ("GET", "/api/dashboard/farmers-payment-summary", {}, 2),
+    ("PUT", f"/api/payments/{PAYMENT_ID}/approve", {"json": {"status": "approved"}}, 1),
+    ("POST", f"/api/transactions/{TRANSACTION['id']}/start-recording", {}, 2),
+    ("POST", f"/api/transactions/{TRANSACTION['id']}/complete-recording", {}, 3),
+]
+
+
+async def main():
+    failures = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://budget") as client:
+        print("\n1️⃣  Round trips per endpoint (cold caches)...")
+        for method, url, kwargs, budget in BUDGETS:
+            ownership_cache.clear()
+            dashboard_cache.clear()
+            with trace_queries() as trace:
+                response = await client.request(method, url, headers=HEADERS, **kwargs)
+            label = f"{method} {url.replace(WAREHOUSE_ID, '{wid}').replace(TRANSACTION['id'], '{tid}').replace(PAYMENT_ID, '{pid}')}"
+            ok = response.status_code == 200 and trace.count <= budget
+            print(f"   {'✅' if ok else '❌'} {label:<58} {trace.count}/{budget} queries")
+            if response.status_code != 200:
+                failures.append(f"{label}: HTTP {response.status_code} {response.text[:120]}")
+            elif trace.count > budget:
+                failures.append(f"{label}: {trace.count} queries > budget {budget} "
+                                f"({', '.join(target for target, _ in trace.queries)})")
+
+        print("\n2️⃣  Server-Timing header reports the same queries...")
+        ownership_cache.clear()
+        with trace_queries() as trace:
+            response = await client.get(f"/api/transactions/{TRANSACTION['id']}/summary", headers=HEADERS)
+        header = response.headers.get("server-timing", "")
+        if f'desc="{trace.count} queries"' not in header or "GET transactions" not in header:
+            failures.append(f"Unexpected Server-Timing header: {header}")
+        else:
+            print(f"   ✅ {header[:90]}...")
+
+        print("\n3️⃣  Conditional GET: revalidation costs the version check only...")
+        url = f"/api/transactions/{TRANSACTION['id']}/summary"
+        first = await client.get(url, headers={**HEADERS, "If-None-Match": '"stale"'})
+        etag = first.headers.get("etag")
+        with trace_queries() as trace:
+            revalidated = await client.get(url, headers={**HEADERS, "If-None-Match": etag or ""})
+        if first.status_code != 200 or not etag or revalidated.status_code != 304 or trace.count > 1:
+            failures.append(f"Conditional GET: {first.status_code} {etag} -> "
+                            f"{revalidated.status_code} with {trace.count} queries")
+        else:
+            print(f"   ✅ 304 with {trace.count} query (data_version)")
+
+        print("\n4️⃣  data_version failure serves the payload without ETag...")
+        versions = database.functions.pop("data_version")
+        try:
+            response = await client.get(url, headers={**HEADERS, "If-None-Match": etag or ""})
+        finally:
+            database.functions["data_version"] = versions
+        if response.status_code != 200 or "etag" in response.headers:
+            failures.append(f"Version failure: HTTP {response.status_code}, etag={response.headers.get('etag')}")
+        else:
+            print("   ✅ 200 without ETag")
+
+    return failures
+
+
+failures = asyncio.run(main())
+reset_local_database()
+
+if failures:
+    print("\n❌ QUERY BUDGET EXCEEDED:")
+    for failure in failures:
+        print(f"   - {failure}")
+    sys.exit(1)
+
+print("\n" + "=" * 70)
+print("✅ ALL TESTS PASSED!")
+print("=" * 70)
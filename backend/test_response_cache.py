@@ -0,0 +1,100 @@
+import sys
+import asyncio
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+print("=" * 70)
+print("🧪 DASHBOARD RESPONSE CACHE TEST")
+print("=" * 70)
+
+from services.response_cache import ResponseCache
+
+WAREHOUSE_ID = "51b51eb1-2552-431e-b53b-b5bfb856a70b"
+KEY = (WAREHOUSE_ID, "warehouse-summary")
+CLERKS = 100
+
+
+class SlowSummary:
+    """Emulasi RPC warehouse_summary yang mahal"""
+
+    def __init__(self, latency_s: float = 0.05):
+        self.latency_s = latency_s
+        self.calls = 0
+        self.fail = False
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency_s)
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        return {"total_spent": float(self.calls)}
+
+
+async def main():
+    cache = ResponseCache(fresh_s=0.2, stale_s=1.0, maxsize=100)
+    compute = SlowSummary()
+
+    print(f"\n1️⃣  {CLERKS} simultaneous dashboard loads on a cold cache...")
+    started = time.perf_counter()
+    results = await asyncio.gather(*(cache.get_or_compute(KEY, compute) for _ in range(CLERKS)))
+    elapsed = time.perf_counter() - started
+    print(f"   - Computations: {compute.calls} in {elapsed * 1000:.0f} ms")
+    if compute.calls != 1 or any(r != {"total_spent": 1.0} for r in results):
+        print("   ❌ Failed")
+        sys.exit(1)
+    print("   ✅ One database computation")
+
+    print("\n2️⃣  Fresh hits do not recompute...")
+    await cache.get_or_compute(KEY, compute)
+    if compute.calls != 1:
+        print(f"   ❌ Expected 1 computation, got {compute.calls}")
+        sys.exit(1)
+    print("   ✅ Served from cache")
+
+    print("\n3️⃣  Stale entry is served immediately and refreshed once in background...")
+    await asyncio.sleep(0.25)
+    started = time.perf_counter()
+    stale = await asyncio.gather(*(cache.get_or_compute(KEY, compute) for _ in range(CLERKS)))
+    elapsed = time.perf_counter() - started
+    if any(r != {"total_spent": 1.0} for r in stale) or elapsed > compute.latency_s:
+        print(f"   ❌ Stale value not served immediately ({elapsed * 1000:.0f} ms)")
+        sys.exit(1)
+    await asyncio.sleep(compute.latency_s * 2)
+    fresh = await cache.get_or_compute(KEY, compute)
+    if compute.calls != 2 or fresh != {"total_spent": 2.0}:
+        print(f"   ❌ Expected one background refresh, got {compute.calls - 1}: {fresh}")
+        sys.exit(1)
+    print(f"   ✅ Stale served in {elapsed * 1000:.1f} ms, refreshed once")
+
+    print("\n4️⃣  Failed refresh keeps serving stale data...")
+    await asyncio.sleep(0.25)
+    compute.fail = True
+    value = await cache.get_or_compute(KEY, compute)
+    await asyncio.sleep(compute.latency_s * 2)
+    value_after = await cache.get_or_compute(KEY, compute)
+    if value != {"total_spent": 2.0} or value_after != {"total_spent": 2.0}:
+        print("   ❌ Stale value lost after failed refresh")
+        sys.exit(1)
+    print("   ✅ Stale value kept")
+
+    print("\n5️⃣  Invalidate forces recompute for that warehouse only...")
+    compute.fail = False
+    other_key = ("other-warehouse", "warehouse-summary")
+    await cache.get_or_compute(other_key, compute)
+    calls = compute.calls
+    cache.invalidate(WAREHOUSE_ID)
+    await cache.get_or_compute(KEY, compute)
+    await cache.get_or_compute(other_key, compute)
+    if compute.calls != calls + 1:
+        print(f"   ❌ Expected 1 recompute, got {compute.calls - calls}")
+        sys.exit(1)
+    print("   ✅ Only the invalidated warehouse recomputed")
+
+
+asyncio.run(main())
+
+print("\n" + "=" * 70)
+print("✅ ALL TESTS PASSED!")
+print("=" * 70)
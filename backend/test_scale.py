@@ -0,0 +1,187 @@
+import sys
+import asyncio
+import json
+import random
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+print("=" * 70)
+print("🧪 SCALE WEIGHT INGESTION TEST")
+print("=" * 70)
+
+from config import settings
+from db.local import LocalDatabase, reset_local_database
+from db.local_seed import seed
+from db.query import trace_queries
+from benchmarks.loadtest import make_sack_images
+from benchmarks.scale_feed import feed, run_local, sack_samples
+
+settings.database_backend = "local"
+settings.online_learning_enabled = False
+settings.write_behind_enabled = False
+
+database = LocalDatabase(latency_ms=1)
+seed(database, warehouses=1, farmers_per_warehouse=1, transactions_per_farmer=1, sacks_per_transaction=0)
+reset_local_database(database)
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+import routers.ml_harvest
+import routers.scale
+import routers.transactions
+from services.scale import ScaleHub, DEFAULT_WEIGHT_KG
+
+app = FastAPI()
+app.include_router(routers.ml_harvest.router)
+app.include_router(routers.scale.router)
+app.include_router(routers.transactions.router)
+
+WAREHOUSE_ID = next(iter(database.tables["warehouses"].rows))
+TRANSACTION_ID = next(iter(database.tables["transactions"].rows))
+# Seed selalu complete; transaksi ini masih dalam proses recording
+database.tables["transactions"].rows[TRANSACTION_ID]["recording_completed_at"] = None
+HEADERS = {"X-Warehouse-ID": WAREHOUSE_ID}
+IMAGE = make_sack_images(1)[0]
+RATE_HZ = 50
+clock = [0.0]
+
+
+def fail(message):
+    print(f"   ❌ {message}")
+    sys.exit(1)
+
+
+def send_sack(ws, weight_kg, seed=0):
+    """Kirim satu karung (frame JSON berisi 10 sample, timestamp device)"""
+    samples = []
+    for kg in sack_samples(weight_kg, RATE_HZ, random.Random(seed)):
+        samples.append({"t": clock[0], "kg": round(kg, 3)})
+        clock[0] += 1.0 / RATE_HZ
+    for i in range(0, len(samples), 10):
+        ws.send_text(json.dumps(samples[i:i + 10]))
+    return ws.receive_json()
+
+
+def scan(client, station_id, expected_status=200):
+    response = client.post(
+        "/api/ml-harvest/detect-and-save", headers=HEADERS,
+        data={"transaction_id": TRANSACTION_ID, "station_id": station_id},
+        files={"file": ("sack.jpg", IMAGE, "image/jpeg")},
+    )
+    if response.status_code != expected_status:
+        fail(f"{response.status_code}: {response.text}")
+    return response.json()
+
+
+with TestClient(app) as client:
+    with client.websocket_connect("/api/scale/ws/station-1", headers=HEADERS) as ws:
+        print("\n1️⃣  Weight settles before the sack is scanned...")
+        settled = send_sack(ws, 62.4)
+        if settled["event"] != "settled" or abs(settled["weight_kg"] - 62.4) > 0.1 or settled["record_id"]:
+            fail(f"Unexpected settle: {settled}")
+        record = scan(client, "station-1")
+        if record["weight_kg"] != settled["weight_kg"]:
+            fail(f"Expected {settled['weight_kg']} kg on the record, got {record['weight_kg']}")
+        print(f"   ✅ Record saved with {record['weight_kg']} kg")
+
+        print("\n2️⃣  Sack scanned before the weight settles...")
+        record = scan(client, "station-1")
+        if record["weight_kg"] != DEFAULT_WEIGHT_KG:
+            fail(f"Weight should not be reused: {record['weight_kg']}")
+        settled = send_sack(ws, 88.1, seed=1)
+        stored = database.tables["harvest_records"].rows[record["id"]]["weight_kg"]
+        if settled["record_id"] != record["id"] or abs(stored - 88.1) > 0.1:
+            fail(f"Weight not attached: {settled} / stored {stored}")
+        print(f"   ✅ Record updated to {stored} kg when the scale settled")
+
+        print("\n3️⃣  Raw serial lines and invalid frames...")
+        ws.send_text("0.02\n0.01\nabc")
+        error = ws.receive_json()
+        if error["event"] != "error":
+            fail(f"Expected error event, got {error}")
+        print("   ✅ Invalid frame reported, connection stays open")
+
+        other_station = scan(client, "station-2")
+        if other_station["weight_kg"] != DEFAULT_WEIGHT_KG:
+            fail("Weight leaked to another station")
+
+        print("\n4️⃣  Failed save does not consume the weight...")
+        settled = send_sack(ws, 55.5, seed=2)
+        real_execute = routers.ml_harvest.execute
+
+        async def failing_execute(query):
+            raise RuntimeError("database unavailable")
+
+        routers.ml_harvest.execute = failing_execute
+        try:
+            scan(client, "station-1", expected_status=500)
+        finally:
+            routers.ml_harvest.execute = real_execute
+        record = scan(client, "station-1")
+        if record["weight_kg"] != settled["weight_kg"]:
+            fail(f"Expected {settled['weight_kg']} kg after the failed save, got {record['weight_kg']}")
+        print(f"   ✅ Weight kept for the next scan ({record['weight_kg']} kg)")
+
+        print("\n5️⃣  Weight settling after complete-recording is not attached...")
+        record = scan(client, "station-1")
+        completed = client.post(f"/api/transactions/{TRANSACTION_ID}/complete-recording", headers=HEADERS)
+        if completed.status_code != 200:
+            fail(f"{completed.status_code}: {completed.text}")
+        settled = send_sack(ws, 71.3, seed=3)
+        stored = database.tables["harvest_records"].rows[record["id"]]["weight_kg"]
+        total = database.tables["transactions"].rows[TRANSACTION_ID]["total_weight_kg"]
+        if settled["record_id"] or settled.get("skipped") != "recording_completed":
+            fail(f"Expected skipped settle, got {settled}")
+        if stored != DEFAULT_WEIGHT_KG or total != completed.json()["total_weight_kg"]:
+            fail(f"Completed transaction changed: record {stored} kg, total {total} kg")
+        print("   ✅ Bridge told the weight was skipped, record and totals unchanged")
+
+        # Cek recording + update harus satu statement: tidak ada celah untuk complete-recording
+        with trace_queries() as trace:
+            attached = asyncio.run(routers.scale.attach_weight(WAREHOUSE_ID, "station-1", record, 71.3))
+        if attached or trace.count != 1:
+            fail(f"Expected one conditional update, got attached={attached} with {trace.count} queries")
+        database.tables["transactions"].rows[TRANSACTION_ID]["recording_completed_at"] = None
+        with trace_queries() as trace:
+            attached = asyncio.run(routers.scale.attach_weight(WAREHOUSE_ID, "station-1", record, 71.3))
+        stored = database.tables["harvest_records"].rows[record["id"]]["weight_kg"]
+        if not attached or trace.count != 1 or stored != 71.3:
+            fail(f"Reopened recording not attached: {attached} / {stored} kg / {trace.count} queries")
+        print("   ✅ Recording check and weight update in one conditional statement")
+
+    try:
+        with client.websocket_connect("/api/scale/ws/station-1", headers={"X-Warehouse-ID": "unknown"}) as ws:
+            ws.receive_json()
+        fail("Unknown warehouse accepted")
+    except WebSocketDisconnect as e:
+        if e.code != 1008:
+            fail(f"Expected close 1008, got {e.code}")
+    print("   ✅ Unknown warehouse rejected (1008)")
+
+print("\n6️⃣  Many stations, bounded memory...")
+result = run_local(stations=100, sacks=10, rate_hz=RATE_HZ)
+if result["settled"] != result["expected"] or result["max_error_kg"] > 0.1:
+    fail(f"Stabilisation failed: {result}")
+print(f"   ✅ {result['settled']} sacks settled over 100 stations, "
+      f"max error {result['max_error_kg']:.3f} kg, {result['samples_per_s']:,.0f} samples/s")
+
+hub = ScaleHub(window_s=1.0, tolerance_kg=0.2, min_load_kg=2.0, match_window_s=30.0,
+               max_samples=32, max_pending=4, max_stations=10)
+_, samples = feed(sacks=3, rate_hz=RATE_HZ)
+for station in range(50):
+    for t, kg in samples:
+        hub.add_sample("w", str(station), kg, t)
+    for _ in range(10):
+        hub.await_weight("w", str(station), {"id": "x"})
+stations = list(hub._stations.values())
+if hub.station_count() != 10 or any(len(s.awaiting) > 4 or len(s.stabilizer.samples) > 32 for s in stations):
+    fail("State not bounded")
+print("   ✅ 10 stations kept (LRU), queues and windows bounded")
+
+reset_local_database()
+
+print("\n" + "=" * 70)
+print("✅ ALL TESTS PASSED!")
+print("=" * 70)
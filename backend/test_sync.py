@@ -0,0 +1,168 @@
+import sys
+import asyncio
+import gzip
+import json
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+print("=" * 70)
+print("🧪 BULK OFFLINE SYNC TEST")
+print("=" * 70)
+
+import httpx
+
+from config import settings
+from db import ownership_cache
+from db.local import LocalDatabase, reset_local_database
+from db.local_seed import seed
+from db.query import trace_queries
+
+settings.database_backend = "local"
+settings.online_learning_enabled = False
+FEATURES = 68  # extract_features_v2_fallback
+database = LocalDatabase(latency_ms=5)
+seed(database, warehouses=2, farmers_per_warehouse=30, transactions_per_farmer=2, sacks_per_transaction=5)
+reset_local_database(database)
+
+from fastapi import FastAPI
+import routers.sync
+from models.sack_detector import get_detector
+from models.online_learner import get_online_learner, IncrementalGradeModel
+
+# Learner tidak di-start: cukup untuk cek feature yang di-remember dari sync
+learner = get_online_learner(
+    get_detector(settings.model_path, settings.meta_path, settings.features_path),
+    tempfile.mkdtemp()
+)
+
+app = FastAPI()
+app.include_router(routers.sync.router)
+
+WAREHOUSE_ID, OTHER_WAREHOUSE_ID = list(database.tables["warehouses"].rows)
+HEADERS = {"X-Warehouse-ID": WAREHOUSE_ID, "Content-Encoding": "gzip", "Content-Type": "application/json"}
+OWN = [t["id"] for t in database.tables["transactions"].lookup("warehouse_id", WAREHOUSE_ID)][:50]
+FOREIGN = next(iter(database.tables["transactions"].lookup("warehouse_id", OTHER_WAREHOUSE_ID)))["id"]
+RECORDS = 5000
+
+
+def make_records(count, transaction_ids, features=FEATURES):
+    started = datetime.now(timezone.utc) - timedelta(hours=6)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "transaction_id": transaction_ids[i % len(transaction_ids)],
+            "grade": "ABC"[i % 3],
+            "sack_color": ["merah", "kuning", "hijau"][i % 3],
+            "detection_confidence": 91.5,
+            "recorded_at": (started + timedelta(seconds=i)).isoformat(),
+            "features": [0.1] * features,
+        }
+        for i in range(count)
+    ]
+
+
+def fail(message):
+    print(f"   ❌ {message}")
+    sys.exit(1)
+
+
+async def post(client, records):
+    body = gzip.compress(json.dumps({"records": records}).encode())
+    with trace_queries() as trace:
+        response = await client.post("/api/sync/harvest-records", content=body, headers=HEADERS)
+    return response, trace
+
+
+async def main():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://sync") as client:
+        records = make_records(RECORDS, OWN)
+        before = len(database.tables["harvest_records"].rows)
+
+        print(f"\n1️⃣  Drain a backlog of {RECORDS} records (gzip, 5 ms per query)...")
+        ownership_cache.clear()
+        started = time.perf_counter()
+        response, trace = await post(client, records)
+        elapsed = time.perf_counter() - started
+        body = response.json()
+        if response.status_code != 200 or body["inserted"] != RECORDS:
+            fail(f"{response.status_code}: {str(body)[:200]}")
+        if len(database.tables["harvest_records"].rows) != before + RECORDS:
+            fail("Rows not persisted")
+        expected_queries = 1 + -(-RECORDS // settings.batch_insert_chunk_size)
+        if trace.count != expected_queries:
+            fail(f"Expected {expected_queries} queries, got {trace.count}")
+        if learner.pop_features(records[0]["id"]) is None or body["features_ignored"] != 0:
+            fail("Feature vectors not passed to the online learner")
+        print(f"   ✅ {RECORDS} records in {elapsed:.2f}s with {trace.count} queries")
+
+        print("\n2️⃣  Replaying the same batch inserts nothing...")
+        response, trace = await post(client, records + records[:10])
+        body = response.json()
+        if body["inserted"] != 0 or body["duplicates"] != RECORDS + 10:
+            fail(f"Replay not deduplicated: {body}")
+        if len(database.tables["harvest_records"].rows) != before + RECORDS:
+            fail("Duplicate rows written")
+        print(f"   ✅ {body['duplicates']} duplicates skipped, ownership from cache ({trace.count} queries)")
+
+        print("\n3️⃣  Records for another warehouse / unknown transaction are rejected...")
+        mixed = make_records(3, OWN) + make_records(2, [FOREIGN]) + make_records(1, [str(uuid.uuid4())])
+        response, _ = await post(client, mixed)
+        body = response.json()
+        errors = sorted(r["error"] for r in body["rejected"])
+        if body["inserted"] != 3 or errors != ["Not authorized for this transaction"] * 2 + ["Transaction not found"]:
+            fail(f"Unexpected result: {body}")
+        print("   ✅ 3 inserted, 2 not authorized, 1 not found")
+
+        print("\n4️⃣  Invalid payloads...")
+        bad = await client.post("/api/sync/harvest-records", content=b"not gzip", headers=HEADERS)
+        invalid = await post(client, [{**make_records(1, OWN)[0], "grade": "Z"}])
+        if bad.status_code != 400 or invalid[0].status_code != 422:
+            fail(f"Expected 400 / 422, got {bad.status_code} / {invalid[0].status_code}")
+        print("   ✅ 400 for bad gzip, 422 for invalid record")
+
+        print("\n5️⃣  Feature vectors with the wrong dimension are not learned...")
+        wrong = make_records(2, OWN, features=32) + make_records(1, OWN)
+        response, _ = await post(client, wrong)
+        body = response.json()
+        if body["inserted"] != 3 or body["features_ignored"] != 2:
+            fail(f"Unexpected result: {body}")
+        if any(learner.pop_features(r["id"]) is not None for r in wrong[:2]):
+            fail("32-dim vector reached the online learner")
+        if learner.pop_features(wrong[2]["id"]) is None:
+            fail(f"{FEATURES}-dim vector was dropped")
+        print(f"   ✅ Records saved, 2 x 32-dim vectors ignored, {FEATURES}-dim kept")
+
+        print("\n6️⃣  Features still learned after the online model is swapped in...")
+        detector = learner.detector
+        base_model, base_version = detector.model, detector.model_version
+        online = IncrementalGradeModel(len(detector.metadata["classes"]))
+        rng = np.random.default_rng(0)
+        online.partial_fit(rng.random((30, FEATURES)), rng.integers(0, 3, 30))
+        detector.swap_model(online, "online-test")
+        try:
+            records = make_records(3, OWN)
+            response, _ = await post(client, records)
+            body = response.json()
+            if body["inserted"] != 3 or body["features_ignored"] != 0:
+                fail(f"Unexpected result after swap: {body}")
+            if any(learner.pop_features(r["id"]) is None for r in records):
+                fail("Feature vectors dropped after swap_model")
+        finally:
+            detector.swap_model(base_model, base_version)
+        print(f"   ✅ {FEATURES}-dim vectors remembered with the online model")
+
+
+asyncio.run(main())
+reset_local_database()
+
+print("\n" + "=" * 70)
+print("✅ ALL TESTS PASSED!")
+print("=" * 70)
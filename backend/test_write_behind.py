@@ -0,0 +1,154 @@
+import sys
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+print("=" * 70)
+print("🧪 WRITE-BEHIND JOURNAL TEST")
+print("=" * 70)
+
+import httpx
+from postgrest.exceptions import APIError
+
+from config import settings
+from db.local import LocalDatabase, reset_local_database
+from db.local_seed import seed
+from benchmarks.loadtest import make_sack_images
+
+journal_path = str(Path(tempfile.mkdtemp()) / "harvest_journal.sqlite3")
+settings.database_backend = "local"
+settings.online_learning_enabled = False
+settings.write_behind_enabled = True
+settings.write_behind_journal_path = journal_path
+settings.write_behind_flush_interval_s = 0.05
+
+database = LocalDatabase(latency_ms=50)
+seed(database, warehouses=1, farmers_per_warehouse=1, transactions_per_farmer=1, sacks_per_transaction=3)
+reset_local_database(database)
+
+from fastapi import FastAPI
+import routers.ml_harvest
+import routers.transactions
+import services.journal
+from services.journal import HarvestJournal
+
+# Journal baru dengan settings test (singleton dibuat saat import)
+journal = HarvestJournal(journal_path, flush_interval_s=0.05, max_backoff_s=0.2, batch_size=500)
+services.journal.harvest_journal = journal
+routers.ml_harvest.harvest_journal = journal
+routers.transactions.harvest_journal = journal
+
+app = FastAPI()
+app.include_router(routers.ml_harvest.router)
+app.include_router(routers.transactions.router)
+
+WAREHOUSE_ID = next(iter(database.tables["warehouses"].rows))
+TRANSACTION_ID = next(iter(database.tables["transactions"].rows))
+HEADERS = {"X-Warehouse-ID": WAREHOUSE_ID}
+IMAGES = make_sack_images(3)
+SCANS = 5
+
+
+def fail(message):
+    print(f"   ❌ {message}")
+    sys.exit(1)
+
+
+def db_records():
+    return len(database.tables["harvest_records"].lookup("transaction_id", TRANSACTION_ID))
+
+
+async def scan(client, i):
+    return await client.post(
+        "/api/ml-harvest/detect-and-save", headers=HEADERS,
+        data={"transaction_id": TRANSACTION_ID},
+        files={"file": ("sack.jpg", IMAGES[i % len(IMAGES)], "image/jpeg")},
+    )
+
+
+async def main():
+    global journal
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://journal") as client:
+        await scan(client, 0)  # warm-up: load model + ownership cache
+        await journal.flush_once()
+        before = db_records()
+
+        print(f"\n1️⃣  {SCANS} scans with 50 ms database latency, flusher stopped...")
+        started = time.perf_counter()
+        for i in range(SCANS):
+            r = await scan(client, i)
+            if r.status_code != 200:
+                fail(f"{r.status_code}: {r.text}")
+        per_scan_ms = (time.perf_counter() - started) * 1000 / SCANS
+        if db_records() != before or journal.pending_count() != SCANS:
+            fail(f"Expected {SCANS} journaled records, db={db_records() - before} journal={journal.pending_count()}")
+        if per_scan_ms >= 50:
+            fail(f"Scan waited for the database ({per_scan_ms:.0f} ms)")
+        print(f"   ✅ {per_scan_ms:.1f} ms per scan, {journal.pending_count()} records in journal")
+
+        print("\n2️⃣  Summaries include pending records (read-your-writes)...")
+        summary = (await client.get(f"/api/ml-harvest/transaction/{TRANSACTION_ID}/harvest-summary")).json()
+        txn_summary = (await client.get(f"/api/transactions/{TRANSACTION_ID}/summary")).json()
+        expected = before + SCANS
+        if summary["total_sacks"] != expected or txn_summary["harvest_summary"]["total_records"] != expected:
+            fail(f"Expected {expected} sacks, got {summary['total_sacks']} / "
+                 f"{txn_summary['harvest_summary']['total_records']}")
+        print(f"   ✅ {expected} sacks visible before flush")
+
+        print("\n3️⃣  Journal survives a restart and drains to the database...")
+        journal.close()
+        journal = HarvestJournal(journal_path, flush_interval_s=0.05, max_backoff_s=0.2, batch_size=500)
+        services.journal.harvest_journal = routers.ml_harvest.harvest_journal = journal
+        routers.transactions.harvest_journal = journal
+        if journal.pending_count() != SCANS:
+            fail(f"Lost journal entries on restart: {journal.pending_count()}")
+        journal.start()
+        for _ in range(100):
+            if journal.pending_count() == 0:
+                break
+            await asyncio.sleep(0.05)
+        if journal.pending_count() != 0 or db_records() != expected:
+            fail(f"Not drained: journal={journal.pending_count()} db={db_records()}")
+        summary = (await client.get(f"/api/ml-harvest/transaction/{TRANSACTION_ID}/harvest-summary")).json()
+        if summary["total_sacks"] != expected:
+            fail(f"Double counted after flush: {summary['total_sacks']}")
+        print(f"   ✅ {SCANS} records flushed after restart, no double count")
+
+        print("\n4️⃣  Database outage: scans keep working, flusher retries with backoff...")
+        original_get_table = database.get_table
+
+        def unavailable(name):
+            if name == "harvest_records":
+                raise APIError({"code": "57P01", "message": "database unavailable"})
+            return original_get_table(name)
+
+        database.get_table = unavailable
+        for i in range(3):
+            if (await scan(client, i)).status_code != 200:
+                fail("Scan failed during outage")
+        await asyncio.sleep(0.3)
+        if journal.failures == 0 or journal.pending_count() != 3:
+            fail(f"Expected retries with 3 pending, got failures={journal.failures} pending={journal.pending_count()}")
+        database.get_table = original_get_table
+        for _ in range(100):
+            if journal.pending_count() == 0:
+                break
+            await asyncio.sleep(0.05)
+        if journal.pending_count() != 0 or db_records() != expected + 3:
+            fail(f"Not recovered: journal={journal.pending_count()} db={db_records()}")
+        print(f"   ✅ {journal.failures} failed flushes, all records saved after recovery")
+
+        await journal.stop()
+        journal.close()
+
+
+asyncio.run(main())
+reset_local_database()
+
+print("\n" + "=" * 70)
+print("✅ ALL TESTS PASSED!")
+print("=" * 70)
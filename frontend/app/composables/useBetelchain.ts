@@ -76,6 +76,41 @@ export const useBetelchain = () => {
   return response.json() as Promise<Array<{ hour: string; amount: number }>>
 }
 
+  const getWarehouseTimeseries = async (
+    start: string,
+    end: string,
+    granularity: 'minute' | 'hour' | 'day' | 'week' = 'hour',
+    tz: string = Intl.DateTimeFormat().resolvedOptions().timeZone
+  ) => {
+    const warehouseId = await getWarehouseId()
+
+    const url = new URL(`${BACKEND_URL}/api/dashboard/timeseries`)
+    url.searchParams.set('start', start)
+    url.searchParams.set('end', end)
+    url.searchParams.set('granularity', granularity)
+    url.searchParams.set('tz', tz)
+
+    const response = await fetch(url.toString(), {
+      method: 'GET',
+      headers: {
+        'X-Warehouse-ID': warehouseId
+      }
+    })
+
+    if (!response.ok) {
+      const error = await response.json()
+      throw new Error(error.detail || 'Failed to fetch timeseries')
+    }
+
+    return response.json() as Promise<Array<{
+      bucket: string
+      spent: number
+      payments_count: number
+      sacks: number
+      grades_breakdown: Record<string, number>
+    }>>
+  }
+
 
 
   // ==================== FARMERS ====================
@@ -111,21 +146,37 @@ export const useBetelchain = () => {
     return response.json() as Promise<Farmer>
   }
 
+  // List endpoints pakai keyset pagination: ikuti next_cursor sampai habis
+  const fetchAllPages = async <T>(url: string, key: string, errorMessage: string) => {
+    const items: T[] = []
+    let cursor: string | null = null
+
+    do {
+      const params = new URLSearchParams({ limit: '500' })
+      if (cursor) params.set('cursor', cursor)
+
+      const response = await fetch(`${url}?${params}`, { method: 'GET' })
+
+      if (!response.ok) {
+        const error = await response.json()
+        throw new Error(error.detail || errorMessage)
+      }
+
+      const data = await response.json()
+      items.push(...(data[key] as T[]))
+      cursor = data.next_cursor
+    } while (cursor)
+
+    return items
+  }
+
   const listFarmers = async () => {
     const warehouseId = await getWarehouseId()
-    
-    const response = await fetch(
+    return fetchAllPages<Farmer>(
       `${BACKEND_URL}/api/farmers/warehouse/${warehouseId}/list`,
-      { method: 'GET' }
+      'farmers',
+      'Failed to fetch farmers'
     )
-
-    if (!response.ok) {
-      const error = await response.json()
-      throw new Error(error.detail || 'Failed to fetch farmers')
-    }
-
-    const data = await response.json()
-    return data.farmers as Farmer[]
   }
 
   const getFarmer = async (farmerId: string) => {
@@ -201,19 +252,11 @@ export const useBetelchain = () => {
 
   const listTransactions = async () => {
     const warehouseId = await getWarehouseId()
-    
-    const response = await fetch(
+    return fetchAllPages<Transaction>(
       `${BACKEND_URL}/api/transactions/warehouse/${warehouseId}/list`,
-      { method: 'GET' }
+      'transactions',
+      'Failed to fetch transactions'
     )
-
-    if (!response.ok) {
-      const error = await response.json()
-      throw new Error(error.detail || 'Failed to fetch transactions')
-    }
-
-    const data = await response.json()
-    return data.transactions as Transaction[]
   }
 
   const getTransaction = async (transactionId: string) => {
@@ -468,6 +511,7 @@ export const useBetelchain = () => {
     // Dashboard
     getWarehouseDashboard,
     getSpentByHour,
+    getWarehouseTimeseries,
     getFarmersPaymentSummary
   }
 }